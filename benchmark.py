@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QPoint, QRect, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtGui import QColor, QImage, QLinearGradient, QPainter, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+import screenshot_tool as st
+
+IMAGE_SIZES = {"1080p": (1920, 1080), "4k": (3840, 2160)}
+SHAPE_COUNTS = (0, 100, 1000)
+ZOOM_LEVELS = (0.5, 1.0, 2.0)
+OPEN_BATCH_SIZE = 12
+DEFAULT_THRESHOLD = 0.10
+
+
+def _make_pixmap(width, height):
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0.0, QColor("#1f2330"))
+    gradient.setColorAt(0.5, QColor("#2ed3a3"))
+    gradient.setColorAt(1.0, QColor("#ff8ba7"))
+    painter.fillRect(image.rect(), gradient)
+    painter.setPen(QColor("#ffffff"))
+    for row in range(0, height, 48):
+        painter.drawText(16, row + 32, f"Snapshot Studio benchmark row {row} " * 6)
+    painter.end()
+    return QPixmap.fromImage(image)
+
+
+def _make_shapes(count, width, height):
+    rectangles = []
+    markers = []
+    for index in range(count):
+        x = (index * 97) % max(1, width - 160)
+        y = (index * 53) % max(1, height - 120)
+        if index % 2:
+            markers.append({
+                "pos": QPoint(x + 20, y + 20),
+                "number": index // 2 + 1,
+                "fill": QColor(st.DEFAULT_MARKER_STYLE["fill"]),
+                "size": st.DEFAULT_MARKER_STYLE["size"],
+                "border_enabled": True,
+                "border_color": QColor(st.DEFAULT_MARKER_STYLE["border"]),
+                "font_ratio": st.DEFAULT_MARKER_STYLE["font_ratio"],
+            })
+        else:
+            rectangles.append({
+                "rect": QRect(x, y, 140, 90),
+                "fill": QColor(st.DEFAULT_RECT_STYLE["fill"]),
+                "border": QColor(st.DEFAULT_RECT_STYLE["border"]),
+                "border_enabled": True,
+                "width": st.DEFAULT_RECT_STYLE["width"],
+                "radius": st.DEFAULT_RECT_STYLE["radius"],
+                "flattened": False,
+            })
+    return rectangles, markers
+
+
+def _timed(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _result(name, params, samples, work=None, work_unit=None):
+    median = statistics.median(samples)
+    result = {
+        "name": name,
+        "params": params,
+        "iterations": len(samples),
+        "median_ms": round(median * 1000, 4),
+        "min_ms": round(min(samples) * 1000, 4),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+        "stdev_ms": round(statistics.pstdev(samples) * 1000, 4),
+    }
+    if work is not None and median > 0:
+        result[f"{work_unit}_per_s"] = round(work / median, 2)
+    return result
+
+
+def bench_canvas(repeat, sizes):
+    for size_name in sizes:
+        width, height = IMAGE_SIZES[size_name]
+        pixmap = _make_pixmap(width, height)
+        for count in SHAPE_COUNTS:
+            rectangles, markers = _make_shapes(count, width, height)
+            canvas = st.AnnotationCanvas(pixmap)
+            canvas.load_shapes(rectangles, markers, markers_flattened=not markers, rectangles_flattened=not rectangles)
+            for zoom in ZOOM_LEVELS:
+                canvas.set_zoom(zoom)
+                target = QImage(canvas.size(), QImage.Format_ARGB32_Premultiplied)
+                samples = _timed(lambda: canvas.render(target), repeat)
+                params = {"size": size_name, "shapes": count, "zoom": zoom}
+                yield _result("canvas_paint", params, samples)
+            samples = _timed(canvas.export_pixmap, repeat)
+            yield _result("export_pixmap", {"size": size_name, "shapes": count}, samples)
+            canvas.deleteLater()
+
+
+def bench_overlay(repeat, sizes):
+    screen = QApplication.primaryScreen()
+    for size_name in sizes:
+        width, height = IMAGE_SIZES[size_name]
+        overlay = st.CaptureOverlay(_make_pixmap(width, height), QPoint(0, 0), screen)
+        overlay._cursor_timer.stop()
+        overlay.resize(width, height)
+        overlay._scale_x = overlay._compute_scale(width, overlay.width())
+        overlay._scale_y = overlay._compute_scale(height, overlay.height())
+        target = QImage(overlay.size(), QImage.Format_ARGB32_Premultiplied)
+        for label, selection in (("idle", None), ("selecting", QRect(width // 4, height // 4, width // 2, height // 2))):
+            overlay.selection = selection
+            overlay.cursor_pos = QPoint(width // 2, height // 2)
+            samples = _timed(lambda: overlay.render(target), repeat)
+            yield _result("overlay_paint", {"size": size_name, "state": label, "magnifier": True}, samples)
+        overlay.deleteLater()
+
+
+def bench_save(repeat, sizes, workdir):
+    for size_name in sizes:
+        width, height = IMAGE_SIZES[size_name]
+        pixmap = _make_pixmap(width, height)
+        megapixels = width * height / 1e6
+        for fmt, quality, extension in (("JPG", st.DEFAULT_IMAGE_QUALITY, "jpg"), ("PNG", -1, "png")):
+            path = os.path.join(workdir, f"save_{size_name}.{extension}")
+            samples = _timed(lambda: st.save_image_atomic(pixmap, path, fmt, quality), repeat)
+            result = _result("save_image", {"size": size_name, "format": fmt}, samples, megapixels, "megapixels")
+            result["bytes"] = os.path.getsize(path)
+            yield result
+
+
+def bench_open_images(repeat, workdir):
+    source_dir = os.path.join(workdir, "open_batch")
+    os.makedirs(source_dir, exist_ok=True)
+    width, height = IMAGE_SIZES["1080p"]
+    pixmap = _make_pixmap(width, height)
+    paths = []
+    for index in range(OPEN_BATCH_SIZE):
+        path = os.path.join(source_dir, f"image_{index:02d}.png")
+        pixmap.save(path, "PNG")
+        paths.append(path)
+    page = st.AnnotationWorkspacePage(
+        lambda: None,
+        lambda: None,
+        {"marker": st.DEFAULT_MARKER_STYLE.copy(), "rectangle": st.DEFAULT_RECT_STYLE.copy()},
+        lambda *_: None,
+        st.DEFAULT_IMAGE_QUALITY,
+        False,
+        memory_budget_mb=65536,
+        pixmap_cache_dir=st.PIXMAP_CACHE_DIR,
+    )
+
+    def close_all():
+        while page.tabs.count():
+            widget = page.tabs.widget(0)
+            page.tabs.removeTab(0)
+            widget.deleteLater()
+        QApplication.processEvents()
+
+    samples = []
+    for _ in range(repeat):
+        close_all()
+        start = time.perf_counter()
+        page.open_image_files(paths)
+        samples.append(time.perf_counter() - start)
+    close_all()
+    page.deleteLater()
+    yield _result("open_image_files", {"files": OPEN_BATCH_SIZE, "size": "1080p"}, samples, OPEN_BATCH_SIZE, "images")
+
+
+def bench_config(repeat):
+    config = {
+        "hotkeys": {action_id: {"shortcut": "Ctrl+Alt+A"} for action_id, _ in st.HOTKEY_ACTIONS},
+        "marker_style": st.DEFAULT_MARKER_STYLE.copy(),
+        "rectangle_style": st.DEFAULT_RECT_STYLE.copy(),
+        "image_quality": st.DEFAULT_IMAGE_QUALITY,
+        "save_dir": st.DEFAULT_SAVE_DIR,
+        "workspace_zoom": 1.0,
+    }
+    batch = 50
+    samples = _timed(lambda: [st.save_config(config) for _ in range(batch)], repeat)
+    yield _result("save_config", {"batch": batch}, samples, batch, "saves")
+
+
+def _git_revision():
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=st.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def _isolate_paths(workdir):
+    cache_dir = os.path.join(workdir, "cache")
+    st.CONFIG_FILE = os.path.join(workdir, "config.json")
+    st.DEFAULT_SAVE_DIR = os.path.join(workdir, "screenshots")
+    st.TEMPLATES_DIR = os.path.join(workdir, "templates")
+    st.CACHE_DIR = cache_dir
+    st.PIXMAP_CACHE_DIR = os.path.join(cache_dir, "pixmaps")
+    st.THUMBNAIL_CACHE_DIR = os.path.join(cache_dir, "thumbnails")
+    st.CAPTURE_LIBRARY_PATH = os.path.join(cache_dir, "library.sqlite3")
+    st.WRITE_JOURNAL_PATH = os.path.join(cache_dir, "write_journal.jsonl")
+    st.SESSION_DIR = os.path.join(cache_dir, "session")
+    st.SESSION_JOURNAL_PATH = os.path.join(st.SESSION_DIR, "journal.jsonl")
+    st.RECOMPRESS_STATE_DIR = os.path.join(cache_dir, "recompress")
+    st.PROFILE_DIR = os.path.join(cache_dir, "profile")
+    st._WRITE_JOURNAL = st.WriteJournal(st.WRITE_JOURNAL_PATH)
+
+
+def run_benchmarks(repeat, sizes, only=None):
+    workdir = tempfile.mkdtemp(prefix="snapshot_bench_")
+    _isolate_paths(workdir)
+    suites = {
+        "canvas": lambda: bench_canvas(repeat, sizes),
+        "overlay": lambda: bench_overlay(repeat, sizes),
+        "save": lambda: bench_save(repeat, sizes, workdir),
+        "open": lambda: bench_open_images(repeat, workdir),
+        "config": lambda: bench_config(repeat),
+    }
+    results = []
+    try:
+        for suite_name, suite in suites.items():
+            if only and suite_name not in only:
+                continue
+            for result in suite():
+                result["suite"] = suite_name
+                results.append(result)
+                print(f"{_result_key(result):<60} {result['median_ms']:>10.3f} ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+        "platform": platform.platform(),
+        "qpa": QApplication.platformName(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def _result_key(result):
+    params = ",".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    base_results = {_result_key(item): item for item in baseline.get("results", [])}
+    rows = []
+    regressions = 0
+    for item in current.get("results", []):
+        key = _result_key(item)
+        base = base_results.get(key)
+        if not base or not base.get("median_ms"):
+            rows.append((key, None, item["median_ms"], None, "new"))
+            continue
+        change = item["median_ms"] / base["median_ms"] - 1.0
+        status = "ok"
+        if change > threshold:
+            status = "REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            status = "faster"
+        rows.append((key, base["median_ms"], item["median_ms"], change, status))
+    return rows, regressions
+
+
+def format_comparison(rows):
+    lines = [f"{'benchmark':<60} {'base ms':>10} {'new ms':>10} {'change':>8}  status"]
+    for key, base, new, change, status in rows:
+        base_text = f"{base:.3f}" if base is not None else "-"
+        change_text = f"{change * 100:+.1f}%" if change is not None else "-"
+        lines.append(f"{key:<60} {base_text:>10} {new:>10.3f} {change_text:>8}  {status}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot Studio headless benchmarks")
+    parser.add_argument("--output", "-o", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a previous JSON report")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="regression threshold (0.10 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=None, help="samples per benchmark (default 5, or 3 with --quick)")
+    parser.add_argument("--quick", action="store_true", help="1080p only with fewer repeats")
+    parser.add_argument("--only", nargs="+", choices=("canvas", "overlay", "save", "open", "config"))
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    sizes = ("1080p",) if args.quick else tuple(IMAGE_SIZES)
+    repeat = args.repeat if args.repeat is not None else (3 if args.quick else 5)
+    repeat = max(1, repeat)
+    report = run_benchmarks(repeat, sizes, only=set(args.only or ()))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text)
+    else:
+        print(text)
+    app.processEvents()
+    if not args.compare:
+        return 0
+    with open(args.compare, "r", encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    rows, regressions = compare_reports(baseline, report, args.threshold)
+    print(format_comparison(rows), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
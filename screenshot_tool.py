@@ -1,17 +1,55 @@
 ﻿import ctypes
-from ctypes import wintypes
+import argparse
+import functools
+import hashlib
 import json
+import math
+import multiprocessing
 import os
+import re
+import sqlite3
+import struct
 import sys
-import winreg
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
 from enum import Enum, auto
 
-from PyQt5.QtCore import QPoint, QRect, Qt, pyqtSignal, QTimer, QUrl, QSize, QEvent
+from PyQt5.QtCore import (
+    QPoint,
+    QRect,
+    Qt,
+    pyqtSignal,
+    QTimer,
+    QUrl,
+    QSize,
+    QEvent,
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QAbstractListModel,
+    QModelIndex,
+    QBuffer,
+    QIODevice,
+    QMimeData,
+    QByteArray,
+    QLockFile,
+    QMarginsF,
+    QRectF,
+    QSizeF,
+)
 from PyQt5.QtGui import (
     QColor,
     QGuiApplication,
+    QImage,
+    QImageReader,
+    QImageWriter,
+    QPageSize,
     QPainter,
+    QPdfWriter,
     QPen,
     QPixmap,
     QFont,
@@ -20,6 +58,7 @@ from PyQt5.QtGui import (
     QKeySequence,
     QCursor,
 )
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
 from PyQt5.QtWidgets import (
     QAction,
     QApplication,
@@ -38,8 +77,13 @@ from PyQt5.QtWidgets import (
     QGroupBox,
     QRadioButton,
     QListWidget,
+    QListWidgetItem,
+    QListView,
+    QAbstractItemView,
+    QComboBox,
     QTabWidget,
     QStackedWidget,
+    QStyle,
     QToolBar,
     QVBoxLayout,
     QWidget,
@@ -50,14 +94,49 @@ from PyQt5.QtWidgets import (
     QCheckBox,
     QSystemTrayIcon,
     QMenu,
+    QInputDialog,
+    QProgressDialog,
+    QProgressBar,
 )
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_FILE = os.path.join(BASE_DIR, "config.json")
 DEFAULT_SAVE_DIR = os.path.join(BASE_DIR, "screenshots")
 ICON_PATH = os.path.join(BASE_DIR, "favicon", "favicon.ico")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+PIXMAP_CACHE_DIR = os.path.join(CACHE_DIR, "pixmaps")
+THUMBNAIL_CACHE_DIR = os.path.join(CACHE_DIR, "thumbnails")
+CAPTURE_LIBRARY_PATH = os.path.join(CACHE_DIR, "library.sqlite3")
+WRITE_JOURNAL_PATH = os.path.join(CACHE_DIR, "write_journal.jsonl")
+SESSION_DIR = os.path.join(CACHE_DIR, "session")
+SESSION_JOURNAL_PATH = os.path.join(SESSION_DIR, "journal.jsonl")
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+RECOMPRESS_STATE_DIR = os.path.join(CACHE_DIR, "recompress")
+PROFILE_DIR = os.path.join(CACHE_DIR, "profile")
+INSTANCE_LOCK_PATH = os.path.join(CACHE_DIR, "instance.lock")
+INSTANCE_SERVER_NAME = "CTKSnapshot-" + hashlib.sha1(
+    f"{BASE_DIR}|{os.environ.get('USERNAME') or os.environ.get('USER', '')}".encode("utf-8")
+).hexdigest()[:16]
+INSTANCE_CONNECT_TIMEOUT_MS = 3000
+INSTANCE_COMMANDS = ("capture", "repeat", "scroll", "watch")
+CAPTURE_MODES = ("per_screen", "virtual_desktop")
+DEFAULT_CAPTURE_MODE = "per_screen"
+VIRTUAL_DESKTOP_SCREEN_NAME = "virtual-desktop"
+IMAGE_FILE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff")
+ISSUED_CAPTURE_PATH_LIMIT = 256
 _APP_ICON = None
+_WRITE_JOURNAL = None
+_ISSUED_CAPTURE_PATHS = OrderedDict()
+_CAPTURE_NAME_LOCK = threading.Lock()
+_WORKER_APP = None
+_PROFILER = None
+_NATIVE_MSG_TYPE = None
 CLASSIC_COLORS = [
     "#FF6B6B",
     "#FF9F43",
@@ -72,6 +151,7 @@ CLASSIC_COLORS = [
 PANEL_ACCENTS = {
     "marker": "#1AAE7F",
     "rectangle": "#5F27CD",
+    "redact": "#D35400",
 }
 
 DEFAULT_MARKER_STYLE = {
@@ -90,7 +170,110 @@ DEFAULT_RECT_STYLE = {
     "radius": 8,
 }
 
+REDACT_MODES = ("pixelate", "blur")
+DEFAULT_REDACT_STYLE = {
+    "mode": "pixelate",
+    "strength": 12,
+}
+
 DEFAULT_IMAGE_QUALITY = 95
+DEFAULT_MEMORY_BUDGET_MB = 1024
+RAW_IMAGE_HEADER = struct.Struct("<4sIIII")
+RAW_IMAGE_MAGIC = b"CTKR"
+THUMBNAIL_SIZE = 160
+CLIPBOARD_DOWNSCALE_MAX_EDGE = 1280
+CLIPBOARD_JPEG_QUALITY = 90
+THUMBNAIL_QUALITY = 85
+SESSION_CHECKPOINT_INTERVAL_MS = 3000
+SESSION_COMPACT_BYTES = 512 * 1024
+AUTOSTART_SYNC_DELAY_MS = 3000
+ZOOM_FRAME_INTERVAL_MS = 16
+ZOOM_SETTLE_DELAY_MS = 150
+MARKER_SPRITE_CACHE_BYTES = 32 * 1024 * 1024
+MARKER_SPRITE_ZOOM_BUCKETS_PER_OCTAVE = 2
+REDACTION_CACHE_BYTES = 96 * 1024 * 1024
+REDACTION_TILE_SIZE = 256
+IMAGE_LEDGER_REFRESH_MS = 500
+SCROLL_CAPTURE_INTERVAL_MS = 150
+SCROLL_CAPTURE_MAX_HEIGHT = 30000
+SCROLL_CAPTURE_HASH_MARGIN = 24
+SCROLL_CAPTURE_MIN_OVERLAP = 16
+SCROLL_CAPTURE_MATCH_RATIO = 0.9
+SCROLL_CAPTURE_WHEEL_STEPS = 2
+MOUSEEVENTF_WHEEL = 0x0800
+EDGE_SNAP_RADIUS = 8
+EDGE_SNAP_THRESHOLD = 12
+EDGE_SNAP_MIN_RUN = 12
+EDGE_SNAP_SAMPLE_STEP = 2
+REGION_WATCH_INTERVAL_MS = 1000
+REGION_WATCH_THRESHOLD = 0.5
+REGION_WATCH_GRID = 64
+REGION_WATCH_STRIDE = 2
+EXPORT_TARGETS = OrderedDict(
+    [
+        ("pdf", ("PDF 文档（每个标签页一页）", "PDF 文档 (*.pdf)", "pdf")),
+        ("sheet", ("拼图总览 PNG", "PNG 图片 (*.png)", "png")),
+        ("gif", ("GIF 动画", "GIF 动画 (*.gif)", "gif")),
+    ]
+)
+EXPORT_PDF_DPI = 96
+EXPORT_SHEET_CELL = 360
+EXPORT_SHEET_GAP = 16
+EXPORT_SHEET_LABEL_HEIGHT = 24
+EXPORT_SHEET_MAX_COLUMNS = 6
+EXPORT_GIF_MAX_EDGE = 960
+EXPORT_GIF_FRAME_DELAY_MS = 1500
+REPEAT_DIFF_BLOCK = 16
+REPEAT_DIFF_TOLERANCE = 24
+REPEAT_DIFF_MAX_REGIONS = 24
+REPEAT_DIFF_PADDING = 3
+REPEAT_DIFF_STYLE = {
+    "fill": "#00000000",
+    "border": "#FF3B30",
+    "border_enabled": True,
+    "width": 2,
+    "radius": 0,
+}
+WHEEL_DELTA = 120
+IMAGE_LEDGER_STAGES = OrderedDict(
+    [
+        ("screen_grab", "屏幕截取"),
+        ("selection_crop", "选区裁剪"),
+        ("tab_base", "标签页底图"),
+        ("scaled_preview", "缩放预览"),
+        ("marker_sprites", "序号贴图缓存"),
+        ("redactions", "打码区域缓存"),
+        ("scroll_capture", "滚动截图拼接"),
+        ("repeat_reference", "重复截图参照"),
+        ("export", "多标签导出"),
+        ("clipboard", "剪贴板"),
+    ]
+)
+RECOMPRESS_FORMATS = {
+    "jpg": ("JPG", ".jpg"),
+    "png": ("PNG", ".png"),
+    "webp": ("WEBP", ".webp"),
+}
+RECOMPRESS_SOURCE_FORMATS = {
+    ".jpg": "JPG",
+    ".jpeg": "JPG",
+    ".png": "PNG",
+    ".webp": "WEBP",
+    ".bmp": "BMP",
+    ".tif": "TIFF",
+    ".tiff": "TIFF",
+}
+RECOMPRESS_MIN_SAVING = 0.05
+PROFILE_TRACE_LIMIT = 200000
+PROFILE_HOT_PATHS = (
+    ("AnnotationCanvas", "paintEvent"),
+    ("AnnotationCanvas", "export_pixmap"),
+    ("AnnotationTab", "_auto_save_pixmap"),
+    ("AnnotationTab", "save_annotated_image"),
+    ("ScreenSnapApp", "_grab_screen_pixmap"),
+    ("CaptureOverlay", "paintEvent"),
+    (None, "save_config"),
+)
 
 
 def load_config():
@@ -108,10 +291,417 @@ def save_config(data):
         json.dump(data, handle, indent=2, ensure_ascii=False)
 
 
+def _write_raw_image(image: QImage, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = image.sizeInBytes()
+    bits = image.constBits()
+    bits.setsize(size)
+    with open(path, "wb") as handle:
+        handle.write(
+            RAW_IMAGE_HEADER.pack(
+                RAW_IMAGE_MAGIC, image.width(), image.height(), image.bytesPerLine(), int(image.format())
+            )
+        )
+        handle.write(memoryview(bits))
+    return size
+
+
+def _encode_image(image, fmt, quality=-1):
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    ok = image.save(buffer, fmt, quality)
+    buffer.close()
+    if not ok:
+        return None
+    return bytes(buffer.data())
+
+
+def _write_file_atomic(path, data):
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+class DurationHistogram:
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = {}
+
+    def add(self, elapsed_ns):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if self.min_ns is None or elapsed_ns < self.min_ns:
+            self.min_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        if elapsed_ns < 4:
+            bucket = max(0, elapsed_ns)
+        else:
+            shift = elapsed_ns.bit_length() - 3
+            bucket = shift * 4 + (elapsed_ns >> shift)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    @staticmethod
+    def bucket_upper_ns(bucket):
+        if bucket < 4:
+            return bucket + 1
+        shift = bucket // 4 - 1
+        return (bucket % 4 + 5) << shift
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0
+        threshold = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= threshold:
+                return min(self.max_ns, self.bucket_upper_ns(bucket))
+        return self.max_ns
+
+    def to_dict(self):
+        to_ms = 1e-6
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ns * to_ms, 3),
+            "mean_ms": round(self.total_ns * to_ms / self.count, 4) if self.count else 0.0,
+            "min_ms": round((self.min_ns or 0) * to_ms, 4),
+            "max_ms": round(self.max_ns * to_ms, 4),
+            "p50_ms": round(self.percentile(0.5) * to_ms, 4),
+            "p90_ms": round(self.percentile(0.9) * to_ms, 4),
+            "p99_ms": round(self.percentile(0.99) * to_ms, 4),
+            "histogram_us": {
+                f"<{self.bucket_upper_ns(bucket) / 1000:g}": self.buckets[bucket] for bucket in sorted(self.buckets)
+            },
+        }
+
+
+class HotPathProfiler:
+    def __init__(self, trace=False, directory=PROFILE_DIR):
+        self.trace_enabled = bool(trace)
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._trace_events = []
+        self._dropped_events = 0
+        self._originals = []
+        self._started_at = datetime.now()
+        self._started_ns = time.perf_counter_ns()
+
+    def record(self, name, start_ns, end_ns):
+        elapsed = end_ns - start_ns
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = DurationHistogram()
+            histogram.add(elapsed)
+            if not self.trace_enabled:
+                return
+            if len(self._trace_events) >= PROFILE_TRACE_LIMIT:
+                self._dropped_events += 1
+                return
+            self._trace_events.append((name, start_ns, elapsed, threading.get_ident()))
+
+    def _wrap(self, name, func):
+        record = self.record
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, clock())
+
+        return timed
+
+    def install(self):
+        if self._originals:
+            return
+        namespace = globals()
+        for owner_name, attr in PROFILE_HOT_PATHS:
+            owner = namespace.get(owner_name) if owner_name else None
+            original = getattr(owner, attr) if owner else namespace.get(attr)
+            if original is None:
+                continue
+            name = f"{owner_name}.{attr}" if owner_name else attr
+            wrapped = self._wrap(name, original)
+            if owner:
+                setattr(owner, attr, wrapped)
+            else:
+                namespace[attr] = wrapped
+            self._originals.append((owner, attr, original))
+
+    def uninstall(self):
+        namespace = globals()
+        while self._originals:
+            owner, attr, original = self._originals.pop()
+            if owner:
+                setattr(owner, attr, original)
+            else:
+                namespace[attr] = original
+
+    def report(self):
+        with self._lock:
+            paths = {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())}
+            dropped = self._dropped_events
+        return {
+            "started_at": self._started_at.isoformat(timespec="seconds"),
+            "duration_s": round((time.perf_counter_ns() - self._started_ns) / 1e9, 3),
+            "pid": os.getpid(),
+            "paths": paths,
+            "dropped_trace_events": dropped,
+        }
+
+    def _trace_document(self):
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._trace_events)
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": "hotpath",
+                    "ph": "X",
+                    "ts": (start - self._started_ns) / 1000.0,
+                    "dur": elapsed / 1000.0,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, elapsed, tid in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write(self):
+        os.makedirs(self._directory, exist_ok=True)
+        stamp = self._started_at.strftime("%Y%m%d_%H%M%S")
+        report = self.report()
+        trace_path = None
+        if self.trace_enabled:
+            trace_path = os.path.join(self._directory, f"trace_{stamp}.json")
+            data = json.dumps(self._trace_document()).encode("utf-8")
+            if not _write_file_atomic(trace_path, data):
+                trace_path = None
+        report["trace_file"] = trace_path
+        report_path = os.path.join(self._directory, f"profile_{stamp}.json")
+        data = json.dumps(report, indent=2, ensure_ascii=False).encode("utf-8")
+        if not _write_file_atomic(report_path, data):
+            return None, trace_path
+        return report_path, trace_path
+
+
+def start_profiler(trace=False):
+    global _PROFILER
+    if _PROFILER:
+        _PROFILER.trace_enabled = bool(trace)
+        return _PROFILER
+    _PROFILER = HotPathProfiler(trace=trace)
+    _PROFILER.install()
+    return _PROFILER
+
+
+def stop_profiler():
+    global _PROFILER
+    profiler = _PROFILER
+    if not profiler:
+        return None, None
+    _PROFILER = None
+    profiler.uninstall()
+    return profiler.write()
+
+
+def _unique_output_path(directory, stem, extension, claimed=()):
+    sequence = 1
+    while True:
+        suffix = "" if sequence == 1 else f"_{sequence:02d}"
+        path = os.path.join(directory, f"{stem}{suffix}.{extension}")
+        if os.path.normcase(path) not in claimed and not os.path.exists(path):
+            return path
+        sequence += 1
+
+
+def _unique_capture_path(save_dir, prefix="screenshot", extension="jpg"):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    with _CAPTURE_NAME_LOCK:
+        sequence = 1
+        while True:
+            suffix = "" if sequence == 1 else f"_{sequence:02d}"
+            path = os.path.join(save_dir, f"{prefix}_{timestamp}{suffix}.{extension}")
+            if path not in _ISSUED_CAPTURE_PATHS and not os.path.exists(path):
+                _ISSUED_CAPTURE_PATHS[path] = None
+                while len(_ISSUED_CAPTURE_PATHS) > ISSUED_CAPTURE_PATH_LIMIT:
+                    _ISSUED_CAPTURE_PATHS.popitem(last=False)
+                return path
+            sequence += 1
+
+
+class WriteJournal:
+    def __init__(self, path=WRITE_JOURNAL_PATH):
+        self._path = path
+        self._lock = threading.Lock()
+        self._handle = None
+        self._pending = 0
+
+    def write_atomic(self, path, data):
+        entry_id = uuid.uuid4().hex
+        temp_path = f"{path}.{entry_id}.tmp"
+        with self._lock:
+            self._append({"op": "begin", "id": entry_id, "path": path, "temp": temp_path}, sync=True)
+            self._pending += 1
+        try:
+            with open(temp_path, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+        except OSError:
+            self._discard(temp_path)
+            with self._lock:
+                self._append({"op": "abort", "id": entry_id})
+                self._pending -= 1
+            return False
+        with self._lock:
+            self._append({"op": "commit", "id": entry_id}, sync=True)
+        try:
+            os.replace(temp_path, path)
+        except OSError:
+            self._discard(temp_path)
+            with self._lock:
+                self._append({"op": "abort", "id": entry_id})
+                self._pending -= 1
+            return False
+        with self._lock:
+            self._append({"op": "done", "id": entry_id})
+            self._pending -= 1
+            self._maybe_truncate()
+        return True
+
+    def replay(self):
+        with self._lock:
+            self._close()
+            entries = OrderedDict()
+            try:
+                with open(self._path, "r", encoding="utf-8") as handle:
+                    for line in handle:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            break
+                        entry = entries.setdefault(record.get("id"), {})
+                        if record.get("op") == "begin":
+                            entry.update(path=record.get("path"), temp=record.get("temp"))
+                        entry[record.get("op")] = True
+            except OSError:
+                return []
+            recovered = []
+            for entry in entries.values():
+                temp_path = entry.get("temp")
+                if not temp_path or entry.get("done") or entry.get("abort"):
+                    continue
+                if entry.get("commit") and os.path.exists(temp_path):
+                    try:
+                        os.replace(temp_path, entry["path"])
+                        recovered.append(entry["path"])
+                    except OSError:
+                        pass
+                else:
+                    self._discard(temp_path)
+            self._discard(self._path)
+            self._pending = 0
+            return recovered
+
+    def _append(self, record, sync=False):
+        if self._handle is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._handle = open(self._path, "a", encoding="utf-8")
+        self._handle.write(json.dumps(record) + "\n")
+        self._handle.flush()
+        if sync:
+            os.fsync(self._handle.fileno())
+
+    def _maybe_truncate(self):
+        if self._pending or self._handle is None or self._handle.tell() < 64 * 1024:
+            return
+        self._close()
+        self._discard(self._path)
+
+    def _close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_write_journal():
+    global _WRITE_JOURNAL
+    if _WRITE_JOURNAL is None:
+        _WRITE_JOURNAL = WriteJournal()
+    return _WRITE_JOURNAL
+
+
+def save_image_atomic(image, path, fmt, quality=-1):
+    data = _encode_image(image, fmt, quality)
+    if data is None:
+        return None
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not get_write_journal().write_atomic(path, data):
+        return None
+    return data
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _read_raw_image(path):
+    with open(path, "rb") as handle:
+        header = handle.read(RAW_IMAGE_HEADER.size)
+        if len(header) != RAW_IMAGE_HEADER.size:
+            return QImage()
+        magic, width, height, bytes_per_line, fmt = RAW_IMAGE_HEADER.unpack(header)
+        if magic != RAW_IMAGE_MAGIC:
+            return QImage()
+        image = QImage(width, height, QImage.Format(fmt))
+        if image.isNull() or image.bytesPerLine() != bytes_per_line:
+            return QImage()
+        bits = image.bits()
+        bits.setsize(image.sizeInBytes())
+        if handle.readinto(memoryview(bits)) != image.sizeInBytes():
+            return QImage()
+    return image
+
+
 class Tool(Enum):
     NONE = auto()
     RECTANGLE = auto()
     MARKER = auto()
+    REDACT = auto()
 
 MODIFIER_ORDER = [
     (Qt.ControlModifier, "Ctrl"),
@@ -186,6 +776,8 @@ DISPLAY_NAME_OVERRIDES = {
 HOTKEY_ACTIONS = [
     ("capture", "区域截图"),
     ("repeat_capture", "重复截图"),
+    ("scroll_capture", "滚动截图"),
+    ("region_watch", "区域监视"),
 ]
 
 WM_HOTKEY = 0x0312
@@ -317,6 +909,15 @@ class GlobalHotkeyManager:
             self._window._on_hotkey_trigger(action_id)
 
 
+def _native_msg_type():
+    global _NATIVE_MSG_TYPE
+    if _NATIVE_MSG_TYPE is None:
+        from ctypes import wintypes
+
+        _NATIVE_MSG_TYPE = wintypes.MSG
+    return _NATIVE_MSG_TYPE
+
+
 def get_app_icon():
     global _APP_ICON
     if _APP_ICON is None:
@@ -460,6 +1061,12 @@ class GeneralSettingsPage(QWidget):
         auto_start_enabled,
         close_behavior,
         exit_unsaved_policy,
+        restore_session_enabled=True,
+        capture_mode=DEFAULT_CAPTURE_MODE,
+        repeat_diff_enabled=False,
+        region_watch_interval_ms=REGION_WATCH_INTERVAL_MS,
+        region_watch_threshold=REGION_WATCH_THRESHOLD,
+        region_watch_open_tabs=False,
         parent=None,
     ):
         super().__init__(parent)
@@ -513,6 +1120,72 @@ class GeneralSettingsPage(QWidget):
         layout.addWidget(self.startup_checkbox)
         layout.addWidget(startup_hint)
 
+        layout.addSpacing(16)
+
+        self.restore_session_checkbox = QCheckBox("启动时恢复上次打开的标签页")
+        self.restore_session_checkbox.setChecked(restore_session_enabled)
+        restore_hint = QLabel("标签页会立即列出，图片与标注在首次查看时才加载。")
+        restore_hint.setWordWrap(True)
+        restore_hint.setStyleSheet("color: #777777; font-size: 12px;")
+        layout.addWidget(self.restore_session_checkbox)
+        layout.addWidget(restore_hint)
+
+        layout.addSpacing(16)
+
+        capture_group = QGroupBox("多显示器截图")
+        capture_group_layout = QVBoxLayout(capture_group)
+        self.capture_per_screen_radio = QRadioButton("每块屏幕单独选区（默认）")
+        self.capture_virtual_radio = QRadioButton("整个虚拟桌面拼接为一张图，选区可跨越多块屏幕")
+        capture_group_layout.addWidget(self.capture_per_screen_radio)
+        capture_group_layout.addWidget(self.capture_virtual_radio)
+        if capture_mode == "virtual_desktop":
+            self.capture_virtual_radio.setChecked(True)
+        else:
+            self.capture_per_screen_radio.setChecked(True)
+        layout.addWidget(capture_group)
+
+        layout.addSpacing(16)
+
+        self.repeat_diff_checkbox = QCheckBox("重复截图时与上一张对比，自动框出变化区域")
+        self.repeat_diff_checkbox.setChecked(repeat_diff_enabled)
+        repeat_diff_hint = QLabel("同一选区连续重复截图时，新标签页会用红框标出与上一张不同的地方（需要 numpy）。")
+        repeat_diff_hint.setWordWrap(True)
+        repeat_diff_hint.setStyleSheet("color: #777777; font-size: 12px;")
+        layout.addWidget(self.repeat_diff_checkbox)
+        layout.addWidget(repeat_diff_hint)
+
+        layout.addSpacing(16)
+
+        watch_group = QGroupBox("区域监视")
+        watch_layout = QVBoxLayout(watch_group)
+        watch_row = QHBoxLayout()
+        watch_row.addWidget(QLabel("采样间隔"))
+        self.watch_interval_spin = QSpinBox()
+        self.watch_interval_spin.setRange(200, 60000)
+        self.watch_interval_spin.setSingleStep(100)
+        self.watch_interval_spin.setSuffix(" ms")
+        self.watch_interval_spin.setValue(int(region_watch_interval_ms))
+        watch_row.addWidget(self.watch_interval_spin)
+        watch_row.addSpacing(16)
+        watch_row.addWidget(QLabel("变化阈值"))
+        self.watch_threshold_spin = QDoubleSpinBox()
+        self.watch_threshold_spin.setRange(0.0, 100.0)
+        self.watch_threshold_spin.setSingleStep(0.5)
+        self.watch_threshold_spin.setDecimals(1)
+        self.watch_threshold_spin.setSuffix(" %")
+        self.watch_threshold_spin.setValue(float(region_watch_threshold))
+        watch_row.addWidget(self.watch_threshold_spin)
+        watch_row.addStretch()
+        watch_layout.addLayout(watch_row)
+        self.watch_open_tabs_checkbox = QCheckBox("自动截图后同时在标注工作台打开")
+        self.watch_open_tabs_checkbox.setChecked(region_watch_open_tabs)
+        watch_layout.addWidget(self.watch_open_tabs_checkbox)
+        watch_hint = QLabel("监视期间按间隔对上次选区做缩略采样，变化比例超过阈值时自动保存一张截图；阈值设为 0 表示任何可见变化都截图（需要 numpy）。")
+        watch_hint.setWordWrap(True)
+        watch_hint.setStyleSheet("color: #777777; font-size: 12px;")
+        watch_layout.addWidget(watch_hint)
+        layout.addWidget(watch_group)
+
         layout.addSpacing(20)
 
         close_group = QGroupBox(u"\u5173\u95ed\u4e3b\u7a97\u53e3\u65f6")
@@ -582,6 +1255,12 @@ class GeneralSettingsPage(QWidget):
             "auto_start_enabled": self.startup_checkbox.isChecked(),
             "close_behavior": "exit" if self.close_exit_radio.isChecked() else "tray",
             "exit_unsaved_policy": "discard_all" if self.exit_discard_radio.isChecked() else "save_all",
+            "restore_session_enabled": self.restore_session_checkbox.isChecked(),
+            "capture_mode": "virtual_desktop" if self.capture_virtual_radio.isChecked() else "per_screen",
+            "repeat_diff_enabled": self.repeat_diff_checkbox.isChecked(),
+            "region_watch_interval_ms": self.watch_interval_spin.value(),
+            "region_watch_threshold": self.watch_threshold_spin.value(),
+            "region_watch_open_tabs": self.watch_open_tabs_checkbox.isChecked(),
         }
 
 
@@ -817,6 +1496,270 @@ class QualitySettingsPage(QWidget):
     def get_quality(self):
         return self._quality
 
+
+class PerformanceSettingsPage(QWidget):
+    def __init__(self, memory_budget_mb, undo_limit=None, profiling_enabled=False, profiling_trace=False, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout()
+
+        title = QLabel("性能与内存")
+        title.setStyleSheet("font-size: 18px; font-weight: 600;")
+        layout.addWidget(title)
+
+        desc = QLabel("限制工作台中图片占用的内存。超过上限时，最久未查看的标签页图片会暂存到本地缓存，切换回该标签页时自动加载。")
+        desc.setWordWrap(True)
+        desc.setStyleSheet("color: #4a4a4a;")
+        layout.addWidget(desc)
+
+        memory_row = QHBoxLayout()
+        memory_label = QLabel("图片内存上限")
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(ImageMemoryManager.MIN_BUDGET_MB, ImageMemoryManager.MAX_BUDGET_MB)
+        self.memory_spin.setSingleStep(256)
+        self.memory_spin.setSuffix(" MB")
+        self.memory_spin.setValue(self._clamp_budget(memory_budget_mb))
+        memory_row.addWidget(memory_label)
+        memory_row.addWidget(self.memory_spin)
+        memory_row.addStretch()
+        layout.addLayout(memory_row)
+
+        undo_row = QHBoxLayout()
+        undo_label = QLabel("每个标签页的撤销步数")
+        self.undo_spin = QSpinBox()
+        self.undo_spin.setRange(AnnotationHistory.MIN_LIMIT, AnnotationHistory.MAX_LIMIT)
+        self.undo_spin.setSingleStep(50)
+        self.undo_spin.setSuffix(" 步")
+        self.undo_spin.setValue(AnnotationHistory(undo_limit).limit)
+        undo_row.addWidget(undo_label)
+        undo_row.addWidget(self.undo_spin)
+        undo_row.addStretch()
+        layout.addLayout(undo_row)
+
+        profiling_group = QGroupBox("性能分析")
+        profiling_layout = QVBoxLayout()
+        self.profiling_checkbox = QCheckBox("记录关键路径耗时（退出时写入 cache/profile）")
+        self.profiling_checkbox.setChecked(bool(profiling_enabled))
+        self.trace_checkbox = QCheckBox("同时生成 Chrome 跟踪文件（chrome://tracing）")
+        self.trace_checkbox.setChecked(bool(profiling_trace))
+        self.trace_checkbox.setEnabled(self.profiling_checkbox.isChecked())
+        self.profiling_checkbox.toggled.connect(self.trace_checkbox.setEnabled)
+        profiling_layout.addWidget(self.profiling_checkbox)
+        profiling_layout.addWidget(self.trace_checkbox)
+        memory_view_btn = QPushButton("查看图像内存…")
+        memory_view_btn.clicked.connect(self._show_memory_view)
+        profiling_layout.addWidget(memory_view_btn)
+        profiling_group.setLayout(profiling_layout)
+        layout.addWidget(profiling_group)
+
+        layout.addStretch()
+        self.setLayout(layout)
+
+    def _clamp_budget(self, value):
+        return ImageMemoryManager.clamp_budget_mb(value)
+
+    def _show_memory_view(self):
+        ImageMemoryDialog(self).exec_()
+
+    def get_settings(self):
+        return {
+            "memory_budget_mb": self.memory_spin.value(),
+            "undo_limit": self.undo_spin.value(),
+            "profiling_enabled": self.profiling_checkbox.isChecked(),
+            "profiling_trace": self.trace_checkbox.isChecked(),
+        }
+
+
+class RecompressSignals(QObject):
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+
+
+class RecompressTask(QRunnable):
+    def __init__(self, recompressor, cancel_event):
+        super().__init__()
+        self.signals = RecompressSignals()
+        self._recompressor = recompressor
+        self._cancel_event = cancel_event
+
+    def run(self):
+        try:
+            stats = self._recompressor.run(progress=self.signals.progress.emit, cancel_event=self._cancel_event)
+        except (OSError, RuntimeError) as exc:
+            stats = {"error": str(exc)}
+        self.signals.finished.emit(stats)
+
+
+class BatchRecompressPage(QWidget):
+    def __init__(self, save_dir, parent=None):
+        super().__init__(parent)
+        self._source_dir = save_dir or DEFAULT_SAVE_DIR
+        self._output_dir = ""
+        self._cancel_event = None
+        self._task = None
+        layout = QVBoxLayout()
+
+        title = QLabel("批量重新压缩")
+        title.setStyleSheet("font-size: 18px; font-weight: 600;")
+        layout.addWidget(title)
+
+        desc = QLabel("对目录（含子目录）中的图片重新编码、缩放或转换格式。处理在后台多进程中进行，保留原文件的修改时间；中断后以相同参数再次运行会从断点继续。")
+        desc.setWordWrap(True)
+        desc.setStyleSheet("color: #4a4a4a;")
+        layout.addWidget(desc)
+
+        source_row = QHBoxLayout()
+        source_row.addWidget(QLabel("源目录"))
+        self.source_edit = QLineEdit(self._source_dir)
+        self.source_edit.setReadOnly(True)
+        source_btn = QPushButton("选择目录")
+        source_btn.clicked.connect(self._choose_source)
+        source_row.addWidget(self.source_edit, 1)
+        source_row.addWidget(source_btn)
+        layout.addLayout(source_row)
+
+        output_row = QHBoxLayout()
+        output_row.addWidget(QLabel("输出目录"))
+        self.output_edit = QLineEdit()
+        self.output_edit.setReadOnly(True)
+        self.output_edit.setPlaceholderText("请选择输出目录")
+        self.output_btn = QPushButton("选择目录")
+        self.output_btn.clicked.connect(self._choose_output)
+        output_row.addWidget(self.output_edit, 1)
+        output_row.addWidget(self.output_btn)
+        layout.addLayout(output_row)
+
+        self.in_place_checkbox = QCheckBox("直接替换原文件（体积未明显变小的文件保持不变）")
+        self.in_place_checkbox.toggled.connect(self._update_controls)
+        layout.addWidget(self.in_place_checkbox)
+        self.replace_checkbox = QCheckBox("转换格式成功后删除原文件")
+        layout.addWidget(self.replace_checkbox)
+
+        options_row = QHBoxLayout()
+        options_row.addWidget(QLabel("格式"))
+        self.format_combo = QComboBox()
+        self.format_combo.addItem("保持原格式", None)
+        for key in RECOMPRESS_FORMATS:
+            self.format_combo.addItem(key.upper(), key)
+        self.format_combo.currentIndexChanged.connect(self._update_controls)
+        options_row.addWidget(self.format_combo)
+        options_row.addSpacing(12)
+        options_row.addWidget(QLabel("质量"))
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(10, 100)
+        self.quality_spin.setValue(85)
+        options_row.addWidget(self.quality_spin)
+        options_row.addSpacing(12)
+        options_row.addWidget(QLabel("最长边"))
+        self.edge_spin = QSpinBox()
+        self.edge_spin.setRange(0, 16384)
+        self.edge_spin.setSingleStep(160)
+        self.edge_spin.setSpecialValueText("不缩放")
+        self.edge_spin.setSuffix(" px")
+        options_row.addWidget(self.edge_spin)
+        options_row.addStretch()
+        layout.addLayout(options_row)
+
+        action_row = QHBoxLayout()
+        self.start_btn = QPushButton("开始处理")
+        self.start_btn.clicked.connect(self._toggle_run)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        action_row.addWidget(self.start_btn)
+        action_row.addWidget(self.progress_bar, 1)
+        layout.addLayout(action_row)
+
+        self.status_label = QLabel("")
+        self.status_label.setWordWrap(True)
+        self.status_label.setStyleSheet("color: #4a4a4a;")
+        layout.addWidget(self.status_label)
+
+        layout.addStretch()
+        self.setLayout(layout)
+        self._update_controls()
+
+    def _choose_source(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择源目录", self._source_dir)
+        if folder:
+            self._source_dir = folder
+            self.source_edit.setText(folder)
+
+    def _choose_output(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择输出目录", self._output_dir or self._source_dir)
+        if folder:
+            self._output_dir = folder
+            self.output_edit.setText(folder)
+
+    def _update_controls(self, _=None):
+        in_place = self.in_place_checkbox.isChecked()
+        self.output_edit.setEnabled(not in_place)
+        self.output_btn.setEnabled(not in_place)
+        converting = in_place and self.format_combo.currentData() is not None
+        self.replace_checkbox.setEnabled(converting)
+        if not converting:
+            self.replace_checkbox.setChecked(False)
+
+    def _toggle_run(self):
+        if self._task is not None:
+            self._cancel_event.set()
+            self.start_btn.setEnabled(False)
+            self.status_label.setText("正在停止，等待进行中的图片处理完成…")
+            return
+        in_place = self.in_place_checkbox.isChecked()
+        if not in_place and not self._output_dir:
+            QMessageBox.warning(self, "批量重新压缩", "请先选择输出目录，或勾选直接替换原文件。")
+            return
+        if in_place:
+            message = "将直接替换源目录中的图片，是否继续？"
+            if self.replace_checkbox.isChecked():
+                message = "转换后的图片会替换源目录中的原文件（原文件将被删除），是否继续？"
+            reply = QMessageBox.question(self, "批量重新压缩", message)
+            if reply != QMessageBox.Yes:
+                return
+        recompressor = BatchRecompressor(
+            self._source_dir,
+            output_dir=None if in_place else self._output_dir,
+            fmt=self.format_combo.currentData(),
+            quality=self.quality_spin.value(),
+            max_edge=self.edge_spin.value(),
+            replace_originals=self.replace_checkbox.isChecked(),
+        )
+        self._cancel_event = threading.Event()
+        self._task = RecompressTask(recompressor, self._cancel_event)
+        self._task.signals.progress.connect(self._on_progress)
+        self._task.signals.finished.connect(self._on_finished)
+        self.start_btn.setText("停止")
+        self.progress_bar.setValue(0)
+        self.status_label.setText("正在扫描目录…")
+        QThreadPool.globalInstance().start(self._task)
+
+    def _on_progress(self, stats):
+        pending = max(1, stats["total"] - stats["resumed"])
+        self.progress_bar.setMaximum(pending)
+        self.progress_bar.setValue(stats["processed"])
+        elapsed = max(stats["elapsed"], 0.001)
+        self.status_label.setText(
+            f"{stats['processed']}/{pending} 张，{stats['processed'] / elapsed:.1f} 张/秒，"
+            f"{stats['bytes_in'] / elapsed / (1024 * 1024):.1f} MB/秒"
+        )
+
+    def _on_finished(self, stats):
+        self._task = None
+        self._cancel_event = None
+        self.start_btn.setText("开始处理")
+        self.start_btn.setEnabled(True)
+        if "error" in stats:
+            self.status_label.setText(f"处理失败：{stats['error']}")
+            return
+        report = format_recompress_report(stats)
+        if stats["failed"]:
+            report += "\n" + "\n".join(stats["failed"][:5])
+        self.status_label.setText(report)
+
+    def cancel(self):
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+
 class SettingsDialog(QDialog):
     def __init__(self, parent, config):
         super().__init__(parent)
@@ -831,6 +1774,18 @@ class SettingsDialog(QDialog):
             "auto_start_enabled": config.get("auto_start_enabled", False),
             "close_behavior": config.get("close_behavior", "tray"),
             "exit_unsaved_policy": config.get("exit_unsaved_policy", "save_all"),
+            "restore_session_enabled": config.get("restore_session_enabled", True),
+            "capture_mode": config.get("capture_mode", DEFAULT_CAPTURE_MODE),
+            "repeat_diff_enabled": config.get("repeat_diff_enabled", False),
+            "region_watch_interval_ms": config.get("region_watch_interval_ms", REGION_WATCH_INTERVAL_MS),
+            "region_watch_threshold": config.get("region_watch_threshold", REGION_WATCH_THRESHOLD),
+            "region_watch_open_tabs": config.get("region_watch_open_tabs", False),
+        }
+        self._performance_settings = {
+            "memory_budget_mb": config.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB),
+            "undo_limit": config.get("undo_limit", AnnotationHistory.DEFAULT_LIMIT),
+            "profiling_enabled": config.get("profiling_enabled", False),
+            "profiling_trace": config.get("profiling_trace", False),
         }
         layout = QVBoxLayout()
 
@@ -843,6 +1798,8 @@ class SettingsDialog(QDialog):
         self.nav_list.addItem("常规")
         self.nav_list.addItem("快捷键")
         self.nav_list.addItem("质量")
+        self.nav_list.addItem("性能")
+        self.nav_list.addItem("批处理")
         self.nav_list.setFixedWidth(170)
         self.nav_list.setStyleSheet(
             "QListWidget { border: 1px solid #e0e0e0; } "
@@ -863,12 +1820,27 @@ class SettingsDialog(QDialog):
             self._general_settings["auto_start_enabled"],
             self._general_settings["close_behavior"],
             self._general_settings["exit_unsaved_policy"],
+            self._general_settings["restore_session_enabled"],
+            self._general_settings["capture_mode"],
+            self._general_settings["repeat_diff_enabled"],
+            self._general_settings["region_watch_interval_ms"],
+            self._general_settings["region_watch_threshold"],
+            self._general_settings["region_watch_open_tabs"],
         )
         self.hotkey_page = HotkeySettingsPage(config.get("hotkeys", {}))
         self.quality_page = QualitySettingsPage(self._quality_value)
+        self.performance_page = PerformanceSettingsPage(
+            self._performance_settings["memory_budget_mb"],
+            self._performance_settings["undo_limit"],
+            self._performance_settings["profiling_enabled"],
+            self._performance_settings["profiling_trace"],
+        )
         self.stack.addWidget(self.general_page)
         self.stack.addWidget(self.hotkey_page)
         self.stack.addWidget(self.quality_page)
+        self.batch_page = BatchRecompressPage(self._general_settings["save_dir"])
+        self.stack.addWidget(self.performance_page)
+        self.stack.addWidget(self.batch_page)
         content_layout.addWidget(self.stack, 1)
 
         layout.addLayout(content_layout)
@@ -896,8 +1868,13 @@ class SettingsDialog(QDialog):
         self._general_settings = general_settings
         self._hotkey_result = self.hotkey_page.get_hotkeys()
         self._quality_value = self.quality_page.get_quality()
+        self._performance_settings = self.performance_page.get_settings()
         super().accept()
 
+    def done(self, result):
+        self.batch_page.cancel()
+        super().done(result)
+
     def get_hotkeys(self):
         return self._hotkey_result
 
@@ -907,6 +1884,9 @@ class SettingsDialog(QDialog):
     def get_general_settings(self):
         return self._general_settings
 
+    def get_performance_settings(self):
+        return self._performance_settings
+
 class ActionButton(QPushButton):
     def __init__(self, title, subtitle="", callback=None, enabled=True):
         super().__init__()
@@ -927,8 +1907,11 @@ class ActionButton(QPushButton):
 
 class HomePage(QWidget):
     openFolderRequested = pyqtSignal()
+    openGalleryRequested = pyqtSignal()
     captureRequested = pyqtSignal()
     repeatRequested = pyqtSignal()
+    scrollRequested = pyqtSignal()
+    watchRequested = pyqtSignal()
     openSettingsRequested = pyqtSignal()
     openWorkspaceRequested = pyqtSignal()
     openImagesRequested = pyqtSignal()
@@ -961,6 +1944,10 @@ class HomePage(QWidget):
         capture_layout.addWidget(ActionButton("区域截图", "选择屏幕区域", self.captureRequested.emit))
         self.repeat_button = ActionButton("重复上次截取", "使用上一次选择的矩形区域", self.repeatRequested.emit, enabled=False)
         capture_layout.addWidget(self.repeat_button)
+        self.scroll_button = ActionButton("滚动截图", "沿用上次选区，滚动页面拼接长图", self.scrollRequested.emit, enabled=False)
+        capture_layout.addWidget(self.scroll_button)
+        self.watch_button = ActionButton("区域监视", "沿用上次选区，画面变化时自动截图", self.watchRequested.emit, enabled=False)
+        capture_layout.addWidget(self.watch_button)
         capture_layout.addStretch()
         content_layout.addLayout(capture_layout, 1)
 
@@ -968,6 +1955,7 @@ class HomePage(QWidget):
         tools_label = QLabel("标注管理")
         tools_label.setStyleSheet("font-size: 18px; font-weight: 600;")
         tools_layout.addWidget(tools_label)
+        tools_layout.addWidget(ActionButton("截图图库", "浏览保存目录中的截图", self.openGalleryRequested.emit))
         tools_layout.addWidget(ActionButton("打开保存目录", "快速查看文件", self.openFolderRequested.emit))
         tools_layout.addWidget(ActionButton("系统设置", "热键、自定义流程", self.openSettingsRequested.emit))
         tools_layout.addWidget(ActionButton("标注工作台", "查看历史截图并继续标注", self.openWorkspaceRequested.emit))
@@ -983,6 +1971,8 @@ class HomePage(QWidget):
         self.setLayout(layout)
     def set_repeat_enabled(self, enabled):
         self.repeat_button.setEnabled(enabled)
+        self.scroll_button.setEnabled(enabled)
+        self.watch_button.setEnabled(enabled)
 
     def set_hotkey_summary(self, text):
         self.hotkey_summary_label.setText(text)
@@ -1030,15 +2020,1037 @@ class AboutPage(QWidget):
         self.setLayout(layout)
 
 
+def _copy_shapes(shapes):
+    copied = []
+    for shape in shapes:
+        copied.append(
+            {
+                key: type(value)(value) if isinstance(value, (QColor, QRect, QPoint)) else value
+                for key, value in shape.items()
+            }
+        )
+    return copied
+
+
+def _serialize_value(value):
+    if isinstance(value, QColor):
+        return {"color": value.name(QColor.HexArgb)}
+    if isinstance(value, QRect):
+        return {"rect": [value.x(), value.y(), value.width(), value.height()]}
+    if isinstance(value, QPoint):
+        return {"point": [value.x(), value.y()]}
+    return value
+
+
+def _deserialize_value(value):
+    if isinstance(value, dict):
+        if "color" in value:
+            return QColor(value["color"])
+        if "rect" in value:
+            return QRect(*value["rect"])
+        if "point" in value:
+            return QPoint(*value["point"])
+    return value
+
+
+def _serialize_shapes(shapes):
+    return [{key: _serialize_value(value) for key, value in shape.items()} for shape in shapes]
+
+
+def _deserialize_shapes(shapes):
+    return [{key: _deserialize_value(value) for key, value in shape.items()} for shape in shapes]
+
+
+class ImageMemoryLedger:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {stage: {} for stage in IMAGE_LEDGER_STAGES}
+        self._sources = {}
+        self._peak = 0
+        self._capture_peak = None
+        self.last_capture_peak = 0
+
+    @staticmethod
+    def image_bytes(image):
+        if image is None or image.isNull():
+            return 0
+        return image.width() * image.height() * max(1, image.depth()) // 8
+
+    def acquire(self, stage, key, image):
+        with self._lock:
+            self._entries.setdefault(stage, {})[key] = self.image_bytes(image)
+        self.sample()
+
+    def release(self, stage, key):
+        with self._lock:
+            self._entries.get(stage, {}).pop(key, None)
+
+    def add_source(self, stage, callback, in_peak=True):
+        self._sources[stage] = (callback, in_peak)
+
+    def stage_bytes(self, peak_only=False):
+        with self._lock:
+            totals = OrderedDict((stage, sum(entries.values())) for stage, entries in self._entries.items())
+        for stage, (callback, in_peak) in list(self._sources.items()):
+            if peak_only and not in_peak:
+                continue
+            try:
+                totals[stage] = totals.get(stage, 0) + int(callback())
+            except Exception:
+                continue
+        return totals
+
+    def sample(self):
+        total = sum(self.stage_bytes(peak_only=True).values())
+        with self._lock:
+            self._peak = max(self._peak, total)
+            if self._capture_peak is not None:
+                self._capture_peak = max(self._capture_peak, total)
+        return total
+
+    def begin_capture(self):
+        with self._lock:
+            self._capture_peak = 0
+        self.sample()
+
+    def end_capture(self):
+        self.sample()
+        with self._lock:
+            if self._capture_peak is not None:
+                self.last_capture_peak = self._capture_peak
+            self._capture_peak = None
+
+    def reset_peak(self):
+        with self._lock:
+            self._peak = 0
+            self.last_capture_peak = 0
+
+    def snapshot(self):
+        stages = self.stage_bytes()
+        self.sample()
+        return {
+            "stages": stages,
+            "total_bytes": sum(stages.values()),
+            "peak_bytes": self._peak,
+            "last_capture_peak_bytes": self.last_capture_peak,
+        }
+
+
+_IMAGE_LEDGER = ImageMemoryLedger()
+
+
+class MarkerSpriteCache:
+    def __init__(self, max_bytes=MARKER_SPRITE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._sprites = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def margin(radius):
+        return int(max(2, radius * 0.2) / 2) + 2
+
+    @staticmethod
+    def _key(marker, scale):
+        border_enabled = bool(marker['border_enabled'])
+        return (
+            marker['number'],
+            marker['size'],
+            marker['font_ratio'],
+            QColor(marker['fill']).rgba(),
+            QColor(marker['border_color']).rgba() if border_enabled else 0,
+            border_enabled,
+            round(scale, 4),
+        )
+
+    def sprite(self, marker, scale=1.0, device_ratio=1.0):
+        key = self._key(marker, scale * device_ratio)
+        with self._lock:
+            image = self._sprites.get(key)
+            if image is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        image = self._render(marker, scale * device_ratio)
+        image.setDevicePixelRatio(device_ratio)
+        with self._lock:
+            if key not in self._sprites:
+                self._sprites[key] = image
+                self._bytes += image.sizeInBytes()
+                while self._bytes > self.max_bytes and len(self._sprites) > 1:
+                    _, evicted = self._sprites.popitem(last=False)
+                    self._bytes -= evicted.sizeInBytes()
+        return image
+
+    def _render(self, marker, scale):
+        radius = marker['size']
+        margin = self.margin(radius)
+        side = max(1, int(math.ceil((radius + margin) * 2 * scale)))
+        image = QImage(side, side, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.scale(scale, scale)
+        font = QFont()
+        font.setBold(True)
+        font.setPixelSize(max(1, int(radius * marker['font_ratio'])))
+        painter.setFont(font)
+        ellipse_rect = QRect(margin, margin, radius * 2, radius * 2)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(marker['fill'])
+        painter.drawEllipse(ellipse_rect)
+        if marker['border_enabled']:
+            painter.setPen(QPen(marker['border_color'], max(2, radius * 0.2)))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawEllipse(ellipse_rect)
+        painter.setPen(Qt.white)
+        painter.drawText(ellipse_rect, Qt.AlignCenter, str(marker['number']))
+        painter.end()
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._sprites.clear()
+            self._bytes = 0
+
+    def total_bytes(self):
+        return self._bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._sprites),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_MARKER_SPRITES = MarkerSpriteCache()
+_IMAGE_LEDGER.add_source("marker_sprites", _MARKER_SPRITES.total_bytes)
+
+
+def _marker_zoom_bucket(scale):
+    steps = MARKER_SPRITE_ZOOM_BUCKETS_PER_OCTAVE
+    return 2.0 ** (math.ceil(math.log2(max(scale, 1e-3)) * steps - 1e-6) / steps)
+
+
+def _draw_marker_sprite(painter, marker, scale=1.0, device_ratio=1.0, interactive=False):
+    sprite_scale = _marker_zoom_bucket(scale) if interactive else scale
+    image = _MARKER_SPRITES.sprite(marker, sprite_scale, device_ratio)
+    extent = marker['size'] + MarkerSpriteCache.margin(marker['size'])
+    x = int(round((marker['pos'].x() - extent) * scale))
+    y = int(round((marker['pos'].y() - extent) * scale))
+    if sprite_scale == scale:
+        painter.drawImage(QPoint(x, y), image)
+        return
+    factor = scale / (sprite_scale * device_ratio)
+    painter.drawImage(QRectF(x, y, image.width() * factor, image.height() * factor), image)
+
+
+def _draw_marker_glow(painter, marker, scale=1.0):
+    radius = marker['size']
+    grow = int(radius * 0.2)
+    glow_rect = QRectF(
+        (marker['pos'].x() - radius - grow) * scale,
+        (marker['pos'].y() - radius - grow) * scale,
+        (radius + grow) * 2 * scale,
+        (radius + grow) * 2 * scale,
+    )
+    color = QColor(marker['fill'])
+    color.setAlpha(120)
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(color)
+    painter.drawEllipse(glow_rect)
+
+
+def _is_redaction(info):
+    return info.get('kind') == 'redact'
+
+
+def _clamp_redact_strength(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = DEFAULT_REDACT_STYLE["strength"]
+    return max(2, min(64, value))
+
+
+def _box_blur_axis(values, radius, axis):
+    length = values.shape[axis]
+    shape = list(values.shape)
+    shape[axis] = 1
+    sums = np.concatenate(
+        (np.zeros(shape, np.float32), np.cumsum(values, axis=axis, dtype=np.float32)), axis=axis
+    )
+    index = np.arange(length)
+    low = np.maximum(index - radius, 0)
+    high = np.minimum(index + radius + 1, length)
+    scale = (1.0 / (high - low)).astype(np.float32)
+    window = np.take(sums, high, axis=axis)
+    window -= np.take(sums, low, axis=axis)
+    window *= scale.reshape([-1 if dim == axis else 1 for dim in range(values.ndim)])
+    return window
+
+
+def _pixelate_blocks(pixels, block):
+    height, width = pixels.shape[:2]
+    rows = np.arange(0, height, block)
+    cols = np.arange(0, width, block)
+    sums = np.add.reduceat(np.add.reduceat(pixels, rows, axis=0, dtype=np.uint32), cols, axis=1)
+    heights = np.diff(np.append(rows, height)).astype(np.uint32)
+    widths = np.diff(np.append(cols, width)).astype(np.uint32)
+    counts = heights[:, None, None] * widths[None, :, None]
+    means = ((sums + counts // 2) // counts).astype(np.uint8)
+    return np.repeat(np.repeat(means, heights, axis=0), widths, axis=1)
+
+
+def _premultiplied_copy(base, rect):
+    image = base.copy(rect)
+    if isinstance(image, QPixmap):
+        image = image.toImage()
+    return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+
+def _redact_tile(base, tile_rect, mode, strength):
+    pad = strength if mode == "blur" else 0
+    outer = tile_rect.adjusted(-pad, -pad, pad, pad).intersected(QRect(QPoint(0, 0), base.size()))
+    source = _premultiplied_copy(base, outer)
+    ptr = source.constBits()
+    ptr.setsize(source.sizeInBytes())
+    pixels = np.frombuffer(ptr, np.uint8).reshape(source.height(), source.bytesPerLine() // 4, 4)
+    pixels = pixels[:, : source.width()]
+    if mode == "blur":
+        result = _box_blur_axis(_box_blur_axis(pixels, strength, 1), strength, 0)
+        result += 0.5
+        result = result.astype(np.uint8)
+    else:
+        result = _pixelate_blocks(pixels, strength)
+    inner = tile_rect.translated(-outer.topLeft())
+    result = result[inner.top() : inner.bottom() + 1, inner.left() : inner.right() + 1]
+    return np.ascontiguousarray(result).view(np.uint32).reshape(inner.height(), inner.width())
+
+
+def _redact_region_scaled(base, rect, mode, strength):
+    region = _premultiplied_copy(base, rect)
+    small = region.scaled(
+        max(1, region.width() // strength),
+        max(1, region.height() // strength),
+        Qt.IgnoreAspectRatio,
+        Qt.SmoothTransformation,
+    )
+    transform = Qt.SmoothTransformation if mode == "blur" else Qt.FastTransformation
+    return small.scaled(region.size(), Qt.IgnoreAspectRatio, transform)
+
+
+class RedactionCache:
+    def __init__(self, max_bytes=REDACTION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def patch(self, base, info):
+        if base is None or base.isNull():
+            return QRect(), None
+        rect = info['rect'].normalized().intersected(QRect(QPoint(0, 0), base.size()))
+        if rect.isEmpty():
+            return rect, None
+        mode = info.get('mode') if info.get('mode') in REDACT_MODES else REDACT_MODES[0]
+        strength = _clamp_redact_strength(info.get('strength'))
+        key = ("patch", base.cacheKey(), rect.x(), rect.y(), rect.width(), rect.height(), mode, strength)
+        image = self._lookup(key)
+        if image is None:
+            if np is None:
+                image = _redact_region_scaled(base, rect, mode, strength)
+            else:
+                image = self._assemble(base, rect, mode, strength)
+            self._store(key, image, image.sizeInBytes())
+        return rect, image
+
+    def _assemble(self, base, rect, mode, strength):
+        size = -(-REDACTION_TILE_SIZE // strength) * strength
+        bounds = QRect(QPoint(0, 0), base.size())
+        image = QImage(rect.size(), QImage.Format_ARGB32_Premultiplied)
+        ptr = image.bits()
+        ptr.setsize(image.sizeInBytes())
+        target = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+        for row in range(rect.top() // size, rect.bottom() // size + 1):
+            for col in range(rect.left() // size, rect.right() // size + 1):
+                tile_rect = QRect(col * size, row * size, size, size).intersected(bounds)
+                key = ("tile", base.cacheKey(), tile_rect.x(), tile_rect.y(), mode, strength)
+                tile = self._lookup(key)
+                if tile is None:
+                    tile = _redact_tile(base, tile_rect, mode, strength)
+                    self._store(key, tile, tile.nbytes)
+                part = tile_rect.intersected(rect)
+                top, left = part.top() - rect.top(), part.left() - rect.left()
+                source_top, source_left = part.top() - tile_rect.top(), part.left() - tile_rect.left()
+                target[top : top + part.height(), left : left + part.width()] = tile[
+                    source_top : source_top + part.height(), source_left : source_left + part.width()
+                ]
+        return image
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _store(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def discard(self, source_key):
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == source_key]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def total_bytes(self):
+        return self._bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_REDACTIONS = RedactionCache()
+_IMAGE_LEDGER.add_source("redactions", _REDACTIONS.total_bytes)
+
+
+def _draw_redaction(painter, base, info):
+    rect, patch = _REDACTIONS.patch(base, info)
+    if patch is not None:
+        painter.drawImage(rect.topLeft(), patch)
+
+
+def _paint_annotation_shapes(painter, rectangles, markers, base=None):
+    for info in rectangles:
+        if _is_redaction(info):
+            if base is not None:
+                _draw_redaction(painter, base, info)
+            continue
+        painter.setBrush(info['fill'])
+        if info['border_enabled']:
+            painter.setPen(QPen(info['border'], info['width']))
+        else:
+            painter.setPen(Qt.NoPen)
+        painter.drawRoundedRect(info['rect'], info['radius'], info['radius'])
+    painter.setPen(Qt.NoPen)
+    for marker in markers:
+        _draw_marker_sprite(painter, marker)
+
+
+def render_annotated_image(base_pixmap, rectangles, markers):
+    image = QImage(base_pixmap.size(), QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    if isinstance(base_pixmap, QImage):
+        painter.drawImage(0, 0, base_pixmap)
+    else:
+        painter.drawPixmap(0, 0, base_pixmap)
+    _paint_annotation_shapes(painter, rectangles, markers, base_pixmap)
+    painter.end()
+    return image
+
+
+def _template_file_name(name):
+    slug = re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("._")
+    return f"{slug or 'template'}.json"
+
+
+def save_annotation_template(name, rectangles, markers, size, directory=TEMPLATES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _template_file_name(name))
+    payload = {
+        "name": name,
+        "created_at": time.time(),
+        "width": size.width(),
+        "height": size.height(),
+        "rectangles": _serialize_shapes(rectangles),
+        "markers": _serialize_shapes(markers),
+    }
+    data = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+    return path if _write_file_atomic(path, data) else None
+
+
+def list_annotation_templates(directory=TEMPLATES_DIR):
+    templates = []
+    if not os.path.isdir(directory):
+        return templates
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not entry.name.endswith(".json"):
+            continue
+        template = load_annotation_template(entry.path)
+        if template is not None:
+            templates.append(template)
+    templates.sort(key=lambda item: item["name"].lower())
+    return templates
+
+
+def load_annotation_template(path):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    return {
+        "name": payload.get("name") or os.path.splitext(os.path.basename(path))[0],
+        "path": path,
+        "rectangles": payload.get("rectangles", []),
+        "markers": payload.get("markers", []),
+    }
+
+
+def _init_image_worker():
+    global _WORKER_APP
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if QGuiApplication.instance() is None:
+        _WORKER_APP = QGuiApplication(["ctk-worker"])
+
+
+def _render_template_file(job):
+    source_path, output_path, rectangles, markers, quality = job
+    image = QImage(source_path)
+    if image.isNull():
+        return source_path, None, "无法读取图片"
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    rectangles = _deserialize_shapes(rectangles)
+    base = image.copy() if any(_is_redaction(info) for info in rectangles) else None
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    _paint_annotation_shapes(painter, rectangles, _deserialize_shapes(markers), base)
+    painter.end()
+    data = _encode_image(image.convertToFormat(QImage.Format_RGB32), "JPG", quality)
+    if data is None:
+        return source_path, None, "编码失败"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if not _write_file_atomic(output_path, data):
+        return source_path, None, "无法写入文件"
+    return source_path, output_path, None
+
+
+class TemplateBatchRunner(QObject):
+    fileFinished = pyqtSignal(str, str, str)
+
+    MAX_WORKERS = 8
+
+    def __init__(self, jobs, parent=None):
+        super().__init__(parent)
+        self._jobs = list(jobs)
+        self._executor = None
+        self._futures = {}
+
+    def start(self):
+        workers = max(1, min(len(self._jobs), os.cpu_count() or 1, self.MAX_WORKERS))
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_image_worker,
+        )
+        for job in self._jobs:
+            future = self._executor.submit(_render_template_file, job)
+            self._futures[future] = job[0]
+            future.add_done_callback(self._on_future_done)
+        return workers
+
+    def _on_future_done(self, future):
+        source_path = self._futures.get(future, "")
+        if future.cancelled():
+            self.fileFinished.emit(source_path, "", "已取消")
+            return
+        try:
+            source_path, output_path, error = future.result()
+        except Exception as exc:
+            output_path, error = None, str(exc) or exc.__class__.__name__
+        self.fileFinished.emit(source_path, output_path or "", error or "")
+
+    def cancel(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _recompress_file(job):
+    source_path, target_path, fmt, quality, max_edge, only_if_smaller, remove_source = job
+    try:
+        stat = os.stat(source_path)
+    except OSError:
+        return source_path, 0, 0, "无法读取文件"
+    reader = QImageReader(source_path)
+    reader.setAutoTransform(True)
+    if reader.supportsAnimation() and reader.imageCount() > 1:
+        return source_path, stat.st_size, stat.st_size, None
+    size = reader.size()
+    resize = bool(max_edge) and size.isValid() and max(size.width(), size.height()) > max_edge
+    if only_if_smaller and max_edge and not resize:
+        return source_path, stat.st_size, stat.st_size, None
+    if resize:
+        reader.setScaledSize(size.scaled(max_edge, max_edge, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return source_path, stat.st_size, 0, reader.errorString() or "无法解码"
+    if fmt == "JPG" and image.hasAlphaChannel():
+        image = image.convertToFormat(QImage.Format_RGB32)
+    data = _encode_image(image, fmt, quality)
+    if data is None:
+        return source_path, stat.st_size, 0, "编码失败"
+    if only_if_smaller and not resize and len(data) > stat.st_size * (1 - RECOMPRESS_MIN_SAVING):
+        return source_path, stat.st_size, stat.st_size, None
+    os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+    if not _write_file_atomic(target_path, data):
+        return source_path, stat.st_size, 0, "无法写入文件"
+    os.utime(target_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    if remove_source:
+        try:
+            os.remove(source_path)
+        except OSError:
+            pass
+    return source_path, stat.st_size, len(data), None
+
+
+class BatchRecompressor:
+    MAX_WORKERS = 8
+
+    def __init__(
+        self,
+        source_dir,
+        output_dir=None,
+        fmt=None,
+        quality=85,
+        max_edge=0,
+        workers=None,
+        resume=True,
+        replace_originals=False,
+    ):
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.fmt = fmt if fmt in RECOMPRESS_FORMATS else None
+        self.quality = max(1, min(100, int(quality)))
+        self.max_edge = max(0, int(max_edge or 0))
+        self.workers = max(1, min(int(workers or os.cpu_count() or 1), self.MAX_WORKERS))
+        self.resume = resume
+        self.replace_originals = bool(replace_originals)
+        key = json.dumps(
+            [self.source_dir, self.output_dir, self.fmt, self.quality, self.max_edge, self.replace_originals],
+            ensure_ascii=False,
+        )
+        self.state_path = os.path.join(
+            RECOMPRESS_STATE_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".jsonl"
+        )
+
+    def collect_jobs(self):
+        writable = {bytes(name).decode("ascii", "ignore").upper() for name in QImageWriter.supportedImageFormats()}
+        writable.add("JPG")
+        jobs = []
+        claimed = set()
+        for root, dirs, files in os.walk(self.source_dir):
+            if self.output_dir:
+                dirs[:] = [name for name in dirs if os.path.join(root, name) != self.output_dir]
+            for name in sorted(files):
+                base, ext = os.path.splitext(name)
+                if ext.lower() not in IMAGE_FILE_EXTENSIONS:
+                    continue
+                if self.fmt:
+                    qt_format, extension = RECOMPRESS_FORMATS[self.fmt]
+                else:
+                    qt_format, extension = RECOMPRESS_SOURCE_FORMATS.get(ext.lower()), ext
+                    if qt_format not in writable:
+                        continue
+                source_path = os.path.join(root, name)
+                relative = os.path.relpath(source_path, self.source_dir)
+                if self.output_dir:
+                    target_path = os.path.join(self.output_dir, os.path.dirname(relative), base + extension)
+                    only_if_smaller = remove_source = False
+                else:
+                    target_path = os.path.join(root, base + extension)
+                    converted = os.path.normcase(target_path) != os.path.normcase(source_path)
+                    if converted and os.path.exists(target_path):
+                        continue
+                    remove_source = converted and self.replace_originals
+                    only_if_smaller = not converted
+                key = os.path.normcase(target_path)
+                if key in claimed:
+                    continue
+                claimed.add(key)
+                jobs.append(
+                    (
+                        relative,
+                        (
+                            source_path,
+                            target_path,
+                            qt_format,
+                            self.quality,
+                            self.max_edge,
+                            only_if_smaller,
+                            remove_source,
+                        ),
+                    )
+                )
+        jobs.sort(key=lambda item: item[0])
+        return jobs
+
+    def _load_state(self):
+        done = set()
+        if not self.resume:
+            return done
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                        done.add(record["path"])
+                        done.add(record.get("target", record["path"]))
+                    except (ValueError, KeyError, TypeError):
+                        break
+        except OSError:
+            pass
+        return done
+
+    def run(self, progress=None, cancel_event=None):
+        jobs = self.collect_jobs()
+        done = self._load_state()
+        pending = [job for job in jobs if job[0] not in done]
+        stats = {
+            "total": len(jobs),
+            "resumed": len(jobs) - len(pending),
+            "processed": 0,
+            "failed": [],
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "elapsed": 0.0,
+            "cancelled": False,
+            "workers": self.workers,
+        }
+        started = time.perf_counter()
+        os.makedirs(RECOMPRESS_STATE_DIR, exist_ok=True)
+        in_flight_limit = self.workers * 2
+        with open(self.state_path, "a" if self.resume else "w", encoding="utf-8") as state, ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_image_worker,
+        ) as executor:
+            queue = iter(pending)
+            running = {}
+            while True:
+                while len(running) < in_flight_limit and not (cancel_event and cancel_event.is_set()):
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    running[executor.submit(_recompress_file, item[1])] = item
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    relative, job = running.pop(future)
+                    try:
+                        _, bytes_in, bytes_out, error = future.result()
+                    except Exception as exc:
+                        bytes_in, bytes_out, error = 0, 0, str(exc) or exc.__class__.__name__
+                    stats["processed"] += 1
+                    if error:
+                        stats["failed"].append(f"{relative}: {error}")
+                        continue
+                    stats["bytes_in"] += bytes_in
+                    stats["bytes_out"] += bytes_out
+                    target = os.path.relpath(job[1], self.output_dir or self.source_dir)
+                    state.write(json.dumps({"path": relative, "target": target}, ensure_ascii=False) + "\n")
+                state.flush()
+                stats["elapsed"] = time.perf_counter() - started
+                if progress:
+                    progress(dict(stats))
+        stats["elapsed"] = time.perf_counter() - started
+        stats["cancelled"] = bool(cancel_event and cancel_event.is_set()) and stats["processed"] < len(pending)
+        if not stats["cancelled"] and not stats["failed"]:
+            try:
+                os.remove(self.state_path)
+            except OSError:
+                pass
+        return stats
+
+
+def format_recompress_report(stats):
+    elapsed = max(stats["elapsed"], 0.001)
+    ok = stats["processed"] - len(stats["failed"])
+    saved = stats["bytes_in"] - stats["bytes_out"]
+    percent = saved * 100.0 / stats["bytes_in"] if stats["bytes_in"] else 0.0
+    lines = [
+        f"已处理 {stats['processed']}/{stats['total'] - stats['resumed']} 张"
+        f"（成功 {ok}，失败 {len(stats['failed'])}，断点跳过 {stats['resumed']}），进程数 {stats['workers']}",
+        f"用时 {elapsed:.1f} 秒，{stats['processed'] / elapsed:.1f} 张/秒，"
+        f"{stats['bytes_in'] / elapsed / (1024 * 1024):.1f} MB/秒",
+        f"节省空间 {saved / (1024 * 1024):.1f} MB（{percent:.1f}%）",
+    ]
+    if stats["cancelled"]:
+        lines.append("任务已中断，再次运行相同参数会从断点继续。")
+    return "\n".join(lines)
+
+
+def run_recompress_cli(argv):
+    config = load_config()
+    parser = argparse.ArgumentParser(
+        prog="screenshot_tool --recompress",
+        description="批量重新压缩、缩放或转换截图目录中的图片。",
+    )
+    parser.add_argument("source", nargs="?", default=config.get("save_dir", DEFAULT_SAVE_DIR))
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", help="输出目录，保持原有子目录结构")
+    target.add_argument(
+        "--in-place",
+        action="store_true",
+        help="直接替换原文件（保持原格式；体积未变小或已在最长边以内的文件保持不变）",
+    )
+    parser.add_argument("--format", choices=sorted(RECOMPRESS_FORMATS), default=None, help="转换为指定格式，默认保持原格式")
+    parser.add_argument(
+        "--replace-originals",
+        action="store_true",
+        help="与 --in-place 和 --format 一起使用时，转换成功后删除原文件",
+    )
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--max-edge", type=int, default=0, help="最长边像素上限，0 表示不缩放")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--no-resume", action="store_true", help="忽略上次中断留下的进度")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.source):
+        parser.error(f"目录不存在: {args.source}")
+    recompressor = BatchRecompressor(
+        args.source,
+        output_dir=None if args.in_place else args.output,
+        fmt=args.format,
+        quality=args.quality,
+        max_edge=args.max_edge,
+        workers=args.workers or None,
+        resume=not args.no_resume,
+        replace_originals=args.replace_originals,
+    )
+    cancel_event = threading.Event()
+
+    def report(stats):
+        elapsed = max(stats["elapsed"], 0.001)
+        print(
+            f"\r{stats['processed']}/{stats['total'] - stats['resumed']}  "
+            f"{stats['processed'] / elapsed:.1f} 张/秒",
+            end="",
+            flush=True,
+        )
+
+    try:
+        stats = recompressor.run(progress=report, cancel_event=cancel_event)
+    except KeyboardInterrupt:
+        print("\n已中断，再次运行相同参数会从断点继续。")
+        return 130
+    print()
+    print(format_recompress_report(stats))
+    for line in stats["failed"][:20]:
+        print(f"  失败 {line}")
+    return 1 if stats["failed"] else 0
+
+
+class LazyImageMimeData(QMimeData):
+    IMAGE_MIME = "application/x-qt-image"
+    ENCODED_FORMATS = {
+        "image/png": ("PNG", -1),
+        "image/bmp": ("BMP", -1),
+        "image/jpeg": ("JPG", CLIPBOARD_JPEG_QUALITY),
+    }
+
+    def __init__(self, render, cache=None):
+        super().__init__()
+        self._render = render
+        self._rendered = None
+        self._cache = cache if cache is not None else {}
+
+    def formats(self):
+        return [self.IMAGE_MIME, *self.ENCODED_FORMATS]
+
+    def hasFormat(self, mime_type):
+        return mime_type == self.IMAGE_MIME or mime_type in self.ENCODED_FORMATS
+
+    def retrieveData(self, mime_type, preferred_type):
+        if mime_type == self.IMAGE_MIME:
+            return self._image()
+        if mime_type in self.ENCODED_FORMATS:
+            data = self._cache.get(mime_type)
+            if data is None:
+                fmt, quality = self.ENCODED_FORMATS[mime_type]
+                image = self._image()
+                if mime_type == "image/jpeg":
+                    image = image.convertToFormat(QImage.Format_RGB32)
+                data = QByteArray(_encode_image(image, fmt, quality) or b"")
+                self._cache[mime_type] = data
+            return data
+        return super().retrieveData(mime_type, preferred_type)
+
+    def _image(self):
+        if self._rendered is None:
+            self._rendered = self._render()
+        return self._rendered
+
+    def memory_bytes(self):
+        total = sum(data.size() for data in self._cache.values())
+        if self._rendered is not None:
+            total += self._rendered.sizeInBytes()
+        return total
+
+
+def _set_clipboard_pixmap(pixmap: QPixmap):
+    QApplication.clipboard().setMimeData(LazyImageMimeData(pixmap.toImage))
+
+
+def _clipboard_image_bytes():
+    if QApplication.instance() is None:
+        return 0
+    mime = QApplication.clipboard().mimeData()
+    if not isinstance(mime, LazyImageMimeData):
+        return 0
+    return mime.memory_bytes()
+
+
+_IMAGE_LEDGER.add_source("clipboard", _clipboard_image_bytes, in_peak=False)
+
+
+class AnnotationHistory:
+    DEFAULT_LIMIT = 200
+    MIN_LIMIT = 10
+    MAX_LIMIT = 5000
+
+    def __init__(self, limit=DEFAULT_LIMIT):
+        self._undo = deque()
+        self._redo = []
+        self._merge_key = None
+        self.limit = self.MIN_LIMIT
+        self.set_limit(limit)
+
+    def set_limit(self, limit):
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = self.DEFAULT_LIMIT
+        self.limit = max(self.MIN_LIMIT, min(self.MAX_LIMIT, limit))
+        while len(self._undo) > self.limit:
+            self._undo.popleft()
+        del self._redo[self.limit:]
+
+    def push(self, entry, merge_key=None):
+        self._redo.clear()
+        if merge_key is not None and merge_key == self._merge_key and self._undo:
+            last = self._undo[-1]
+            for key, value in entry[3].items():
+                last[3].setdefault(key, value)
+            last[4].update(entry[4])
+            return
+        self._merge_key = merge_key
+        self._undo.append(entry)
+        if len(self._undo) > self.limit:
+            self._undo.popleft()
+
+    def break_merge(self):
+        self._merge_key = None
+
+    def undo(self):
+        self._merge_key = None
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._redo.append(entry)
+        return entry
+
+    def redo(self):
+        self._merge_key = None
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._undo.append(entry)
+        return entry
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._merge_key = None
+
+    def __len__(self):
+        return len(self._undo) + len(self._redo)
+
+
+class ScaledImageSignals(QObject):
+    ready = pyqtSignal(int, QImage)
+
+
+class ScaledImageTask(QRunnable):
+    def __init__(self, generation, image, size, device_ratio=1.0):
+        super().__init__()
+        self.signals = ScaledImageSignals()
+        self._generation = generation
+        self._image = image
+        self._size = QSize(size)
+        self._device_ratio = device_ratio
+
+    def run(self):
+        scaled = self._image.scaled(self._size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        scaled.setDevicePixelRatio(self._device_ratio)
+        self.signals.ready.emit(self._generation, scaled)
+
+
 class AnnotationCanvas(QWidget):
-    optionsUpdated = pyqtSignal()
+    shapesChanged = pyqtSignal(int)
+    selectionChanged = pyqtSignal(str)
+    styleChanged = pyqtSignal()
     zoomChanged = pyqtSignal(float)
+    zoomSettled = pyqtSignal(float)
+    baseUnavailable = pyqtSignal(str)
 
     HANDLE_SIZE = 12
     MIN_RECT_SIZE = 8
 
-    def __init__(self, pixmap: QPixmap):
+    def __init__(self, pixmap: QPixmap, undo_limit=AnnotationHistory.DEFAULT_LIMIT):
         super().__init__()
+        self._base_pixmap = None
+        self._spill_path = None
+        self._reload_source = None
+        self._base_source = None
+        self.base_error = ""
+        self._hq_generation = 0
+        self._hq_key = None
+        self._hq_image = None
         self.base_pixmap = pixmap
         self._zoom = 1.0
         self._min_zoom = 0.25
@@ -1062,6 +3074,8 @@ class AnnotationCanvas(QWidget):
         self.rectangle_border_enabled = DEFAULT_RECT_STYLE["border_enabled"]
         self.rectangle_border_width = DEFAULT_RECT_STYLE["width"]
         self.rectangle_corner_radius = DEFAULT_RECT_STYLE["radius"]
+        self.redact_mode = DEFAULT_REDACT_STYLE["mode"]
+        self.redact_strength = DEFAULT_REDACT_STYLE["strength"]
         self.rectangles_flattened = True
         self.selected_rectangle_index = None
         self.rect_drag_mode = None
@@ -1070,32 +3084,405 @@ class AnnotationCanvas(QWidget):
         self.rect_drag_origin = QPoint()
         self.creating_new_rect = False
         self._marker_dragging = False
+        self.document_revision = 0
+        self._pending_changes = set()
+        self._change_timer = QTimer(self)
+        self._change_timer.setSingleShot(True)
+        self._change_timer.setInterval(0)
+        self._change_timer.timeout.connect(self._flush_changes)
+        self.history = AnnotationHistory(undo_limit)
+        self._drag_snapshot = None
+        self._clipboard_cache_revision = -1
+        self._clipboard_caches = {}
+        self._interactive_zoom = False
+        self._pending_zoom = None
+        self._zoom_frame_timer = QTimer(self)
+        self._zoom_frame_timer.setSingleShot(True)
+        self._zoom_frame_timer.setInterval(ZOOM_FRAME_INTERVAL_MS)
+        self._zoom_frame_timer.timeout.connect(self._flush_pending_zoom)
+        self._zoom_settle_timer = QTimer(self)
+        self._zoom_settle_timer.setSingleShot(True)
+        self._zoom_settle_timer.setInterval(ZOOM_SETTLE_DELAY_MS)
+        self._zoom_settle_timer.timeout.connect(self._settle_zoom)
         self._apply_zoom()
 
-    def zoom_factor(self):
-        return self._zoom
+    @property
+    def base_pixmap(self):
+        if self._base_pixmap is None:
+            self._restore_base_pixmap()
+        return self._base_pixmap
+
+    @base_pixmap.setter
+    def base_pixmap(self, pixmap):
+        self.discard_spilled_base()
+        self._drop_scaled_base()
+        self._base_pixmap = pixmap
+        self._base_size = QSize(pixmap.size())
+        self._base_source = None
+        self.base_error = ""
+
+    def set_base_source(self, path):
+        self._base_source = _file_signature(path) if path else None
+
+    def base_size(self):
+        return QSize(self._base_size)
+
+    def export_source(self):
+        if self.base_error:
+            return None
+        if self._base_pixmap is not None:
+            return self._base_pixmap
+        if self._spill_path and os.path.exists(self._spill_path):
+            return ("raw", self._spill_path)
+        if self._reload_source is not None:
+            return ("file",) + self._reload_source
+        return self.base_pixmap
+
+    def is_base_resident(self):
+        return self._base_pixmap is not None
+
+    def base_memory_bytes(self):
+        pixmap = self._base_pixmap
+        if pixmap is None or pixmap.isNull():
+            return 0
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth()) // 8
+
+    def evict_base_pixmap(self, spill_path):
+        freed = self.base_memory_bytes()
+        if not freed or self.base_error:
+            return 0
+        source = self._base_source
+        if source is None or _file_signature(source[0]) != source:
+            try:
+                _write_raw_image(self._base_pixmap.toImage(), spill_path)
+            except OSError:
+                return 0
+            self._spill_path = spill_path
+            source = None
+        self._reload_source = source
+        _REDACTIONS.discard(self._base_pixmap.cacheKey())
+        self._base_pixmap = None
+        self._drop_scaled_base()
+        return freed
+
+    def discard_spilled_base(self):
+        if self._spill_path:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+        self._spill_path = None
+        self._reload_source = None
 
-    def set_zoom(self, factor: float):
-        factor = max(self._min_zoom, min(self._max_zoom, factor))
-        if abs(factor - self._zoom) < 0.001:
+    def _restore_base_pixmap(self):
+        pixmap = QPixmap()
+        error = "缓存的底图已损坏，无法重新载入"
+        if self._spill_path and os.path.exists(self._spill_path):
+            try:
+                pixmap = QPixmap.fromImage(_read_raw_image(self._spill_path))
+            except OSError:
+                pass
+        elif self._reload_source is not None:
+            path = self._reload_source[0]
+            if _file_signature(path) == self._reload_source:
+                pixmap = QPixmap(path)
+            error = f"原始文件已被修改或删除，无法重新载入底图: {path}"
+        reloaded = not pixmap.isNull() and pixmap.size() == self._base_size
+        self.discard_spilled_base()
+        if reloaded:
+            self._base_pixmap = pixmap
+            return
+        self.mark_base_unavailable(error)
+
+    def mark_base_unavailable(self, error):
+        pixmap = QPixmap(self._base_size)
+        pixmap.fill(Qt.transparent)
+        self.discard_spilled_base()
+        self._drop_scaled_base()
+        self._base_pixmap = pixmap
+        self._base_source = None
+        self.base_error = error
+        self.baseUnavailable.emit(error)
+        self.update()
+
+    def _touch_document(self):
+        self.document_revision += 1
+        self._queue_change("shapes")
+
+    def _queue_change(self, *kinds):
+        if "selection" in kinds:
+            self.history.break_merge()
+        self._pending_changes.update(kinds)
+        if not self._change_timer.isActive():
+            self._change_timer.start()
+
+    def _flush_changes(self):
+        changes = self._pending_changes
+        self._pending_changes = set()
+        if "shapes" in changes:
+            self.shapesChanged.emit(self.document_revision)
+        if "selection" in changes:
+            self.selectionChanged.emit(self.active_selection_kind())
+        if "style" in changes:
+            self.styleChanged.emit()
+
+    def _record_history(self, entry, merge_key=None):
+        self._commit_drag_history()
+        self.history.push(entry, merge_key)
+
+    def _begin_drag_history(self, kind, index, created=False):
+        self._commit_drag_history()
+        shapes = getattr(self, kind)
+        before = None if created else _copy_shapes([shapes[index]])[0]
+        self._drag_snapshot = (kind, index, before)
+
+    def _commit_drag_history(self):
+        snapshot = self._drag_snapshot
+        self._drag_snapshot = None
+        if snapshot is None:
+            return
+        kind, index, before = snapshot
+        shapes = getattr(self, kind)
+        if not 0 <= index < len(shapes):
+            return
+        after = _copy_shapes([shapes[index]])[0]
+        if before is None:
+            self.history.push(("insert", kind, index, after))
             return
+        changed = [key for key, value in after.items() if before.get(key) != value]
+        if changed:
+            self.history.push(
+                (
+                    "edit",
+                    kind,
+                    index,
+                    {key: before.get(key) for key in changed},
+                    {key: after[key] for key in changed},
+                )
+            )
+
+    def _edit_shape(self, kind, index, key, value):
+        shape = getattr(self, kind)[index]
+        before = shape.get(key)
+        if before == value:
+            return
+        shape[key] = value
+        self._touch_document()
+        before_values, after_values = _copy_shapes([{key: before}, {key: value}])
+        self._record_history(("edit", kind, index, before_values, after_values), merge_key=(kind, index, key))
+
+    def undo(self):
+        self._commit_drag_history()
+        entry = self.history.undo()
+        if entry is None:
+            return False
+        self._apply_history_entry(entry, reverse=True)
+        return True
+
+    def redo(self):
+        self._commit_drag_history()
+        entry = self.history.redo()
+        if entry is None:
+            return False
+        self._apply_history_entry(entry, reverse=False)
+        return True
+
+    def can_undo(self):
+        return self._drag_snapshot is not None or self.history.can_undo()
+
+    def can_redo(self):
+        return self.history.can_redo()
+
+    def set_undo_limit(self, limit):
+        self.history.set_limit(limit)
+
+    def apply_template(self, rectangles, markers):
+        if not rectangles and not markers:
+            return False
+        self._commit_drag_history()
+        before_flags = self._shape_flags()
+        rectangles = _copy_shapes(rectangles)
+        for info in rectangles:
+            info['flattened'] = False
+        markers = _copy_shapes(markers)
+        self.rectangles.extend(_copy_shapes(rectangles))
+        self.markers.extend(_copy_shapes(markers))
+        if rectangles:
+            self.rectangles_flattened = False
+        if markers:
+            self.markers_flattened = False
+        self._record_history(("append", rectangles, markers, before_flags, self._shape_flags()))
+        self._touch_document()
+        self.clear_active_selection(emit=False)
+        self._queue_change("selection")
+        return True
+
+    def load_shapes(self, rectangles, markers, markers_flattened=True, rectangles_flattened=True):
+        self.rectangles = list(rectangles)
+        self.markers = list(markers)
+        self.markers_flattened = markers_flattened
+        self.rectangles_flattened = rectangles_flattened
+        self.history.clear()
+        self._drag_snapshot = None
+        self._touch_document()
+        self.update()
+
+    def _shape_flags(self):
+        return self.markers_flattened, self.rectangles_flattened
+
+    def _apply_history_entry(self, entry, reverse):
+        action = entry[0]
+        if action == "reset":
+            rectangles, markers = entry[1] if reverse else entry[2]
+            self.rectangles = _copy_shapes(rectangles)
+            self.markers = _copy_shapes(markers)
+            self.markers_flattened, self.rectangles_flattened = entry[3] if reverse else entry[4]
+        elif action == "append":
+            rectangles, markers = entry[1], entry[2]
+            if reverse:
+                del self.rectangles[len(self.rectangles) - len(rectangles):]
+                del self.markers[len(self.markers) - len(markers):]
+            else:
+                self.rectangles.extend(_copy_shapes(rectangles))
+                self.markers.extend(_copy_shapes(markers))
+            self.markers_flattened, self.rectangles_flattened = entry[3] if reverse else entry[4]
+        elif action == "flatten":
+            for index in entry[1]:
+                self.rectangles[index]['flattened'] = not reverse
+            self.markers_flattened, self.rectangles_flattened = entry[2] if reverse else entry[3]
+        else:
+            kind, index = entry[1], entry[2]
+            shapes = getattr(self, kind)
+            if action == "edit":
+                values = entry[3] if reverse else entry[4]
+                shapes[index].update(_copy_shapes([values])[0])
+            elif (action == "insert") != reverse:
+                shapes.insert(index, _copy_shapes([entry[3]])[0])
+            else:
+                shapes.pop(index)
+        self._touch_document()
+        self.dragging_marker_index = None
+        self.selected_marker_index = None
+        self.hover_marker_index = None
+        self.selected_rectangle_index = None
+        self._reset_rect_drag()
+        self._marker_dragging = False
+        self.update()
+        self._queue_change("selection")
+
+    def zoom_factor(self):
+        return self._zoom
+
+    def set_zoom(self, factor: float):
+        self._pending_zoom = None
+        self._zoom_frame_timer.stop()
+        self._set_zoom_now(factor)
+        self._zoom_settle_timer.start()
+
+    def _set_zoom_now(self, factor):
+        factor = max(self._min_zoom, min(self._max_zoom, factor))
+        if abs(factor - self._zoom) < 0.001:
+            return False
         self._zoom = factor
         self._apply_zoom()
         self.zoomChanged.emit(self._zoom)
+        return True
 
     def zoom_in(self):
-        self.set_zoom(self._zoom * 1.1)
+        self._request_zoom(self._target_zoom() * 1.1)
 
     def zoom_out(self):
-        self.set_zoom(self._zoom / 1.1)
+        self._request_zoom(self._target_zoom() / 1.1)
+
+    def _target_zoom(self):
+        return self._zoom if self._pending_zoom is None else self._pending_zoom
+
+    def _request_zoom(self, factor):
+        self._interactive_zoom = True
+        self._zoom_settle_timer.start()
+        factor = max(self._min_zoom, min(self._max_zoom, factor))
+        if self._zoom_frame_timer.isActive():
+            self._pending_zoom = factor
+            return
+        self._set_zoom_now(factor)
+        self._zoom_frame_timer.start()
+
+    def _flush_pending_zoom(self):
+        factor = self._pending_zoom
+        self._pending_zoom = None
+        if factor is not None and self._set_zoom_now(factor):
+            self._zoom_frame_timer.start()
+
+    def _settle_zoom(self):
+        self._zoom_frame_timer.stop()
+        self._flush_pending_zoom()
+        self._interactive_zoom = False
+        self._start_scaled_base()
+        self.update()
+        self.zoomSettled.emit(self._zoom)
+
+    def _scaled_base_key(self):
+        ratio = self.devicePixelRatioF()
+        if self._base_pixmap is None or self._zoom * ratio >= 1.0:
+            return None
+        size = self._scaled_device_size(ratio)
+        return (self._base_pixmap.cacheKey(), size.width(), size.height(), ratio)
+
+    def _start_scaled_base(self):
+        key = self._scaled_base_key()
+        if key is None or not self.isVisible():
+            return
+        if key == self._hq_key:
+            return
+        self._hq_generation += 1
+        self._hq_key = key
+        if self._hq_image is not None:
+            _IMAGE_LEDGER.release("scaled_preview", id(self))
+        self._hq_image = None
+        ratio = key[3]
+        task = ScaledImageTask(
+            self._hq_generation,
+            self._base_pixmap.toImage(),
+            self._scaled_device_size(ratio),
+            ratio,
+        )
+        task.signals.ready.connect(self._on_scaled_base_ready)
+        QThreadPool.globalInstance().start(task)
+
+    def _on_scaled_base_ready(self, generation, image):
+        if generation != self._hq_generation:
+            return
+        self._hq_image = image
+        _IMAGE_LEDGER.acquire("scaled_preview", id(self), image)
+        self.update()
+
+    def _drop_scaled_base(self):
+        self._hq_generation += 1
+        self._hq_key = None
+        if self._hq_image is not None:
+            _IMAGE_LEDGER.release("scaled_preview", id(self))
+        self._hq_image = None
+
+    def _current_scaled_base(self):
+        if self._hq_image is None or self._interactive_zoom:
+            return None
+        if self._scaled_base_key() != self._hq_key:
+            return None
+        return self._hq_image
 
     def reset_zoom(self):
         self.set_zoom(1.0)
 
     def _scaled_size(self):
         return QSize(
-            max(1, int(round(self.base_pixmap.width() * self._zoom))),
-            max(1, int(round(self.base_pixmap.height() * self._zoom))),
+            max(1, int(round(self._base_size.width() * self._zoom))),
+            max(1, int(round(self._base_size.height() * self._zoom))),
+        )
+
+    def _scaled_device_size(self, ratio):
+        return QSize(
+            max(1, int(round(self._base_size.width() * self._zoom * ratio))),
+            max(1, int(round(self._base_size.height() * self._zoom * ratio))),
         )
 
     def _apply_zoom(self):
@@ -1131,8 +3518,19 @@ class AnnotationCanvas(QWidget):
         self._update_default_cursor()
 
     def clear_annotations(self):
+        if self.rectangles or self.markers:
+            self._record_history(
+                (
+                    "reset",
+                    (_copy_shapes(self.rectangles), _copy_shapes(self.markers)),
+                    ([], []),
+                    self._shape_flags(),
+                    (True, True),
+                )
+            )
         self.rectangles.clear()
         self.markers.clear()
+        self._touch_document()
         self.next_marker_number = 1
         self.markers_flattened = True
         self.rectangles_flattened = True
@@ -1143,7 +3541,7 @@ class AnnotationCanvas(QWidget):
         self._reset_rect_drag()
         self._marker_dragging = False
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("selection", "style")
 
     def _has_active_marker(self):
         return (
@@ -1156,70 +3554,74 @@ class AnnotationCanvas(QWidget):
         if color.isValid():
             self.marker_fill_color = color
             if self._has_active_marker():
-                self.markers[self.selected_marker_index]['fill'] = QColor(color)
+                self._edit_shape('markers', self.selected_marker_index, 'fill', QColor(color))
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("style")
 
     def set_marker_size(self, size: int):
         self.marker_size = max(10, min(120, size))
         if self._has_active_marker():
-            self.markers[self.selected_marker_index]['size'] = self.marker_size
+            self._edit_shape('markers', self.selected_marker_index, 'size', self.marker_size)
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def set_next_marker_number(self, number: int):
         self.next_marker_number = max(1, number)
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def set_current_marker_number(self, number: int):
         if self._has_active_marker():
-            self.markers[self.selected_marker_index]['number'] = max(1, number)
+            self._edit_shape('markers', self.selected_marker_index, 'number', max(1, number))
             self.update()
-            self.optionsUpdated.emit()
 
     def set_marker_border_enabled(self, enabled: bool):
         self.marker_border_enabled = enabled
         if self._has_active_marker():
-            self.markers[self.selected_marker_index]['border_enabled'] = enabled
+            self._edit_shape('markers', self.selected_marker_index, 'border_enabled', enabled)
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def set_marker_border_color(self, color: QColor):
         if color.isValid():
             self.marker_border_color = color
             if self._has_active_marker():
-                self.markers[self.selected_marker_index]['border_color'] = QColor(color)
+                self._edit_shape('markers', self.selected_marker_index, 'border_color', QColor(color))
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("style")
 
     def set_marker_font_ratio(self, ratio: float):
         self.marker_font_ratio = max(0.3, min(1.2, ratio))
         if self._has_active_marker():
-            self.markers[self.selected_marker_index]['font_ratio'] = self.marker_font_ratio
+            self._edit_shape('markers', self.selected_marker_index, 'font_ratio', self.marker_font_ratio)
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def flatten_markers(self):
+        if not self.markers_flattened:
+            self._record_history(("flatten", [], self._shape_flags(), (True, self.rectangles_flattened)))
         self.dragging_marker_index = None
         self.markers_flattened = True
+        self._touch_document()
         self.selected_marker_index = None
         self.hover_marker_index = None
         self.next_marker_number = 1
-        self.optionsUpdated.emit()
+        self._queue_change("selection", "style")
 
     def duplicate_marker(self):
         if self._has_active_marker():
             marker = dict(self.markers[self.selected_marker_index])
             marker['pos'] = marker['pos'] + QPoint(12, 12)
             self.markers.append(marker)
+            self._touch_document()
             self.selected_marker_index = len(self.markers) - 1
+            self._begin_drag_history('markers', self.selected_marker_index, created=True)
             self.dragging_marker_index = self.selected_marker_index
             self.selected_rectangle_index = None
             self.rect_drag_mode = None
             self._set_hover_marker(None)
             self.markers_flattened = False
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
 
     def _has_active_rectangle(self):
         return (
@@ -1229,51 +3631,75 @@ class AnnotationCanvas(QWidget):
             and not self.rectangles[self.selected_rectangle_index]['flattened']
         )
 
+    def _has_active_redaction(self):
+        return self._has_active_rectangle() and _is_redaction(self.rectangles[self.selected_rectangle_index])
+
+    def set_redact_mode(self, mode: str):
+        if mode not in REDACT_MODES:
+            return
+        self.redact_mode = mode
+        if self._has_active_redaction():
+            self._edit_shape('rectangles', self.selected_rectangle_index, 'mode', mode)
+        self.update()
+        self._queue_change("style")
+
+    def set_redact_strength(self, strength: int):
+        self.redact_strength = _clamp_redact_strength(strength)
+        if self._has_active_redaction():
+            self._edit_shape('rectangles', self.selected_rectangle_index, 'strength', self.redact_strength)
+        self.update()
+        self._queue_change("style")
+
     def set_rectangle_fill_color(self, color: QColor):
         if color.isValid():
             self.rectangle_fill_color = color
             if self._has_active_rectangle():
-                self.rectangles[self.selected_rectangle_index]['fill'] = QColor(color)
+                self._edit_shape('rectangles', self.selected_rectangle_index, 'fill', QColor(color))
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("style")
 
     def set_rectangle_border_color(self, color: QColor):
         if color.isValid():
             self.rectangle_border_color = color
             if self._has_active_rectangle():
-                self.rectangles[self.selected_rectangle_index]['border'] = QColor(color)
+                self._edit_shape('rectangles', self.selected_rectangle_index, 'border', QColor(color))
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("style")
 
     def set_rectangle_border_width(self, width: int):
         self.rectangle_border_width = max(1, min(20, width))
         if self._has_active_rectangle():
-            self.rectangles[self.selected_rectangle_index]['width'] = self.rectangle_border_width
+            self._edit_shape('rectangles', self.selected_rectangle_index, 'width', self.rectangle_border_width)
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def set_rectangle_corner_radius(self, radius: int):
         self.rectangle_corner_radius = max(0, min(60, radius))
         if self._has_active_rectangle():
-            self.rectangles[self.selected_rectangle_index]['radius'] = self.rectangle_corner_radius
+            self._edit_shape('rectangles', self.selected_rectangle_index, 'radius', self.rectangle_corner_radius)
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def set_rectangle_border_enabled(self, enabled: bool):
         self.rectangle_border_enabled = enabled
         if self._has_active_rectangle():
-            self.rectangles[self.selected_rectangle_index]['border_enabled'] = enabled
+            self._edit_shape('rectangles', self.selected_rectangle_index, 'border_enabled', enabled)
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("style")
 
     def flatten_rectangle(self):
         if self._has_active_rectangle():
-            self.rectangles[self.selected_rectangle_index]['flattened'] = True
+            index = self.selected_rectangle_index
+            before_flags = self._shape_flags()
+            self._commit_drag_history()
+            self.rectangles[index]['flattened'] = True
+            self._touch_document()
             self.selected_rectangle_index = None
             if all(r['flattened'] for r in self.rectangles):
                 self.rectangles_flattened = True
+            self._record_history(("flatten", [index], before_flags, self._shape_flags()))
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
 
     def duplicate_rectangle(self):
         if self._has_active_rectangle():
@@ -1281,15 +3707,19 @@ class AnnotationCanvas(QWidget):
             info['rect'] = info['rect'].translated(12, 12)
             info['flattened'] = False
         self.rectangles.append(info)
+        self._touch_document()
         self.selected_rectangle_index = len(self.rectangles) - 1
+        self._record_history(
+            ("insert", 'rectangles', self.selected_rectangle_index, _copy_shapes([info])[0])
+        )
         self.selected_marker_index = None
         self.dragging_marker_index = None
         self._set_hover_marker(None)
         self.rectangles_flattened = False
         self.update()
-        self.optionsUpdated.emit()
+        self._queue_change("selection")
 
-    def apply_style_defaults(self, marker_style, rect_style):
+    def apply_style_defaults(self, marker_style, rect_style, redact_style=None):
         if marker_style:
             self.marker_fill_color = QColor(marker_style.get("fill", DEFAULT_MARKER_STYLE["fill"]))
             self.marker_border_color = QColor(marker_style.get("border", DEFAULT_MARKER_STYLE["border"]))
@@ -1303,6 +3733,10 @@ class AnnotationCanvas(QWidget):
             self.rectangle_border_enabled = rect_style.get("border_enabled", DEFAULT_RECT_STYLE["border_enabled"])
             self.rectangle_border_width = rect_style.get("width", DEFAULT_RECT_STYLE["width"])
             self.rectangle_corner_radius = rect_style.get("radius", DEFAULT_RECT_STYLE["radius"])
+        if redact_style:
+            mode = redact_style.get("mode", DEFAULT_REDACT_STYLE["mode"])
+            self.redact_mode = mode if mode in REDACT_MODES else DEFAULT_REDACT_STYLE["mode"]
+            self.redact_strength = _clamp_redact_strength(redact_style.get("strength"))
 
     def marker_style_state(self):
         return {
@@ -1323,9 +3757,17 @@ class AnnotationCanvas(QWidget):
             "radius": self.rectangle_corner_radius,
         }
 
+    def redact_style_state(self):
+        return {
+            "mode": self.redact_mode,
+            "strength": self.redact_strength,
+        }
+
     def active_selection_kind(self):
         if self._has_active_marker():
             return "marker"
+        if self._has_active_redaction():
+            return "redact"
         if self._has_active_rectangle():
             return "rectangle"
         return "none"
@@ -1350,31 +3792,40 @@ class AnnotationCanvas(QWidget):
         if changed:
             self._update_default_cursor()
             if emit:
-                self.optionsUpdated.emit()
+                self._queue_change("selection")
         self.update()
         return changed
 
     def delete_selected_shape(self):
         if self._has_active_marker():
-            self.markers.pop(self.selected_marker_index)
+            index = self.selected_marker_index
+            self._record_history(("remove", 'markers', index, _copy_shapes([self.markers[index]])[0]))
+            self.markers.pop(index)
+            self._touch_document()
             self.selected_marker_index = None
             self.dragging_marker_index = None
             self._set_hover_marker(None)
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
             return True
         if self._has_active_rectangle():
-            self.rectangles.pop(self.selected_rectangle_index)
+            index = self.selected_rectangle_index
+            self._record_history(("remove", 'rectangles', index, _copy_shapes([self.rectangles[index]])[0]))
+            self.rectangles.pop(index)
+            self._touch_document()
             self.selected_rectangle_index = None
             self.rect_drag_mode = None
             self.rect_drag_handle = None
             self.update()
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
             self._update_default_cursor()
             return True
         return False
 
     def flatten_all_annotations(self):
+        indexes = [index for index, rect in enumerate(self.rectangles) if not rect['flattened']]
+        if indexes or not self.markers_flattened or not self.rectangles_flattened:
+            self._record_history(("flatten", indexes, self._shape_flags(), (True, True)))
         self.markers_flattened = True
         self.selected_marker_index = None
         self.dragging_marker_index = None
@@ -1385,22 +3836,11 @@ class AnnotationCanvas(QWidget):
             rect['flattened'] = True
         self.rectangles_flattened = True
         self.selected_rectangle_index = None
-        self.optionsUpdated.emit()
+        self._touch_document()
+        self._queue_change("selection")
 
     def undo_last_shape(self):
-        if self.markers and not self.markers_flattened:
-            self.markers.pop()
-            self.selected_marker_index = None
-            self.update()
-            self.optionsUpdated.emit()
-            return True
-        if self.rectangles and not self.rectangles_flattened:
-            self.rectangles.pop()
-            self.selected_rectangle_index = None
-            self.update()
-            self.optionsUpdated.emit()
-            return True
-        return False
+        return self.undo()
 
     def _reset_rect_drag(self):
         self.rect_drag_mode = None
@@ -1417,13 +3857,14 @@ class AnnotationCanvas(QWidget):
             return
         if self._handle_marker_press(pos, allow_creation=self.tool == Tool.MARKER):
             return
-        if self._handle_rect_press(pos, allow_creation=self.tool == Tool.RECTANGLE):
+        if self._handle_rect_press(pos, allow_creation=self.tool in (Tool.RECTANGLE, Tool.REDACT)):
             return
 
     def mouseMoveEvent(self, event):
         pos = self._view_to_scene(event.pos())
         if self.dragging_marker_index is not None and not self.markers_flattened:
             self.markers[self.dragging_marker_index]['pos'] = pos
+            self._touch_document()
             self.update()
             return
         if self.rect_drag_mode and self.selected_rectangle_index is not None:
@@ -1437,6 +3878,7 @@ class AnnotationCanvas(QWidget):
             rect = rect.normalized()
             if rect.width() > 4 and rect.height() > 4:
                 info['rect'] = rect
+                self._touch_document()
             self.update()
             return
         self._update_pointer_feedback(pos)
@@ -1457,22 +3899,26 @@ class AnnotationCanvas(QWidget):
                 rect = self.rectangles[self.selected_rectangle_index]['rect']
                 if rect.width() < self.MIN_RECT_SIZE or rect.height() < self.MIN_RECT_SIZE:
                     self.rectangles.pop(self.selected_rectangle_index)
+                    self._touch_document()
+                    self._drag_snapshot = None
                     self.selected_rectangle_index = None
                     self.update()
-                    self.optionsUpdated.emit()
+                    self._queue_change("selection")
             self._reset_rect_drag()
+        self._commit_drag_history()
         self._update_pointer_feedback(pos)
 
     def _handle_marker_press(self, pos: QPoint, allow_creation=True):
         idx = self._marker_hit_test(pos)
         if idx is not None and not self.markers_flattened:
+            self._begin_drag_history('markers', idx)
             self.dragging_marker_index = idx
             self.selected_marker_index = idx
             self.selected_rectangle_index = None
             self.rect_drag_mode = None
             self._set_hover_marker(None)
             self._begin_marker_drag()
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
             self.update()
             return True
         if allow_creation:
@@ -1486,7 +3932,9 @@ class AnnotationCanvas(QWidget):
                 'font_ratio': self.marker_font_ratio,
             }
             self.markers.append(marker)
+            self._touch_document()
             self.selected_marker_index = len(self.markers) - 1
+            self._begin_drag_history('markers', self.selected_marker_index, created=True)
             self.selected_rectangle_index = None
             self.dragging_marker_index = self.selected_marker_index
             self.rect_drag_mode = None
@@ -1494,7 +3942,7 @@ class AnnotationCanvas(QWidget):
             self._set_hover_marker(None)
             self.next_marker_number += 1
             self._begin_marker_drag()
-            self.optionsUpdated.emit()
+            self._queue_change("selection", "style")
             self.update()
             return True
         return False
@@ -1513,6 +3961,7 @@ class AnnotationCanvas(QWidget):
     def _handle_rect_press(self, pos: QPoint, allow_creation=True, handles_only=False):
         idx, handle = self._rect_handle_hit_test(pos)
         if idx is not None:
+            self._begin_drag_history('rectangles', idx)
             self.selected_rectangle_index = idx
             self.selected_marker_index = None
             self.dragging_marker_index = None
@@ -1523,7 +3972,7 @@ class AnnotationCanvas(QWidget):
             self.rectangles_flattened = False
             self.creating_new_rect = False
             self._set_hover_marker(None)
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
             if handle in ("top-left", "bottom-right"):
                 self._update_cursor(Qt.SizeFDiagCursor)
             else:
@@ -1533,6 +3982,7 @@ class AnnotationCanvas(QWidget):
             return False
         idx = self._rect_hit_test(pos)
         if idx is not None:
+            self._begin_drag_history('rectangles', idx)
             self.selected_rectangle_index = idx
             self.selected_marker_index = None
             self.dragging_marker_index = None
@@ -1542,22 +3992,33 @@ class AnnotationCanvas(QWidget):
             self.rectangles_flattened = False
             self.creating_new_rect = False
             self._set_hover_marker(None)
-            self.optionsUpdated.emit()
+            self._queue_change("selection")
             self._update_cursor(Qt.SizeAllCursor)
             return True
         if not allow_creation:
             return False
-        rect_info = {
-            'rect': QRect(pos, pos),
-            'fill': QColor(self.rectangle_fill_color),
-            'border': QColor(self.rectangle_border_color),
-            'border_enabled': self.rectangle_border_enabled,
-            'width': self.rectangle_border_width,
-            'radius': self.rectangle_corner_radius,
-            'flattened': False,
-        }
+        if self.tool == Tool.REDACT:
+            rect_info = {
+                'rect': QRect(pos, pos),
+                'kind': 'redact',
+                'mode': self.redact_mode,
+                'strength': self.redact_strength,
+                'flattened': False,
+            }
+        else:
+            rect_info = {
+                'rect': QRect(pos, pos),
+                'fill': QColor(self.rectangle_fill_color),
+                'border': QColor(self.rectangle_border_color),
+                'border_enabled': self.rectangle_border_enabled,
+                'width': self.rectangle_border_width,
+                'radius': self.rectangle_corner_radius,
+                'flattened': False,
+            }
         self.rectangles.append(rect_info)
+        self._touch_document()
         self.selected_rectangle_index = len(self.rectangles) - 1
+        self._begin_drag_history('rectangles', self.selected_rectangle_index, created=True)
         self.selected_marker_index = None
         self.dragging_marker_index = None
         self.rect_drag_mode = 'resize'
@@ -1567,17 +4028,38 @@ class AnnotationCanvas(QWidget):
         self.rectangles_flattened = False
         self.creating_new_rect = True
         self._set_hover_marker(None)
-        self.optionsUpdated.emit()
+        self._queue_change("selection")
         self._update_cursor(Qt.SizeFDiagCursor)
         return True
 
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        if not self._interactive_zoom:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        scaled_base = self._current_scaled_base()
+        if scaled_base is not None:
+            painter.drawImage(0, 0, scaled_base)
+        elif not self._interactive_zoom:
+            self._start_scaled_base()
         painter.scale(self._zoom, self._zoom)
-        painter.drawPixmap(0, 0, self.base_pixmap)
+        if scaled_base is None:
+            painter.drawPixmap(0, 0, self.base_pixmap)
+        if self.base_error:
+            painter.save()
+            painter.resetTransform()
+            painter.fillRect(self.rect(), QColor("#fdecea"))
+            painter.setPen(QColor("#b3261e"))
+            painter.drawText(self.rect().adjusted(24, 24, -24, -24), Qt.AlignCenter | Qt.TextWordWrap, self.base_error)
+            painter.restore()
         for idx, info in enumerate(self.rectangles):
+            if _is_redaction(info):
+                _draw_redaction(painter, self.base_pixmap, info)
+                if not info['flattened']:
+                    painter.setBrush(Qt.NoBrush)
+                    painter.setPen(QPen(QColor(PANEL_ACCENTS["redact"]), 0, Qt.DashLine))
+                    painter.drawRect(info['rect'].normalized())
+                continue
             painter.setBrush(info['fill'])
             if info['border_enabled']:
                 painter.setPen(QPen(info['border'], info['width']))
@@ -1585,38 +4067,19 @@ class AnnotationCanvas(QWidget):
                 painter.setPen(Qt.NoPen)
             painter.drawRoundedRect(info['rect'], info['radius'], info['radius'])
         painter.setPen(Qt.NoPen)
-        font = QFont()
-        font.setBold(True)
+        if not self.markers:
+            return
+        glow_index = None
+        if not self.markers_flattened and self.dragging_marker_index is None:
+            glow_index = self.selected_marker_index
+        painter.save()
+        painter.resetTransform()
+        device_ratio = self.devicePixelRatioF()
         for idx, marker in enumerate(self.markers):
-            radius = marker['size']
-            font.setPixelSize(int(radius * marker['font_ratio']))
-            painter.setFont(font)
-            ellipse_rect = QRect(marker['pos'].x() - radius, marker['pos'].y() - radius, radius * 2, radius * 2)
-            painter.setBrush(marker['fill'])
-            painter.drawEllipse(ellipse_rect)
-            if marker['border_enabled']:
-                painter.setPen(QPen(marker['border_color'], max(2, radius * 0.2)))
-                painter.setBrush(Qt.NoBrush)
-                painter.drawEllipse(ellipse_rect)
-                painter.setPen(Qt.NoPen)
-            painter.setBrush(marker['fill'])
-            painter.setPen(Qt.white)
-            painter.drawText(ellipse_rect, Qt.AlignCenter, str(marker['number']))
-            painter.setPen(Qt.NoPen)
-            should_draw = (
-                not self.markers_flattened
-                and self.dragging_marker_index is None
-                and idx == self.selected_marker_index
-            )
-            if should_draw:
-                glow_rect = ellipse_rect.adjusted(-int(radius * 0.2), -int(radius * 0.2), int(radius * 0.2), int(radius * 0.2))
-                color = QColor(marker['fill'])
-                color.setAlpha(120)
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(color)
-                painter.drawEllipse(glow_rect)
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(marker['fill'])
+            _draw_marker_sprite(painter, marker, self._zoom, device_ratio, self._interactive_zoom)
+            if idx == glow_index:
+                _draw_marker_glow(painter, marker, self._zoom)
+        painter.restore()
 
     def export_pixmap(self):
         annotated = QPixmap(self.base_pixmap.size())
@@ -1624,35 +4087,29 @@ class AnnotationCanvas(QWidget):
         painter = QPainter(annotated)
         painter.setRenderHint(QPainter.Antialiasing)
         painter.drawPixmap(0, 0, self.base_pixmap)
-        for info in self.rectangles:
-            painter.setBrush(info['fill'])
-            if info['border_enabled']:
-                painter.setPen(QPen(info['border'], info['width']))
-            else:
-                painter.setPen(Qt.NoPen)
-            painter.drawRoundedRect(info['rect'], info['radius'], info['radius'])
-        painter.setPen(Qt.NoPen)
-        font = QFont()
-        font.setBold(True)
-        for marker in self.markers:
-            radius = marker['size']
-            font.setPixelSize(int(radius * marker['font_ratio']))
-            painter.setFont(font)
-            ellipse_rect = QRect(marker['pos'].x() - radius, marker['pos'].y() - radius, radius * 2, radius * 2)
-            painter.setBrush(marker['fill'])
-            painter.drawEllipse(ellipse_rect)
-            if marker['border_enabled']:
-                painter.setPen(QPen(marker['border_color'], max(2, radius * 0.2)))
-                painter.setBrush(Qt.NoBrush)
-                painter.drawEllipse(ellipse_rect)
-                painter.setPen(Qt.NoPen)
-            painter.setBrush(marker['fill'])
-            painter.setPen(Qt.white)
-            painter.drawText(ellipse_rect, Qt.AlignCenter, str(marker['number']))
-            painter.setPen(Qt.NoPen)
+        _paint_annotation_shapes(painter, self.rectangles, self.markers, self.base_pixmap)
         painter.end()
         return annotated
 
+    def snapshot_renderer(self, max_edge=None):
+        base = self.base_pixmap
+        rectangles = _copy_shapes(self.rectangles)
+        markers = _copy_shapes(self.markers)
+
+        def render():
+            image = render_annotated_image(base, rectangles, markers)
+            if max_edge and max(image.width(), image.height()) > max_edge:
+                image = image.scaled(max_edge, max_edge, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            return image
+
+        return render
+
+    def clipboard_cache(self, variant="full"):
+        if self._clipboard_cache_revision != self.document_revision:
+            self._clipboard_cache_revision = self.document_revision
+            self._clipboard_caches = {}
+        return self._clipboard_caches.setdefault(variant, {})
+
     def _marker_hit_test(self, pos: QPoint):
         for idx, marker in enumerate(self.markers):
             radius = marker['size']
@@ -1742,7 +4199,7 @@ class AnnotationCanvas(QWidget):
         self._update_default_cursor()
 
     def _update_default_cursor(self):
-        if self.tool == Tool.MARKER:
+        if self.tool in (Tool.MARKER, Tool.REDACT):
             self._update_cursor(Qt.CrossCursor)
         else:
             self._update_cursor(Qt.ArrowCursor)
@@ -1762,16 +4219,32 @@ class AnnotationTab(QWidget):
         auto_save_enabled,
         source_path=None,
         initial_zoom=1.0,
+        capture_info=None,
+        saved_callback=None,
+        undo_limit=AnnotationHistory.DEFAULT_LIMIT,
+        tab_id=None,
+        restored_path=None,
+        template_callback=None,
     ):
         super().__init__()
+        self.template_callback = template_callback
+        self.tab_id = tab_id or uuid.uuid4().hex
         self.image_quality = self._clamp_quality(image_quality)
         self.auto_save_enabled = bool(auto_save_enabled)
-        self.canvas = AnnotationCanvas(pixmap)
-        self.canvas.apply_style_defaults(style_state.get("marker"), style_state.get("rectangle"))
+        self.capture_info = dict(capture_info or {})
+        self.saved_callback = saved_callback
+        self.canvas = AnnotationCanvas(pixmap, undo_limit=undo_limit)
+        self.canvas.set_base_source(source_path)
+        self.canvas.apply_style_defaults(
+            style_state.get("marker"), style_state.get("rectangle"), style_state.get("redact")
+        )
         self.save_dir = save_dir
         if source_path:
             self.auto_saved_path = source_path
             self._external_source = True
+        elif restored_path:
+            self.auto_saved_path = restored_path
+            self._external_source = False
         else:
             self.auto_saved_path = self._auto_save_pixmap(pixmap)
             self._external_source = False
@@ -1817,6 +4290,14 @@ class AnnotationTab(QWidget):
                 background: #2ed3a3;
                 color: #0c1c27;
             }
+            QToolBar#AnnotationToolbar QToolButton#Tool_redact {
+                background: rgba(211,84,0,0.16);
+                color: #8a3700;
+            }
+            QToolBar#AnnotationToolbar QToolButton#Tool_redact:checked {
+                background: #d35400;
+                color: #ffffff;
+            }
             """
         )
 
@@ -1836,6 +4317,14 @@ class AnnotationTab(QWidget):
         if marker_button:
             marker_button.setObjectName("Tool_marker")
 
+        redact_action = QAction("打码", self)
+        redact_action.setCheckable(True)
+        redact_action.triggered.connect(lambda: self._set_tool(Tool.REDACT))
+        toolbar.addAction(redact_action)
+        redact_button = toolbar.widgetForAction(redact_action)
+        if redact_button:
+            redact_button.setObjectName("Tool_redact")
+
         clear_action = QAction("清除标注", self)
         clear_action.triggered.connect(self.canvas.clear_annotations)
         toolbar.addAction(clear_action)
@@ -1848,11 +4337,28 @@ class AnnotationTab(QWidget):
         save_action.triggered.connect(self.save_annotated_image)
         toolbar.addAction(save_action)
 
-        self._tool_actions = {Tool.RECTANGLE: rect_action, Tool.MARKER: marker_action}
+        copy_small_action = QAction("复制缩小版", self)
+        copy_small_action.triggered.connect(self._copy_downscaled_to_clipboard)
+        toolbar.addAction(copy_small_action)
+
+        save_template_action = QAction("存为模板", self)
+        save_template_action.triggered.connect(lambda: self._request_template("save"))
+        toolbar.addAction(save_template_action)
+
+        apply_template_action = QAction("套用模板", self)
+        apply_template_action.triggered.connect(lambda: self._request_template("apply"))
+        toolbar.addAction(apply_template_action)
+
+        self._tool_actions = {
+            Tool.RECTANGLE: rect_action,
+            Tool.MARKER: marker_action,
+            Tool.REDACT: redact_action,
+        }
         layout.addWidget(toolbar)
 
         self.marker_panel = MarkerOptionsPanel(self.canvas)
         self.rectangle_panel = RectangleOptionsPanel(self.canvas)
+        self.redact_panel = RedactOptionsPanel(self.canvas)
         self._options_placeholder = QWidget()
         self._options_placeholder.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
 
@@ -1861,12 +4367,18 @@ class AnnotationTab(QWidget):
         self.panel_stack.addWidget(self._options_placeholder)
         self.panel_stack.addWidget(self.marker_panel)
         self.panel_stack.addWidget(self.rectangle_panel)
+        self.panel_stack.addWidget(self.redact_panel)
 
-        stack_height = max(self.marker_panel.sizeHint().height(), self.rectangle_panel.sizeHint().height())
+        stack_height = max(
+            self.marker_panel.sizeHint().height(),
+            self.rectangle_panel.sizeHint().height(),
+            self.redact_panel.sizeHint().height(),
+        )
         self.panel_stack.setFixedHeight(stack_height)
         self._options_placeholder.setFixedHeight(stack_height)
         self.marker_panel.setMinimumHeight(stack_height)
         self.rectangle_panel.setMinimumHeight(stack_height)
+        self.redact_panel.setMinimumHeight(stack_height)
 
         layout.addWidget(self.panel_stack)
 
@@ -1886,7 +4398,11 @@ class AnnotationTab(QWidget):
         status_layout.addWidget(self.zoom_label, 0, alignment=Qt.AlignRight)
         layout.addLayout(status_layout)
         self.setLayout(layout)
-        self.canvas.optionsUpdated.connect(self._handle_canvas_update)
+        self.canvas.shapesChanged.connect(self._on_shapes_changed)
+        self.canvas.baseUnavailable.connect(self._on_base_unavailable)
+        self.canvas.selectionChanged.connect(self._on_selection_changed)
+        self.canvas.styleChanged.connect(self._persist_style_defaults)
+        self._clean_revision = self.canvas.document_revision
         self._update_panel_visibility()
         self._persist_style_defaults()
         if not self._external_source and not self.auto_save_enabled:
@@ -1894,8 +4410,14 @@ class AnnotationTab(QWidget):
 
         self.undo_shortcut = QShortcut(QKeySequence("Ctrl+Z"), self)
         self.undo_shortcut.activated.connect(self._undo_last_action)
+        self.redo_shortcut = QShortcut(QKeySequence("Ctrl+Y"), self)
+        self.redo_shortcut.activated.connect(self._redo_last_action)
+        self.redo_alt_shortcut = QShortcut(QKeySequence("Ctrl+Shift+Z"), self)
+        self.redo_alt_shortcut.activated.connect(self._redo_last_action)
         self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
         self.copy_shortcut.activated.connect(self._copy_to_clipboard)
+        self.copy_small_shortcut = QShortcut(QKeySequence("Ctrl+Shift+C"), self)
+        self.copy_small_shortcut.activated.connect(self._copy_downscaled_to_clipboard)
         self.delete_shortcut = QShortcut(QKeySequence("Delete"), self)
         self.delete_shortcut.activated.connect(self._delete_selected)
         self.save_shortcut = QShortcut(QKeySequence("Ctrl+S"), self)
@@ -1919,26 +4441,66 @@ class AnnotationTab(QWidget):
 
     def _auto_save_pixmap(self, pixmap: QPixmap):
         os.makedirs(self.save_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"screenshot_{timestamp}.jpg"
-        path = os.path.join(self.save_dir, filename)
+        path = _unique_capture_path(self.save_dir)
         if self.auto_save_enabled:
-            pixmap.save(path, "JPG", self.image_quality)
+            data = save_image_atomic(pixmap, path, "JPG", self.image_quality)
+            if data is not None:
+                self._notify_saved(path, "capture", data)
         return path
 
+    def _notify_saved(self, path, kind, data=None):
+        if not self.saved_callback:
+            return
+        info = dict(self.capture_info)
+        info["kind"] = kind
+        info["data"] = data
+        if kind == "annotated":
+            info["annotation_count"] = len(self.canvas.rectangles) + len(self.canvas.markers)
+            info["source_path"] = self.auto_saved_path
+        self.saved_callback(path, info)
+
+    def _on_base_unavailable(self, message):
+        self.base_status_text = message
+        self.status_label.setText(message)
+        self.status_label.setStyleSheet("color: #b3261e;")
+
+    def _refuse_without_base(self, title):
+        if not self.canvas.base_error:
+            return False
+        QMessageBox.warning(self, title, f"{self.canvas.base_error}\n\n为避免用错误的底图覆盖原有内容，已停止此操作。")
+        return True
+
     def save_annotated_image(self):
+        if self._refuse_without_base("保存失败"):
+            return False
         if self.canvas.markers and not self.canvas.markers_flattened:
             self.canvas.flatten_all_annotations()
         annotated = self.canvas.export_pixmap()
         base, _ = os.path.splitext(os.path.basename(self.auto_saved_path))
         annotated_path = os.path.join(self.save_dir, f"{base}_annotated.jpg")
-        if annotated.save(annotated_path, "JPG", self.image_quality):
+        data = save_image_atomic(annotated, annotated_path, "JPG", self.image_quality)
+        if data is not None:
+            self._notify_saved(annotated_path, "annotated", data)
             self.status_label.setText(f"标注图已保存: {annotated_path}")
             self._set_dirty(False)
             return True
         QMessageBox.warning(self, "保存失败", "无法写入标注截图，请检查保存路径。")
         return False
 
+    def mark_changed_regions(self, regions):
+        if not regions:
+            self.status_label.setText("与上一次截图相比没有变化")
+            return
+        rectangles = []
+        for region in regions:
+            info = dict(REPEAT_DIFF_STYLE)
+            info['rect'] = QRect(region)
+            info['fill'] = QColor(info['fill'])
+            info['border'] = QColor(info['border'])
+            rectangles.append(info)
+        self.canvas.apply_template(rectangles, [])
+        self.status_label.setText(f"与上一次截图相比有 {len(regions)} 处变化，已用红框标出")
+
     def _set_tool(self, tool: Tool):
         self._current_tool = tool
         self.canvas.clear_active_selection(emit=False)
@@ -1946,10 +4508,13 @@ class AnnotationTab(QWidget):
         self._sync_tool_action_checks(tool)
         self._update_panel_visibility(preferred=tool)
 
-    def _handle_canvas_update(self):
-        self._mark_dirty()
+    def _on_shapes_changed(self, revision):
+        if revision != self._clean_revision and not self.dirty:
+            self._mark_dirty()
+
+    def _on_selection_changed(self, kind):
         self._update_panel_visibility()
-    
+
     def _handle_escape(self):
         if self._current_tool in (Tool.MARKER,):
             self._set_tool(Tool.NONE)
@@ -1965,6 +4530,8 @@ class AnnotationTab(QWidget):
             target = Tool.MARKER
         elif kind == "rectangle":
             target = Tool.RECTANGLE
+        elif kind == "redact":
+            target = Tool.REDACT
         else:
             target = preferred or self._current_tool
         if target == Tool.MARKER:
@@ -1973,17 +4540,22 @@ class AnnotationTab(QWidget):
         elif target == Tool.RECTANGLE:
             self.panel_stack.setCurrentWidget(self.rectangle_panel)
             self._set_panel_active_state(rectangle=True)
+        elif target == Tool.REDACT:
+            self.panel_stack.setCurrentWidget(self.redact_panel)
+            self._set_panel_active_state(redact=True)
         else:
             self.panel_stack.setCurrentWidget(self._options_placeholder)
             self._set_panel_active_state()
-        tracking = target if target in (Tool.MARKER, Tool.RECTANGLE) else Tool.NONE
+        tracking = target if target in (Tool.MARKER, Tool.RECTANGLE, Tool.REDACT) else Tool.NONE
         self._sync_tool_action_checks(tracking)
 
-    def _set_panel_active_state(self, marker=False, rectangle=False):
+    def _set_panel_active_state(self, marker=False, rectangle=False, redact=False):
         if hasattr(self.marker_panel, "set_panel_active"):
             self.marker_panel.set_panel_active(bool(marker))
         if hasattr(self.rectangle_panel, "set_panel_active"):
             self.rectangle_panel.set_panel_active(bool(rectangle))
+        if hasattr(self.redact_panel, "set_panel_active"):
+            self.redact_panel.set_panel_active(bool(redact))
 
     def _sync_tool_action_checks(self, active_tool: Tool):
         actions = getattr(self, "_tool_actions", {})
@@ -2012,7 +4584,6 @@ class AnnotationTab(QWidget):
 
     def _mark_dirty(self):
         self.status_label.setText(f"{self.base_status_text} *未保存")
-        self._persist_style_defaults()
         self._set_dirty(True)
 
     def _set_dirty(self, dirty):
@@ -2020,6 +4591,7 @@ class AnnotationTab(QWidget):
             self.dirty = dirty
             self.dirtyStateChanged.emit(self.dirty)
         if not dirty:
+            self._clean_revision = self.canvas.document_revision
             self.base_status_text = self._default_base_status_text()
             self.status_label.setText(self.base_status_text)
 
@@ -2034,6 +4606,20 @@ class AnnotationTab(QWidget):
         if not self.dirty:
             self.status_label.setText(self.base_status_text)
 
+    def image_memory_bytes(self):
+        return self.canvas.base_memory_bytes()
+
+    def ensure_base_image(self):
+        return self.canvas.base_pixmap
+
+    def evict_base_image(self, cache_dir):
+        spill_path = os.path.join(cache_dir, f"{self.tab_id}.raw")
+        return self.canvas.evict_base_pixmap(spill_path)
+
+    def discard_cached_image(self):
+        self.canvas.discard_spilled_base()
+        self.canvas._drop_scaled_base()
+
     def _default_base_status_text(self):
         if self._external_source:
             return f"原始文件: {self.auto_saved_path}"
@@ -2049,13 +4635,50 @@ class AnnotationTab(QWidget):
         else:
             QMessageBox.information(self, "无法撤销", "当前没有可撤销的操作。")
 
-    def _copy_to_clipboard(self):
+    def _request_template(self, action):
+        if callable(self.template_callback):
+            self.template_callback(action, self)
+
+    def apply_template(self, template):
+        applied = self.canvas.apply_template(
+            _deserialize_shapes(template.get("rectangles", [])),
+            _deserialize_shapes(template.get("markers", [])),
+        )
+        if applied:
+            self.status_label.setText(f"已套用模板: {template.get('name', '')}")
+            self._mark_dirty()
+        return applied
+
+    def _redo_last_action(self):
+        if self.canvas.redo():
+            self.status_label.setText("已重做上一次撤销的操作")
+            self._mark_dirty()
+        else:
+            self.status_label.setText("当前没有可重做的操作")
+
+    def set_undo_limit(self, limit):
+        self.canvas.set_undo_limit(limit)
+
+    def _copy_to_clipboard(self, downscaled=False):
+        if self._refuse_without_base("复制失败"):
+            return
         self.canvas.flatten_all_annotations()
-        pix = self.canvas.export_pixmap()
-        QApplication.clipboard().setPixmap(pix)
-        self.status_label.setText("已平化并复制到剪贴板")
+        max_edge = CLIPBOARD_DOWNSCALE_MAX_EDGE if downscaled else None
+        variant = "downscaled" if downscaled else "full"
+        mime = LazyImageMimeData(
+            self.canvas.snapshot_renderer(max_edge=max_edge),
+            cache=self.canvas.clipboard_cache(variant),
+        )
+        QApplication.clipboard().setMimeData(mime)
+        if downscaled:
+            self.status_label.setText(f"已平化并复制缩小版（最长边 {CLIPBOARD_DOWNSCALE_MAX_EDGE}px）到剪贴板")
+        else:
+            self.status_label.setText("已平化并复制到剪贴板")
         self._mark_dirty()
 
+    def _copy_downscaled_to_clipboard(self):
+        self._copy_to_clipboard(downscaled=True)
+
     def _delete_selected(self):
         if self.canvas.delete_selected_shape():
             self.status_label.setText("已删除当前选择")
@@ -2070,6 +4693,7 @@ class AnnotationTab(QWidget):
         rect_style = self.canvas.rectangle_style_state()
         self.style_callback("marker", marker_style)
         self.style_callback("rectangle", rect_style)
+        self.style_callback("redact", self.canvas.redact_style_state())
 
     def maybe_close(self):
         if not self.dirty:
@@ -2198,7 +4822,9 @@ class MarkerOptionsPanel(QFrame):
         layout.addLayout(actions_row)
 
         self.setLayout(layout)
-        self.canvas.optionsUpdated.connect(self.sync_from_canvas)
+        self.canvas.styleChanged.connect(self._sync_style)
+        self.canvas.selectionChanged.connect(self._sync_selection)
+        self.canvas.shapesChanged.connect(self._sync_selection)
         self.sync_from_canvas()
 
     def _apply_style(self):
@@ -2253,19 +4879,14 @@ class MarkerOptionsPanel(QFrame):
         color = QColorDialog.getColor(self.canvas.marker_fill_color, self, "选择顺序标记填充色")
         if color.isValid():
             self.canvas.set_marker_color(color)
-            self._update_color_button()
-            self._refresh_palette_highlight()
 
     def _choose_border_color(self):
         color = QColorDialog.getColor(self.canvas.marker_border_color, self, "选择描边颜色")
         if color.isValid():
             self.canvas.set_marker_border_color(color)
-            self._update_border_button()
 
     def _set_palette_color(self, color: QColor):
         self.canvas.set_marker_color(color)
-        self._update_color_button()
-        self._refresh_palette_highlight()
 
     def _update_border_button(self):
         color = self.canvas.marker_border_color
@@ -2280,6 +4901,10 @@ class MarkerOptionsPanel(QFrame):
             btn.style().polish(btn)
 
     def sync_from_canvas(self):
+        self._sync_style()
+        self._sync_selection()
+
+    def _sync_style(self):
         self._update_color_button()
         self._update_border_button()
         self._refresh_palette_highlight()
@@ -2295,6 +4920,8 @@ class MarkerOptionsPanel(QFrame):
         self.border_checkbox.blockSignals(True)
         self.border_checkbox.setChecked(self.canvas.marker_border_enabled)
         self.border_checkbox.blockSignals(False)
+
+    def _sync_selection(self, *_):
         active = (
             self.canvas.selected_marker_index is not None
             and not self.canvas.markers_flattened
@@ -2394,7 +5021,8 @@ class RectangleOptionsPanel(QFrame):
         layout.addLayout(actions_row)
 
         self.setLayout(layout)
-        self.canvas.optionsUpdated.connect(self.sync_from_canvas)
+        self.canvas.styleChanged.connect(self._sync_style)
+        self.canvas.selectionChanged.connect(self._sync_selection)
         self.sync_from_canvas()
 
     def _apply_style(self):
@@ -2440,13 +5068,11 @@ class RectangleOptionsPanel(QFrame):
 
     def _apply_palette_color(self, color: QColor):
         self.canvas.set_rectangle_border_color(color)
-        self.sync_from_canvas()
 
     def _choose_color(self):
         color = QColorDialog.getColor(self.canvas.rectangle_border_color, self, "选择标注框描边色")
         if color.isValid():
             self.canvas.set_rectangle_border_color(color)
-            self.sync_from_canvas()
 
     def _refresh_palette_highlight(self):
         border_color = self.canvas.rectangle_border_color
@@ -2456,6 +5082,10 @@ class RectangleOptionsPanel(QFrame):
             btn.style().polish(btn)
 
     def sync_from_canvas(self):
+        self._sync_style()
+        self._sync_selection()
+
+    def _sync_style(self):
         color = self.canvas.rectangle_border_color
         self.color_btn.setStyleSheet(
             f"background-color: {color.name(QColor.HexArgb)}; border: 1px solid #cfd6e6; padding: 6px; border-radius:10px;"
@@ -2466,59 +5096,1004 @@ class RectangleOptionsPanel(QFrame):
         self.radius_spin.blockSignals(True)
         self.radius_spin.setValue(self.canvas.rectangle_corner_radius)
         self.radius_spin.blockSignals(False)
-        self.duplicate_btn.setEnabled(self.canvas._has_active_rectangle())
         self._refresh_palette_highlight()
 
+    def _sync_selection(self, *_):
+        self.duplicate_btn.setEnabled(self.canvas._has_active_rectangle())
+
     def _set_radius_preset(self, value: int):
         self.canvas.set_rectangle_corner_radius(value)
-        self.sync_from_canvas()
 
 
-class AnnotationWorkspacePage(QWidget):
-    def __init__(
-        self,
-        open_settings_callback,
-        open_images_callback,
-        style_state,
-        style_callback,
-        image_quality,
-        auto_save_enabled,
-        default_zoom=1.0,
-        zoom_changed_callback=None,
-    ):
+class RedactOptionsPanel(QFrame):
+    MODE_LABELS = {"pixelate": "马赛克", "blur": "模糊"}
+
+    def __init__(self, canvas: AnnotationCanvas):
         super().__init__()
-        self._open_settings_callback = open_settings_callback
-        self._open_images_callback = open_images_callback
-        self._style_state = style_state
-        self._style_callback = style_callback
-        self._image_quality = self._clamp_quality(image_quality)
-        self._auto_save_enabled = bool(auto_save_enabled)
-        self._display_zoom = self._clamp_zoom(default_zoom)
-        self._zoom_callback = zoom_changed_callback
-        self._updating_zoom = False
+        self.canvas = canvas
+        self.setObjectName("RedactPanel")
+        self._accent = QColor(PANEL_ACCENTS["redact"])
+        self._active = False
+        self.mode_buttons = {}
+        self._apply_style()
+
         layout = QVBoxLayout()
+        layout.setContentsMargins(18, 16, 18, 16)
+        layout.setSpacing(14)
 
-        self.tabs = QTabWidget()
-        self.tabs.setTabsClosable(True)
-        self.tabs.tabCloseRequested.connect(self._close_tab)
-        layout.addWidget(self.tabs, 1)
+        mode_row = QHBoxLayout()
+        mode_row.setSpacing(10)
+        mode_label = QLabel("打码方式")
+        mode_label.setStyleSheet("color:#424a5f;font-weight:600;")
+        mode_row.addWidget(mode_label)
+        for mode in REDACT_MODES:
+            btn = QPushButton(self.MODE_LABELS[mode])
+            btn.setProperty("class", "option-chip")
+            btn.setCheckable(True)
+            btn.setCursor(Qt.PointingHandCursor)
+            btn.clicked.connect(lambda _, m=mode: self.canvas.set_redact_mode(m))
+            self.mode_buttons[mode] = btn
+            mode_row.addWidget(btn)
+        mode_row.addStretch()
+        layout.addLayout(mode_row)
+
+        strength_row = QHBoxLayout()
+        strength_row.setSpacing(10)
+        strength_label = QLabel("强度")
+        self.strength_spin = QSpinBox()
+        self.strength_spin.setRange(2, 64)
+        self.strength_spin.valueChanged.connect(canvas.set_redact_strength)
+        strength_row.addWidget(strength_label)
+        strength_row.addWidget(self.strength_spin)
+        hint = QLabel("在图上拖出需要遮挡的区域，导出和复制时一并生效")
+        hint.setStyleSheet("color:#6b7285;")
+        strength_row.addSpacing(10)
+        strength_row.addWidget(hint)
+        strength_row.addStretch()
+        layout.addLayout(strength_row)
 
-        hint = QLabel("尚未添加截图，使用区域截取或重复截取后会在此显示。")
-        hint.setAlignment(Qt.AlignCenter)
-        hint.setStyleSheet("color: #777777;")
-        self._empty_hint = hint
-        layout.addWidget(hint)
         self.setLayout(layout)
+        self.canvas.styleChanged.connect(self._sync_style)
+        self.sync_from_canvas()
 
-        self._update_hint_visibility()
+    def _apply_style(self):
+        soft = QColor(self._accent).lighter(185).name()
+        strong = QColor(self._accent).lighter(150).name()
+        button_bg = QColor(self._accent).darker(105).name()
+        checked_bg = QColor(self._accent).darker(140).name()
+        self.setStyleSheet(
+            f"""
+            QFrame#RedactPanel {{
+                background-color: {soft};
+                border-radius: 20px;
+                border: none;
+            }}
+            QFrame#RedactPanel[active="true"] {{
+                background-color: {strong};
+            }}
+            QPushButton[class="option-chip"] {{
+                padding: 6px 18px;
+                border-radius: 14px;
+                border: none;
+                background: {button_bg};
+                font-weight: 600;
+                color: #ffffff;
+            }}
+            QPushButton[class="option-chip"]:checked {{
+                background: {checked_bg};
+            }}
+            """
+        )
 
-    def _update_hint_visibility(self):
-        has_tabs = self.tabs.count() > 0
-        self._empty_hint.setVisible(not has_tabs)
-        self.tabs.setVisible(has_tabs)
+    def set_panel_active(self, active: bool):
+        if getattr(self, "_active", False) == active:
+            return
+        self._active = active
+        self.setProperty("active", active)
+        self.style().unpolish(self)
+        self.style().polish(self)
 
-    def add_capture(self, pixmap: QPixmap, save_dir: str, initial_zoom=1.0):
-        self._create_tab(pixmap, save_dir, initial_zoom=initial_zoom)
+    def sync_from_canvas(self):
+        self._sync_style()
+
+    def _sync_style(self):
+        for mode, btn in self.mode_buttons.items():
+            btn.setChecked(mode == self.canvas.redact_mode)
+        self.strength_spin.blockSignals(True)
+        self.strength_spin.setValue(self.canvas.redact_strength)
+        self.strength_spin.blockSignals(False)
+
+
+class ImageMemoryManager:
+    MIN_BUDGET_MB = 128
+    MAX_BUDGET_MB = 65536
+
+    def __init__(self, budget_mb=DEFAULT_MEMORY_BUDGET_MB, cache_dir=PIXMAP_CACHE_DIR):
+        self._cache_dir = cache_dir
+        self._budget_bytes = 0
+        self._tabs = OrderedDict()
+        self._evictions = 0
+        self.set_budget_mb(budget_mb)
+        self._purge_cache_dir()
+
+    @classmethod
+    def clamp_budget_mb(cls, budget_mb):
+        try:
+            budget_mb = int(budget_mb)
+        except (TypeError, ValueError):
+            budget_mb = DEFAULT_MEMORY_BUDGET_MB
+        return max(cls.MIN_BUDGET_MB, min(cls.MAX_BUDGET_MB, budget_mb))
+
+    def set_budget_mb(self, budget_mb):
+        self._budget_bytes = self.clamp_budget_mb(budget_mb) * 1024 * 1024
+
+    def budget_bytes(self):
+        return self._budget_bytes
+
+    def touch(self, tab):
+        self._tabs[tab] = None
+        self._tabs.move_to_end(tab)
+
+    def unregister(self, tab):
+        self._tabs.pop(tab, None)
+        if hasattr(tab, "discard_cached_image"):
+            tab.discard_cached_image()
+
+    def resident_bytes(self):
+        return sum(tab.image_memory_bytes() for tab in self._tabs)
+
+    def enforce(self, protect=None):
+        total = self.resident_bytes()
+        if total <= self._budget_bytes:
+            return 0
+        freed_total = 0
+        for tab in list(self._tabs):
+            if total <= self._budget_bytes:
+                break
+            if tab is protect:
+                continue
+            freed = tab.evict_base_image(self._cache_dir)
+            if freed:
+                self._evictions += 1
+                total -= freed
+                freed_total += freed
+        return freed_total
+
+    def stats(self):
+        resident = [tab for tab in self._tabs if tab.image_memory_bytes()]
+        return {
+            "budget_bytes": self._budget_bytes,
+            "resident_bytes": self.resident_bytes(),
+            "resident_tabs": len(resident),
+            "tracked_tabs": len(self._tabs),
+            "evictions": self._evictions,
+        }
+
+    def _purge_cache_dir(self):
+        if not os.path.isdir(self._cache_dir):
+            return
+        for entry in os.scandir(self._cache_dir):
+            if entry.is_file() and entry.name.endswith(".raw"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+class ImageMemoryDialog(QDialog):
+    def __init__(self, parent=None, ledger=None):
+        super().__init__(parent)
+        self.setWindowTitle("图像内存")
+        self.setWindowIcon(get_app_icon())
+        self.resize(360, 320)
+        self._ledger = ledger or _IMAGE_LEDGER
+        layout = QVBoxLayout()
+
+        self.stage_list = QListWidget()
+        layout.addWidget(self.stage_list, 1)
+        self.total_label = QLabel()
+        self.peak_label = QLabel()
+        self.capture_label = QLabel()
+        for label in (self.total_label, self.peak_label, self.capture_label):
+            layout.addWidget(label)
+
+        button_row = QHBoxLayout()
+        button_row.addStretch()
+        reset_btn = QPushButton("重置峰值")
+        reset_btn.clicked.connect(self._reset_peak)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.close)
+        button_row.addWidget(reset_btn)
+        button_row.addWidget(close_btn)
+        layout.addLayout(button_row)
+        self.setLayout(layout)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(IMAGE_LEDGER_REFRESH_MS)
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+        self._refresh()
+
+    @staticmethod
+    def _format_mb(value):
+        return f"{value / (1024 * 1024):.1f} MB"
+
+    def _refresh(self):
+        snapshot = self._ledger.snapshot()
+        self.stage_list.clear()
+        for stage, value in snapshot["stages"].items():
+            label = IMAGE_LEDGER_STAGES.get(stage, stage)
+            self.stage_list.addItem(f"{label}: {self._format_mb(value)}")
+        self.total_label.setText(f"当前合计: {self._format_mb(snapshot['total_bytes'])}")
+        self.peak_label.setText(f"峰值: {self._format_mb(snapshot['peak_bytes'])}")
+        self.capture_label.setText(f"最近一次截图峰值: {self._format_mb(snapshot['last_capture_peak_bytes'])}")
+
+    def _reset_peak(self):
+        self._ledger.reset_peak()
+        self._refresh()
+
+
+class SessionWriteSignals(QObject):
+    failed = pyqtSignal(str)
+
+
+class SessionJournal:
+    def __init__(self, directory=SESSION_DIR):
+        self.signals = SessionWriteSignals()
+        self.directory = directory
+        self.path = os.path.join(directory, "journal.jsonl")
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(1)
+        self._known = {}
+        self._order = None
+        self._state = OrderedDict()
+        self._saved_order = None
+        self._checkpoints = 0
+        self._compactions = 0
+        self._stale = False
+
+    def image_path(self, tab_id):
+        return os.path.join(self.directory, f"{tab_id}.png")
+
+    def reset(self, keep_ids=()):
+        self.wait()
+        keep_ids = set(keep_ids)
+        for tab_id in list(self._state):
+            if tab_id not in keep_ids:
+                self._state.pop(tab_id)
+        self._known = {tab_id: known for tab_id, known in self._known.items() if tab_id in keep_ids}
+        self._compact()
+
+    def adopt(self, tab_id, revision=None, dirty=False):
+        self._known[tab_id] = (revision, dirty)
+
+    def invalidate(self):
+        self._stale = True
+
+    def checkpoint(self, tabs, current_id=None):
+        if self._stale:
+            self._stale = False
+            self._known = dict.fromkeys(self._known)
+            self._order = None
+        records = []
+        images = []
+        order = []
+        for tab in tabs:
+            tab_id = tab.tab_id
+            order.append(tab_id)
+            canvas = getattr(tab, "canvas", None)
+            if canvas is None:
+                continue
+            known = self._known.get(tab_id)
+            if known is None:
+                record, image = self._tab_record(tab)
+                records.append(record)
+                if image is not None:
+                    images.append((tab_id, image))
+            revision = canvas.document_revision
+            if known is None or known[0] != revision:
+                records.append(
+                    {
+                        "op": "shapes",
+                        "id": tab_id,
+                        "rectangles": _serialize_shapes(canvas.rectangles),
+                        "markers": _serialize_shapes(canvas.markers),
+                        "markers_flattened": canvas.markers_flattened,
+                        "rectangles_flattened": canvas.rectangles_flattened,
+                    }
+                )
+            if known is None or known[1] != tab.dirty:
+                records.append({"op": "state", "id": tab_id, "dirty": tab.dirty})
+            self._known[tab_id] = (revision, tab.dirty)
+        open_ids = set(order)
+        for tab_id in [tab_id for tab_id in self._known if tab_id not in open_ids]:
+            self._known.pop(tab_id)
+            records.append({"op": "close", "id": tab_id})
+        order_state = (order, current_id)
+        if order_state != self._order:
+            self._order = order_state
+            records.append({"op": "order", "ids": order, "current": current_id})
+        if records:
+            self._checkpoints += 1
+            self._pool.start(SessionWriteTask(self, records, images))
+        return len(records)
+
+    def _tab_record(self, tab):
+        size = tab.canvas.base_size()
+        record = {
+            "op": "tab",
+            "id": tab.tab_id,
+            "label": getattr(tab, "_base_label", os.path.basename(tab.auto_saved_path)),
+            "save_dir": tab.save_dir,
+            "auto_saved_path": tab.auto_saved_path,
+            "external": tab._external_source,
+            "width": size.width(),
+            "height": size.height(),
+            "capture_info": {key: _serialize_value(value) for key, value in tab.capture_info.items()},
+        }
+        if tab.canvas.base_error:
+            record["base"] = {"missing": tab.auto_saved_path}
+            return record, None
+        signature = _file_signature(tab.auto_saved_path)
+        if signature is not None and (tab._external_source or tab.auto_save_enabled):
+            record["base"] = {"path": signature[0], "mtime_ns": signature[1], "size": signature[2]}
+            return record, None
+        source = tab.canvas.export_source()
+        if isinstance(source, tuple) and source[0] == "file" and len(source) > 2:
+            record["base"] = {"path": source[1], "mtime_ns": source[2], "size": source[3]}
+            return record, None
+        record["base"] = {"file": os.path.basename(self.image_path(tab.tab_id))}
+        if isinstance(source, QPixmap):
+            source = source.toImage()
+        return record, source
+
+    def write(self, records, images):
+        for tab_id, image in images:
+            if not isinstance(image, QImage):
+                image = _load_export_source(image)
+                if image.isNull():
+                    raise OSError(f"无法读取缓存的底图: {tab_id}")
+            save_image_atomic(image, self.image_path(tab_id), "PNG")
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as handle:
+            for record in records:
+                handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+            size = handle.tell()
+        for record in records:
+            self._apply(self._state, record)
+            if record["op"] == "close":
+                self._remove_image(record["id"])
+        if size > SESSION_COMPACT_BYTES:
+            self._compact()
+
+    def _apply(self, state, record):
+        op = record.get("op")
+        if op == "order":
+            self._saved_order = record
+            return
+        tab_id = record.get("id")
+        if op == "close":
+            state.pop(tab_id, None)
+        elif op == "tab":
+            state[tab_id] = {"tab": record}
+        elif tab_id in state:
+            state[tab_id][op] = record
+
+    def _compact(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            for entry in self._state.values():
+                for op in ("tab", "shapes", "state"):
+                    if op in entry:
+                        handle.write(json.dumps(entry[op], ensure_ascii=False) + "\n")
+            if self._saved_order is not None and self._state:
+                handle.write(json.dumps(self._saved_order, ensure_ascii=False) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, self.path)
+        self._compactions += 1
+        for entry in os.scandir(self.directory):
+            tab_id, ext = os.path.splitext(entry.name)
+            if ext == ".png" and tab_id not in self._state:
+                self._remove_image(tab_id)
+
+    def _remove_image(self, tab_id):
+        try:
+            os.remove(self.image_path(tab_id))
+        except OSError:
+            pass
+
+    def load(self):
+        self.wait()
+        state = OrderedDict()
+        self._saved_order = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    self._apply(state, record)
+        except OSError:
+            pass
+        self._state = state
+        order = self._saved_order.get("ids", []) if self._saved_order else []
+        order = [tab_id for tab_id in order if tab_id in state]
+        order += [tab_id for tab_id in state if tab_id not in order]
+        tabs = [state[tab_id] for tab_id in OrderedDict.fromkeys(order)]
+        current_id = self._saved_order.get("current") if self._saved_order else None
+        return tabs, current_id
+
+    def has_entries(self):
+        try:
+            return os.path.getsize(self.path) > 0
+        except OSError:
+            return False
+
+    def wait(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+    def stats(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {
+            "tracked_tabs": len(self._known),
+            "checkpoints": self._checkpoints,
+            "compactions": self._compactions,
+            "journal_bytes": size,
+        }
+
+
+class SessionWriteTask(QRunnable):
+    def __init__(self, journal, records, images):
+        super().__init__()
+        self._journal = journal
+        self._records = records
+        self._images = images
+
+    def run(self):
+        try:
+            self._journal.write(self._records, self._images)
+        except Exception as exc:
+            self._journal.invalidate()
+            self._journal.signals.failed.emit(str(exc) or exc.__class__.__name__)
+
+
+class SessionTabPlaceholder(QWidget):
+    dirtyStateChanged = pyqtSignal(bool)
+
+    def __init__(self, entry):
+        super().__init__()
+        record = entry["tab"]
+        self.entry = entry
+        self.tab_id = record["id"]
+        self._base_label = record.get("label") or os.path.basename(record.get("auto_saved_path") or "")
+        self.dirty = bool(entry.get("state", {}).get("dirty", False))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setPen(QColor("#777777"))
+        painter.drawText(self.rect(), Qt.AlignCenter, "正在加载截图…")
+
+
+class TemplateApplyDialog(QDialog):
+    def __init__(self, parent, templates, tab_labels, current_index=-1):
+        super().__init__(parent)
+        self.setWindowTitle("套用标注模板")
+        self.setWindowIcon(get_app_icon())
+        self.resize(520, 480)
+        self._templates = templates
+        self._files = []
+        self._output_dir = ""
+        layout = QVBoxLayout()
+
+        template_row = QHBoxLayout()
+        template_row.addWidget(QLabel("模板"))
+        self.template_combo = QComboBox()
+        for template in templates:
+            count = len(template["rectangles"]) + len(template["markers"])
+            self.template_combo.addItem(f"{template['name']}（{count} 个标注）")
+        template_row.addWidget(self.template_combo, 1)
+        layout.addLayout(template_row)
+
+        self.tabs_radio = QRadioButton("套用到打开的标签页（可撤销）")
+        self.tabs_radio.setChecked(True)
+        layout.addWidget(self.tabs_radio)
+        self.tab_list = QListWidget()
+        for index, label in enumerate(tab_labels):
+            item = QListWidgetItem(label)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if index == current_index else Qt.Unchecked)
+            self.tab_list.addItem(item)
+        layout.addWidget(self.tab_list, 1)
+
+        self.files_radio = QRadioButton("批量导出图片文件（后台多进程渲染）")
+        layout.addWidget(self.files_radio)
+        files_row = QHBoxLayout()
+        self.files_btn = QPushButton("选择图片…")
+        self.files_btn.clicked.connect(self._choose_files)
+        self.files_label = QLabel("未选择文件")
+        self.files_label.setStyleSheet("color: #555555;")
+        files_row.addWidget(self.files_btn)
+        files_row.addWidget(self.files_label, 1)
+        layout.addLayout(files_row)
+        output_row = QHBoxLayout()
+        self.output_edit = QLineEdit()
+        self.output_edit.setReadOnly(True)
+        self.output_edit.setPlaceholderText("与原图相同目录")
+        self.output_btn = QPushButton("选择输出目录")
+        self.output_btn.clicked.connect(self._choose_output_dir)
+        output_row.addWidget(self.output_edit, 1)
+        output_row.addWidget(self.output_btn)
+        layout.addLayout(output_row)
+
+        button_row = QHBoxLayout()
+        button_row.addStretch()
+        cancel_btn = QPushButton("取消")
+        apply_btn = QPushButton("套用")
+        cancel_btn.clicked.connect(self.reject)
+        apply_btn.clicked.connect(self.accept)
+        button_row.addWidget(cancel_btn)
+        button_row.addWidget(apply_btn)
+        layout.addLayout(button_row)
+        self.setLayout(layout)
+
+        self.tabs_radio.toggled.connect(self._update_mode)
+        self._update_mode()
+
+    def _update_mode(self, _=None):
+        tabs_mode = self.tabs_radio.isChecked()
+        self.tab_list.setEnabled(tabs_mode)
+        for widget in (self.files_btn, self.files_label, self.output_edit, self.output_btn):
+            widget.setEnabled(not tabs_mode)
+
+    def _choose_files(self):
+        files, _ = QFileDialog.getOpenFileNames(
+            self,
+            "选择要套用模板的图片",
+            os.path.dirname(self._files[0]) if self._files else DEFAULT_SAVE_DIR,
+            "图片文件 (*.png *.jpg *.jpeg *.bmp)",
+        )
+        if files:
+            self._files = files
+            self.files_label.setText(f"已选择 {len(files)} 张图片")
+
+    def _choose_output_dir(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择输出目录", self._output_dir or DEFAULT_SAVE_DIR)
+        if folder:
+            self._output_dir = folder
+            self.output_edit.setText(folder)
+
+    def accept(self):
+        if self.files_radio.isChecked() and not self._files:
+            QMessageBox.warning(self, "套用模板", "请先选择要处理的图片文件。")
+            return
+        if self.tabs_radio.isChecked() and not self.selected_tab_indexes():
+            QMessageBox.warning(self, "套用模板", "请至少勾选一个标签页。")
+            return
+        super().accept()
+
+    def selected_tab_indexes(self):
+        return [
+            index for index in range(self.tab_list.count())
+            if self.tab_list.item(index).checkState() == Qt.Checked
+        ]
+
+    def selection(self):
+        return {
+            "template": self._templates[self.template_combo.currentIndex()],
+            "mode": "tabs" if self.tabs_radio.isChecked() else "files",
+            "tab_indexes": self.selected_tab_indexes(),
+            "files": list(self._files),
+            "output_dir": self._output_dir,
+        }
+
+
+def _load_export_source(source):
+    if isinstance(source, (QPixmap, QImage)):
+        return source
+    if not source:
+        return QImage()
+    kind, path = source[:2]
+    if kind == "raw":
+        try:
+            return _read_raw_image(path)
+        except OSError:
+            return QImage()
+    if len(source) > 2 and _file_signature(path) != source[1:]:
+        return QImage()
+    return QImage(path)
+
+
+def _fit_within(size, edge):
+    if size.width() <= edge and size.height() <= edge:
+        return QSize(size)
+    return size.scaled(edge, edge, Qt.KeepAspectRatio)
+
+
+def _quantize_frame(image):
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+    pixels = pixels[:, : image.width()]
+    keys = ((pixels >> 9) & 0x7C00) | ((pixels >> 6) & 0x03E0) | ((pixels >> 3) & 0x001F)
+    counts = np.bincount(keys.ravel(), minlength=32768)
+    used = np.flatnonzero(counts)
+    if len(used) <= 256:
+        colors, indices = np.unique(pixels & 0xFFFFFF, return_inverse=True)
+        if len(colors) <= 256:
+            table = np.zeros((256, 3), dtype=np.uint8)
+            table[: len(colors)] = np.stack(((colors >> 16) & 255, (colors >> 8) & 255, colors & 255), axis=1)
+            return table.tobytes(), indices.astype(np.uint8).tobytes()
+    palette_keys = used[np.argsort(-counts[used], kind="stable")[:256]]
+
+    def channels(values):
+        values = values.astype(np.int32)
+        return np.stack(((values >> 10) & 31, (values >> 5) & 31, values & 31), axis=1) * 255 // 31
+
+    palette = channels(palette_keys)
+    distances = ((channels(used)[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
+    lookup = np.zeros(32768, dtype=np.uint8)
+    lookup[used] = distances.argmin(axis=1)
+    table = np.zeros((256, 3), dtype=np.uint8)
+    table[: len(palette)] = palette
+    return table.tobytes(), lookup[keys].tobytes()
+
+
+def _gif_lzw(data, min_code_size=8):
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    buffer = clear
+    bits = min_code_size + 1
+    code_size = min_code_size + 1
+    next_code = end + 1
+    table = {}
+    prefix = data[0]
+    for pixel in data[1:]:
+        key = (prefix << 8) | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        buffer |= prefix << bits
+        bits += code_size
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > (1 << code_size) and code_size < 12:
+                code_size += 1
+        else:
+            buffer |= clear << bits
+            bits += code_size
+            table = {}
+            next_code = end + 1
+            code_size = min_code_size + 1
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+        prefix = pixel
+    buffer |= prefix << bits
+    bits += code_size
+    if next_code < 4096 and next_code + 1 > (1 << code_size) and code_size < 12:
+        code_size += 1
+    buffer |= end << bits
+    bits += code_size
+    while bits > 0:
+        out.append(buffer & 0xFF)
+        buffer >>= 8
+        bits -= 8
+    return bytes(out)
+
+
+def _gif_sub_blocks(data):
+    blocks = bytearray()
+    for start in range(0, len(data), 255):
+        chunk = data[start : start + 255]
+        blocks.append(len(chunk))
+        blocks += chunk
+    blocks.append(0)
+    return bytes(blocks)
+
+
+class PdfExportWriter:
+    def __init__(self, path, pages):
+        self.path = path
+        self._temp_path = _export_temp_path(path)
+        self._writer = QPdfWriter(self._temp_path)
+        self._writer.setResolution(EXPORT_PDF_DPI)
+        self._writer.setPageMargins(QMarginsF(0, 0, 0, 0))
+        self._writer.setTitle(os.path.splitext(os.path.basename(path))[0])
+        self._painter = None
+
+    def add(self, image, label):
+        points = QSizeF(image.width(), image.height()) * (72.0 / EXPORT_PDF_DPI)
+        self._writer.setPageSize(QPageSize(points, QPageSize.Point, label, QPageSize.ExactMatch))
+        if self._painter is None:
+            self._painter = QPainter(self._writer)
+            if not self._painter.isActive():
+                raise OSError("无法写入 PDF 文件")
+        else:
+            self._writer.newPage()
+        self._painter.drawImage(QRect(0, 0, image.width(), image.height()), image)
+
+    def close(self):
+        painter, self._painter = self._painter, None
+        if painter is not None and not painter.end():
+            raise OSError("无法写入 PDF 文件")
+        self._writer = None
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        if self._painter is not None:
+            self._painter.end()
+            self._painter = None
+        self._writer = None
+        _remove_partial_export(self._temp_path)
+
+
+class ContactSheetWriter:
+    def __init__(self, path, pages):
+        self.path = path
+        count = max(1, len(pages))
+        self._columns = min(EXPORT_SHEET_MAX_COLUMNS, int(math.ceil(math.sqrt(count))))
+        rows = int(math.ceil(count / self._columns))
+        self._cell_height = EXPORT_SHEET_CELL + EXPORT_SHEET_LABEL_HEIGHT
+        self.sheet = QImage(
+            EXPORT_SHEET_GAP + self._columns * (EXPORT_SHEET_CELL + EXPORT_SHEET_GAP),
+            EXPORT_SHEET_GAP + rows * (self._cell_height + EXPORT_SHEET_GAP),
+            QImage.Format_RGB32,
+        )
+        self.sheet.fill(Qt.white)
+        self._index = 0
+
+    def add(self, image, label):
+        row, column = divmod(self._index, self._columns)
+        self._index += 1
+        x = EXPORT_SHEET_GAP + column * (EXPORT_SHEET_CELL + EXPORT_SHEET_GAP)
+        y = EXPORT_SHEET_GAP + row * (self._cell_height + EXPORT_SHEET_GAP)
+        size = _fit_within(image.size(), EXPORT_SHEET_CELL)
+        if size != image.size():
+            image = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        painter = QPainter(self.sheet)
+        painter.drawImage(x + (EXPORT_SHEET_CELL - size.width()) // 2, y + (EXPORT_SHEET_CELL - size.height()) // 2, image)
+        painter.setPen(QColor("#d5dae3"))
+        painter.drawRect(x, y, EXPORT_SHEET_CELL - 1, EXPORT_SHEET_CELL - 1)
+        painter.setPen(QColor("#333333"))
+        label_rect = QRect(x, y + EXPORT_SHEET_CELL, EXPORT_SHEET_CELL, EXPORT_SHEET_LABEL_HEIGHT)
+        text = painter.fontMetrics().elidedText(label, Qt.ElideMiddle, EXPORT_SHEET_CELL)
+        painter.drawText(label_rect, Qt.AlignCenter, text)
+        painter.end()
+
+    def close(self):
+        data = _encode_image(self.sheet, "PNG")
+        self.sheet = None
+        if data is None or not _write_file_atomic(self.path, data):
+            raise OSError("无法写入拼图文件")
+
+    def abort(self):
+        self.sheet = None
+
+
+class GifExportWriter:
+    def __init__(self, path, pages):
+        self.path = path
+        sizes = [_fit_within(page["size"], EXPORT_GIF_MAX_EDGE) for page in pages if not page["size"].isEmpty()]
+        self.size = QSize(
+            max([size.width() for size in sizes] or [EXPORT_GIF_MAX_EDGE]),
+            max([size.height() for size in sizes] or [EXPORT_GIF_MAX_EDGE]),
+        )
+        self._temp_path = _export_temp_path(path)
+        self._handle = open(self._temp_path, "wb")
+        self._handle.write(b"GIF89a" + struct.pack("<HHBBB", self.size.width(), self.size.height(), 0, 0, 0))
+        self._handle.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def add(self, image, label):
+        frame = QImage(self.size, QImage.Format_RGB32)
+        frame.fill(Qt.white)
+        size = image.size()
+        if size.width() > self.size.width() or size.height() > self.size.height():
+            size = size.scaled(self.size, Qt.KeepAspectRatio)
+        if size != image.size():
+            image = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        painter = QPainter(frame)
+        painter.drawImage((self.size.width() - size.width()) // 2, (self.size.height() - size.height()) // 2, image)
+        painter.end()
+        image = None
+        palette, indices = _quantize_frame(frame)
+        frame = None
+        delay = EXPORT_GIF_FRAME_DELAY_MS // 10
+        self._handle.write(b"\x21\xf9\x04\x04" + struct.pack("<H", delay) + b"\x00\x00")
+        self._handle.write(b"\x2c" + struct.pack("<HHHHB", 0, 0, self.size.width(), self.size.height(), 0x87))
+        self._handle.write(palette)
+        self._handle.write(b"\x08" + _gif_sub_blocks(_gif_lzw(indices)))
+
+    def close(self):
+        with self._handle:
+            self._handle.write(b"\x3b")
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        self._handle.close()
+        _remove_partial_export(self._temp_path)
+
+
+EXPORT_WRITERS = {
+    "pdf": PdfExportWriter,
+    "sheet": ContactSheetWriter,
+    "gif": GifExportWriter,
+}
+
+
+def _export_temp_path(path):
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def _remove_partial_export(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class TabExportSignals(QObject):
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(str, int, str, list)
+
+
+class TabExportTask(QRunnable):
+    def __init__(self, target, path, pages):
+        super().__init__()
+        self.signals = TabExportSignals()
+        self._target = target
+        self._path = path
+        self._pages = list(pages)
+        self._canceled = threading.Event()
+
+    def cancel(self):
+        self._canceled.set()
+
+    def run(self):
+        exported = 0
+        skipped = []
+        error = ""
+        writer = None
+        try:
+            writer = EXPORT_WRITERS[self._target](self._path, self._pages)
+            for index in range(len(self._pages)):
+                if self._canceled.is_set():
+                    error = "已取消"
+                    break
+                page, self._pages[index] = self._pages[index], None
+                base = _load_export_source(page["source"])
+                if base.isNull():
+                    skipped.append(page["label"])
+                else:
+                    image = render_annotated_image(base, page["rectangles"], page["markers"])
+                    base = None
+                    _IMAGE_LEDGER.acquire("export", id(self), image)
+                    writer.add(image, page["label"])
+                    image = None
+                    _IMAGE_LEDGER.release("export", id(self))
+                    exported += 1
+                self.signals.progress.emit(index + 1, page["label"])
+            else:
+                writer.close()
+                writer = None
+        except Exception as exc:
+            error = str(exc) or exc.__class__.__name__
+        finally:
+            _IMAGE_LEDGER.release("export", id(self))
+            if writer is not None:
+                try:
+                    writer.abort()
+                except Exception:
+                    pass
+        self.signals.finished.emit(self._path, exported, error, skipped)
+
+
+class AnnotationWorkspacePage(QWidget):
+    def __init__(
+        self,
+        open_settings_callback,
+        open_images_callback,
+        style_state,
+        style_callback,
+        image_quality,
+        auto_save_enabled,
+        default_zoom=1.0,
+        zoom_changed_callback=None,
+        memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+        saved_callback=None,
+        undo_limit=AnnotationHistory.DEFAULT_LIMIT,
+        session_journal=None,
+        pixmap_cache_dir=PIXMAP_CACHE_DIR,
+    ):
+        super().__init__()
+        self._open_settings_callback = open_settings_callback
+        self._undo_limit = undo_limit
+        self._session_journal = session_journal
+        self._restoring = False
+        self._template_batch = None
+        self._export_job = None
+        self._saved_callback = saved_callback
+        self._open_images_callback = open_images_callback
+        self._style_state = style_state
+        self._style_callback = style_callback
+        self._image_quality = self._clamp_quality(image_quality)
+        self._auto_save_enabled = bool(auto_save_enabled)
+        self._display_zoom = self._clamp_zoom(default_zoom)
+        self._zoom_callback = zoom_changed_callback
+        self._updating_zoom = False
+        self._memory = ImageMemoryManager(memory_budget_mb, pixmap_cache_dir)
+        _IMAGE_LEDGER.add_source("tab_base", self._memory.resident_bytes)
+        layout = QVBoxLayout()
+
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.tabCloseRequested.connect(self._close_tab)
+        self.tabs.currentChanged.connect(self._on_current_tab_changed)
+        export_button = QPushButton("导出全部…")
+        export_button.setCursor(Qt.PointingHandCursor)
+        export_menu = QMenu(export_button)
+        for target, (title, _, _) in EXPORT_TARGETS.items():
+            action = export_menu.addAction(title)
+            action.setEnabled(target != "gif" or np is not None)
+            action.triggered.connect(lambda _, t=target: self.export_all_tabs(t))
+        export_button.setMenu(export_menu)
+        self.tabs.setCornerWidget(export_button, Qt.TopRightCorner)
+        layout.addWidget(self.tabs, 1)
+
+        hint = QLabel("尚未添加截图，使用区域截取或重复截取后会在此显示。")
+        hint.setAlignment(Qt.AlignCenter)
+        hint.setStyleSheet("color: #777777;")
+        self._empty_hint = hint
+        layout.addWidget(hint)
+        self.setLayout(layout)
+
+        self._session_timer = QTimer(self)
+        self._session_timer.setInterval(SESSION_CHECKPOINT_INTERVAL_MS)
+        self._session_timer.timeout.connect(self.checkpoint_session)
+        if self._session_journal is not None:
+            self._session_journal.signals.failed.connect(self._on_session_write_failed)
+            self._session_timer.start()
+
+        self._update_hint_visibility()
+
+    def checkpoint_session(self):
+        if self._session_journal is None:
+            return 0
+        tabs = [
+            self.tabs.widget(index)
+            for index in range(self.tabs.count())
+            if hasattr(self.tabs.widget(index), "tab_id")
+        ]
+        current = self.tabs.currentWidget()
+        return self._session_journal.checkpoint(tabs, getattr(current, "tab_id", None))
+
+    def _on_session_write_failed(self, error):
+        current = self.tabs.currentWidget()
+        if hasattr(current, "status_label"):
+            current.status_label.setText(f"会话自动保存失败，异常退出后可能无法恢复标签页：{error}")
+            current.status_label.setStyleSheet("color: #b3261e;")
+
+    def _update_hint_visibility(self):
+        has_tabs = self.tabs.count() > 0
+        self._empty_hint.setVisible(not has_tabs)
+        self.tabs.setVisible(has_tabs)
+
+    def add_capture(self, pixmap: QPixmap, save_dir: str, initial_zoom=1.0, capture_info=None):
+        return self._create_tab(pixmap, save_dir, initial_zoom=initial_zoom, capture_info=capture_info)
 
     def open_image_files(self, file_paths):
         invalid = []
@@ -2542,9 +6117,12 @@ class AnnotationWorkspacePage(QWidget):
 
     def _close_tab(self, index):
         widget = self.tabs.widget(index)
+        if isinstance(widget, SessionTabPlaceholder) and widget.dirty:
+            widget = self._materialize_tab(widget)
         if widget:
             if hasattr(widget, "maybe_close") and not widget.maybe_close():
                 return
+            self._memory.unregister(widget)
             widget.deleteLater()
         self.tabs.removeTab(index)
         self._update_hint_visibility()
@@ -2568,7 +6146,7 @@ class AnnotationWorkspacePage(QWidget):
             return self.save_all_dirty()
         return True
 
-    def _create_tab(self, pixmap, save_dir, source_path=None, initial_zoom=1.0):
+    def _create_tab(self, pixmap, save_dir, source_path=None, initial_zoom=1.0, capture_info=None):
         tab = AnnotationTab(
             pixmap,
             save_dir,
@@ -2578,30 +6156,383 @@ class AnnotationWorkspacePage(QWidget):
             self._auto_save_enabled,
             source_path=source_path,
             initial_zoom=initial_zoom,
+            capture_info=capture_info,
+            saved_callback=self._saved_callback,
+            undo_limit=self._undo_limit,
+            template_callback=self._handle_template_request,
         )
         label_path = source_path or tab.auto_saved_path
         label = os.path.basename(label_path)
         tab._base_label = label
+        self._memory.touch(tab)
         self.tabs.addTab(tab, label)
         self._bind_tab_signals(tab)
         self.tabs.setCurrentWidget(tab)
+        self._memory.enforce(protect=tab)
+        self._update_hint_visibility()
+        return tab
+
+    def _on_current_tab_changed(self, index):
+        if self._restoring:
+            return
+        widget = self.tabs.widget(index)
+        if isinstance(widget, SessionTabPlaceholder):
+            widget = self._materialize_tab(widget)
+        if widget is None or not hasattr(widget, "evict_base_image"):
+            return
+        self._memory.touch(widget)
+        widget.ensure_base_image()
+        self._memory.enforce(protect=widget)
+
+    def restore_session(self, entries, current_id=None):
+        target = None
+        self._restoring = True
+        self.tabs.setTabsClosable(False)
+        placeholders = []
+        for entry in entries:
+            placeholder = SessionTabPlaceholder(entry)
+            placeholders.append((self.tabs.addTab(placeholder, ""), placeholder))
+            if self._session_journal is not None:
+                self._session_journal.adopt(placeholder.tab_id, None, placeholder.dirty)
+            if placeholder.tab_id == current_id:
+                target = placeholder
+        self.tabs.setTabsClosable(True)
+        for index, placeholder in placeholders:
+            self.tabs.setTabText(index, placeholder._base_label)
+        for _, placeholder in placeholders:
+            self._bind_tab_signals(placeholder)
+        self._restoring = False
+        self._update_hint_visibility()
+        if target is not None:
+            self._restoring = True
+            self.tabs.setCurrentWidget(target)
+            self._restoring = False
+        self._on_current_tab_changed(self.tabs.currentIndex())
+        return len(entries)
+
+    def _materialize_tab(self, placeholder):
+        index = self.tabs.indexOf(placeholder)
+        if index == -1:
+            return None
+        record = placeholder.entry["tab"]
+        external = bool(record.get("external"))
+        capture_info = {
+            key: _deserialize_value(value) for key, value in (record.get("capture_info") or {}).items()
+        }
+        pixmap, base_error = self._load_session_base(record)
+        tab = AnnotationTab(
+            pixmap,
+            record.get("save_dir") or DEFAULT_SAVE_DIR,
+            self._style_state,
+            self._style_callback,
+            self._image_quality,
+            self._auto_save_enabled,
+            source_path=record.get("auto_saved_path") if external else None,
+            initial_zoom=self._display_zoom,
+            capture_info=capture_info,
+            saved_callback=self._saved_callback,
+            undo_limit=self._undo_limit,
+            tab_id=placeholder.tab_id,
+            restored_path=None if external else record.get("auto_saved_path"),
+            template_callback=self._handle_template_request,
+        )
+        shapes = placeholder.entry.get("shapes")
+        if shapes:
+            tab.canvas.load_shapes(
+                _deserialize_shapes(shapes.get("rectangles", [])),
+                _deserialize_shapes(shapes.get("markers", [])),
+                shapes.get("markers_flattened", True),
+                shapes.get("rectangles_flattened", True),
+            )
+        if base_error:
+            tab.canvas.mark_base_unavailable(base_error)
+        elif placeholder.dirty:
+            tab.status_label.setText(f"{tab.base_status_text} *未保存")
+        tab._set_dirty(placeholder.dirty)
+        tab._base_label = placeholder._base_label
+        self._restoring = True
+        current = self.tabs.currentIndex() == index
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, tab, tab._base_label)
+        if base_error:
+            self.tabs.setTabIcon(index, self.style().standardIcon(QStyle.SP_MessageBoxWarning))
+            self.tabs.setTabToolTip(index, base_error)
+        if current:
+            self.tabs.setCurrentIndex(index)
+        self._restoring = False
+        self._bind_tab_signals(tab)
+        self._memory.touch(tab)
+        placeholder.deleteLater()
+        if self._session_journal is not None:
+            self._session_journal.adopt(tab.tab_id, tab.canvas.document_revision, tab.dirty)
+        return tab
+
+    def _session_base_source(self, record):
+        base = record.get("base") or {}
+        if "missing" in base:
+            return None
+        path = base.get("path")
+        if path:
+            signature = (path, base.get("mtime_ns"), base.get("size"))
+            return ("file",) + signature if _file_signature(path) == signature else None
+        if self._session_journal is None:
+            return None
+        path = self._session_journal.image_path(record["id"])
+        return ("file", path) if os.path.exists(path) else None
+
+    def _load_session_base(self, record):
+        size = QSize(max(1, record.get("width", 1)), max(1, record.get("height", 1)))
+        source = self._session_base_source(record)
+        pixmap = QPixmap(source[1]) if source else QPixmap()
+        if not pixmap.isNull() and pixmap.size() == size:
+            return pixmap, ""
+        base = record.get("base") or {}
+        path = base.get("path") or base.get("missing") or record.get("auto_saved_path") or ""
+        pixmap = QPixmap(size)
+        pixmap.fill(Qt.transparent)
+        return pixmap, f"源文件缺失或已被修改，无法恢复底图: {path}"
+
+    def _export_page(self, widget):
+        if isinstance(widget, SessionTabPlaceholder):
+            record = widget.entry["tab"]
+            shapes = widget.entry.get("shapes") or {}
+            return {
+                "label": widget._base_label,
+                "size": QSize(record.get("width", 0), record.get("height", 0)),
+                "source": self._session_base_source(record),
+                "rectangles": _deserialize_shapes(shapes.get("rectangles", [])),
+                "markers": _deserialize_shapes(shapes.get("markers", [])),
+            }
+        canvas = getattr(widget, "canvas", None)
+        if canvas is None:
+            return None
+        return {
+            "label": getattr(widget, "_base_label", "") or os.path.basename(widget.auto_saved_path),
+            "size": canvas.base_size(),
+            "source": canvas.export_source(),
+            "rectangles": _copy_shapes(canvas.rectangles),
+            "markers": _copy_shapes(canvas.markers),
+        }
+
+    def export_all_tabs(self, target):
+        if self._export_job is not None:
+            QMessageBox.information(self, "导出全部", "上一次导出仍在进行中，请稍候。")
+            return
+        pages = [page for page in (self._export_page(widget) for widget in self._iter_tabs()) if page]
+        if not pages:
+            QMessageBox.information(self, "导出全部", "当前没有可导出的标签页。")
+            return
+        title, file_filter, extension = EXPORT_TARGETS[target]
+        current = self.tabs.currentWidget()
+        directory = getattr(current, "save_dir", "") or DEFAULT_SAVE_DIR
+        default_path = os.path.join(directory, f"screenshots_{datetime.now():%Y%m%d_%H%M%S}.{extension}")
+        path, _ = QFileDialog.getSaveFileName(self, f"导出全部 · {title}", default_path, file_filter)
+        if not path:
+            return
+        if not path.lower().endswith(f".{extension}"):
+            path = f"{path}.{extension}"
+        progress = QProgressDialog("正在后台导出标签页…", "取消", 0, len(pages), self)
+        progress.setWindowTitle("导出全部")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        task = TabExportTask(target, path, pages)
+        pages = None
+        task.signals.progress.connect(self._on_export_progress)
+        task.signals.finished.connect(self._on_export_finished)
+        progress.canceled.connect(task.cancel)
+        self._export_job = {"task": task, "progress": progress, "started": time.perf_counter()}
+        QThreadPool.globalInstance().start(task)
+
+    def _on_export_progress(self, done, label):
+        job = self._export_job
+        if job is None:
+            return
+        job["progress"].setValue(done)
+        job["progress"].setLabelText(f"已导出: {label}")
+
+    def _on_export_finished(self, path, exported, error, skipped):
+        job = self._export_job
+        self._export_job = None
+        if job is None:
+            return
+        job["progress"].close()
+        if error:
+            if error != "已取消":
+                QMessageBox.warning(self, "导出全部", f"导出失败：{error}")
+            return
+        elapsed = max(0.001, time.perf_counter() - job["started"])
+        message = f"已导出 {exported} 个标签页，用时 {elapsed:.1f} 秒：\n{path}"
+        if skipped:
+            message += f"\n\n以下 {len(skipped)} 个标签页的底图无法读取，已跳过：\n" + "\n".join(skipped)
+            QMessageBox.warning(self, "导出全部", message)
+            return
+        QMessageBox.information(self, "导出全部", message)
+
+    def _handle_template_request(self, action, tab):
+        if action == "save":
+            self._save_template_from_tab(tab)
+        elif action == "apply":
+            self._open_template_dialog(tab)
+
+    def _save_template_from_tab(self, tab):
+        canvas = tab.canvas
+        if not canvas.rectangles and not canvas.markers:
+            QMessageBox.information(self, "存为模板", "当前截图没有标注，无法保存为模板。")
+            return
+        name, ok = QInputDialog.getText(
+            self, "存为模板", "模板名称：", text=f"模板 {datetime.now():%m%d %H%M}"
+        )
+        name = name.strip()
+        if not ok or not name:
+            return
+        path = os.path.join(TEMPLATES_DIR, _template_file_name(name))
+        if os.path.exists(path):
+            reply = QMessageBox.question(self, "存为模板", f"模板“{name}”已存在，是否覆盖？")
+            if reply != QMessageBox.Yes:
+                return
+        if save_annotation_template(name, canvas.rectangles, canvas.markers, canvas.base_size()):
+            tab.status_label.setText(f"已保存模板: {name}")
+        else:
+            QMessageBox.warning(self, "存为模板", "无法写入模板文件，请检查程序目录权限。")
+
+    def _open_template_dialog(self, tab):
+        templates = list_annotation_templates()
+        if not templates:
+            QMessageBox.information(self, "套用模板", "尚未保存任何模板，请先在标注后点击“存为模板”。")
+            return
+        labels = [self.tabs.tabText(index) for index in range(self.tabs.count())]
+        dialog = TemplateApplyDialog(self, templates, labels, self.tabs.indexOf(tab))
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        choice = dialog.selection()
+        if choice["mode"] == "tabs":
+            self._apply_template_to_tabs(choice["template"], choice["tab_indexes"])
+        else:
+            self._apply_template_to_files(choice["template"], choice["files"], choice["output_dir"])
+
+    def _apply_template_to_tabs(self, template, indexes):
+        widgets = [self.tabs.widget(index) for index in indexes]
+        for widget in widgets:
+            if isinstance(widget, SessionTabPlaceholder):
+                widget = self._materialize_tab(widget)
+            if widget is not None and hasattr(widget, "apply_template"):
+                widget.apply_template(template)
+        self._memory.enforce(protect=self.tabs.currentWidget())
+
+    def _apply_template_to_files(self, template, files, output_dir=""):
+        if self._template_batch is not None:
+            QMessageBox.information(self, "套用模板", "上一批模板任务仍在进行中，请稍候。")
+            return
+        jobs = []
+        claimed = set()
+        for path in files:
+            base, _ = os.path.splitext(os.path.basename(path))
+            target_dir = output_dir or os.path.dirname(path)
+            target_path = _unique_output_path(target_dir, f"{base}_annotated", "jpg", claimed)
+            claimed.add(os.path.normcase(target_path))
+            jobs.append(
+                (
+                    path,
+                    target_path,
+                    template["rectangles"],
+                    template["markers"],
+                    self._image_quality,
+                )
+            )
+        if not jobs:
+            return
+        progress = QProgressDialog("正在后台渲染标注图…", "取消", 0, len(jobs), self)
+        progress.setWindowTitle("套用模板")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        runner = TemplateBatchRunner(jobs, self)
+        runner.fileFinished.connect(self._on_template_file_finished)
+        progress.canceled.connect(runner.cancel)
+        self._template_batch = {
+            "runner": runner,
+            "progress": progress,
+            "total": len(jobs),
+            "done": 0,
+            "failed": [],
+            "annotation_count": len(template["rectangles"]) + len(template["markers"]),
+            "started": time.perf_counter(),
+        }
+        runner.start()
+
+    def _on_template_file_finished(self, source_path, output_path, error):
+        batch = self._template_batch
+        if batch is None:
+            return
+        batch["done"] += 1
+        if error:
+            batch["failed"].append(f"{os.path.basename(source_path)}: {error}")
+        elif callable(self._saved_callback):
+            self._saved_callback(
+                output_path,
+                {
+                    "kind": "annotated",
+                    "annotation_count": batch["annotation_count"],
+                    "source_path": source_path,
+                },
+            )
+        batch["progress"].setValue(batch["done"])
+        if batch["done"] < batch["total"]:
+            return
+        self._template_batch = None
+        batch["runner"].shutdown()
+        batch["runner"].deleteLater()
+        batch["progress"].close()
+        elapsed = max(0.001, time.perf_counter() - batch["started"])
+        exported = batch["total"] - len(batch["failed"])
+        message = f"已导出 {exported} 张标注图，用时 {elapsed:.1f} 秒（{exported / elapsed:.1f} 张/秒）。"
+        if batch["failed"]:
+            details = "\n".join(batch["failed"][:10])
+            message += f"\n\n以下 {len(batch['failed'])} 张未能处理：\n{details}"
+            QMessageBox.warning(self, "套用模板", message)
+        else:
+            QMessageBox.information(self, "套用模板", message)
+
+    def discard_unsaved_tabs(self):
+        for index in reversed(range(self.tabs.count())):
+            widget = self.tabs.widget(index)
+            if getattr(widget, "dirty", False):
+                self._memory.unregister(widget)
+                self.tabs.removeTab(index)
+                widget.deleteLater()
         self._update_hint_visibility()
 
+    def set_memory_budget_mb(self, budget_mb):
+        self._memory.set_budget_mb(budget_mb)
+        self._memory.enforce(protect=self.tabs.currentWidget())
+
+    def memory_stats(self):
+        return self._memory.stats()
+
+    def set_undo_limit(self, limit):
+        self._undo_limit = limit
+        for index in range(self.tabs.count()):
+            widget = self.tabs.widget(index)
+            if hasattr(widget, "set_undo_limit"):
+                widget.set_undo_limit(limit)
+
     def _bind_tab_signals(self, tab):
         tab.dirtyStateChanged.connect(lambda dirty, t=tab: self._update_tab_color(t, dirty))
         self._update_tab_color(tab, tab.dirty)
         if hasattr(tab, "canvas"):
-            tab.canvas.zoomChanged.connect(lambda factor, t=tab: self._handle_tab_zoom(factor, t))
+            tab.canvas.zoomSettled.connect(lambda factor, t=tab: self._handle_tab_zoom(factor, t))
 
     def _update_tab_color(self, tab, dirty):
         index = self.tabs.indexOf(tab)
         if index == -1:
             return
         color = QColor("#f97316") if dirty else QColor("#0f172a")
-        self.tabs.tabBar().setTabTextColor(index, color)
         base_label = getattr(tab, "_base_label", self.tabs.tabText(index).lstrip("* ").strip())
         prefix = "* " if dirty else ""
-        self.tabs.setTabText(index, f"{prefix}{base_label}")
+        text = f"{prefix}{base_label}"
+        if self.tabs.tabText(index) != text:
+            self.tabs.setTabText(index, text)
+        if self.tabs.tabBar().tabTextColor(index) != color:
+            self.tabs.tabBar().setTabTextColor(index, color)
 
     def set_image_quality(self, value):
         self._image_quality = self._clamp_quality(value)
@@ -2626,6 +6557,8 @@ class AnnotationWorkspacePage(QWidget):
 
     def save_all_dirty(self):
         for tab in self.get_dirty_tabs():
+            if isinstance(tab, SessionTabPlaceholder):
+                tab = self._materialize_tab(tab)
             if not tab.save_annotated_image():
                 return False
         return True
@@ -2668,16 +6601,797 @@ class AnnotationWorkspacePage(QWidget):
         self._updating_zoom = False
 
 
+class CaptureLibrary:
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS captures (
+            path TEXT PRIMARY KEY,
+            folder TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            screen_name TEXT,
+            sel_x INTEGER,
+            sel_y INTEGER,
+            sel_w INTEGER,
+            sel_h INTEGER,
+            width INTEGER,
+            height INTEGER,
+            content_hash TEXT,
+            file_size INTEGER,
+            mtime_ns INTEGER,
+            annotation_count INTEGER NOT NULL DEFAULT 0,
+            source_path TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_captures_created ON captures (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_captures_screen ON captures (screen_name, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_captures_size ON captures (file_size)",
+        "CREATE INDEX IF NOT EXISTS idx_captures_folder ON captures (folder)",
+        "CREATE INDEX IF NOT EXISTS idx_captures_hash ON captures (content_hash)",
+    )
+    COLUMNS = (
+        "path",
+        "folder",
+        "kind",
+        "created_at",
+        "screen_name",
+        "sel_x",
+        "sel_y",
+        "sel_w",
+        "sel_h",
+        "width",
+        "height",
+        "content_hash",
+        "file_size",
+        "mtime_ns",
+        "annotation_count",
+        "source_path",
+    )
+    STAT_COLUMNS = ("width", "height", "content_hash", "file_size", "mtime_ns")
+    SEARCH_PAGE_SIZE = 5000
+
+    def __init__(self, db_path=CAPTURE_LIBRARY_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(
+        self,
+        path,
+        kind="capture",
+        screen_name=None,
+        selection_rect=None,
+        annotation_count=0,
+        source_path=None,
+        data=None,
+        created_at=None,
+        stats_only=False,
+    ):
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        size = QImageReader(path).size()
+        if selection_rect is not None and not selection_rect.isNull():
+            sel = (selection_rect.x(), selection_rect.y(), selection_rect.width(), selection_rect.height())
+        else:
+            sel = (None, None, None, None)
+        row = (
+            path,
+            os.path.normcase(os.path.dirname(path)),
+            kind,
+            created_at if created_at is not None else time.time(),
+            screen_name,
+            *sel,
+            size.width() if size.isValid() else None,
+            size.height() if size.isValid() else None,
+            self._content_hash(path, data),
+            stat.st_size,
+            stat.st_mtime_ns,
+            int(annotation_count or 0),
+            source_path,
+        )
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        if stats_only:
+            updates = ", ".join(f"{column} = excluded.{column}" for column in self.STAT_COLUMNS)
+            statement = (
+                f"INSERT INTO captures ({', '.join(self.COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(path) DO UPDATE SET {updates}"
+            )
+        else:
+            statement = f"INSERT OR REPLACE INTO captures ({', '.join(self.COLUMNS)}) VALUES ({placeholders})"
+        with self._lock, self._conn:
+            self._conn.execute(statement, row)
+        return True
+
+    def remove(self, path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM captures WHERE path = ?", (os.path.abspath(path),))
+
+    def reconcile(self, directory):
+        directory = os.path.abspath(directory)
+        folder = os.path.normcase(directory)
+        with self._lock:
+            known = {
+                row["path"]: (row["mtime_ns"], row["file_size"])
+                for row in self._conn.execute(
+                    "SELECT path, mtime_ns, file_size FROM captures WHERE folder = ?", (folder,)
+                )
+            }
+        seen = set()
+        added = 0
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    if not entry.name.lower().endswith(IMAGE_FILE_EXTENSIONS):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    path = os.path.abspath(entry.path)
+                    seen.add(path)
+                    if known.get(path) == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    kind = "annotated" if "_annotated" in entry.name else "capture"
+                    if self.record(path, kind=kind, created_at=stat.st_mtime, stats_only=True):
+                        added += 1
+        except OSError:
+            return 0, 0
+        missing = [path for path in known if path not in seen]
+        if missing:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM captures WHERE path = ?", [(path,) for path in missing])
+        return added, len(missing)
+
+    def search(
+        self,
+        screen_name=None,
+        since=None,
+        until=None,
+        min_size=None,
+        max_size=None,
+        kind=None,
+        folder=None,
+        limit=SEARCH_PAGE_SIZE,
+        offset=0,
+    ):
+        clauses = []
+        params = []
+        if screen_name:
+            clauses.append("screen_name = ?")
+            params.append(screen_name)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if min_size:
+            clauses.append("file_size >= ?")
+            params.append(int(min_size))
+        if max_size:
+            clauses.append("file_size <= ?")
+            params.append(int(max_size))
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if folder:
+            clauses.append("folder = ?")
+            params.append(os.path.normcase(os.path.abspath(folder)))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params += [int(limit), int(offset)]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM captures {where} ORDER BY created_at DESC, path LIMIT ? OFFSET ?", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def screen_names(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT screen_name FROM captures WHERE screen_name IS NOT NULL ORDER BY screen_name"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _content_hash(self, path, data=None):
+        digest = hashlib.sha1()
+        if data is not None:
+            digest.update(data)
+            return digest.hexdigest()
+        try:
+            with open(path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+
+class LibraryReconcileTask(QRunnable):
+    def __init__(self, library, directories):
+        super().__init__()
+        self._library = library
+        self._directories = [directory for directory in directories if directory]
+
+    def run(self):
+        for directory in self._directories:
+            try:
+                self._library.reconcile(directory)
+            except sqlite3.Error:
+                return
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE):
+        self._cache_dir = cache_dir
+        self._size = size
+
+    def cache_path(self, path, mtime_ns, file_size):
+        raw = f"{os.path.normcase(os.path.abspath(path))}|{mtime_ns}|{file_size}|{self._size}"
+        key = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_dir, key[:2], f"{key}.jpg")
+
+    def load_or_create(self, path, mtime_ns, file_size):
+        cached = self.cache_path(path, mtime_ns, file_size)
+        if os.path.exists(cached):
+            image = QImage(cached)
+            if not image.isNull():
+                return image
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        source_size = reader.size()
+        if source_size.isValid() and (source_size.width() > self._size or source_size.height() > self._size):
+            reader.setScaledSize(source_size.scaled(self._size, self._size, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return image
+        if image.width() > self._size or image.height() > self._size:
+            image = image.scaled(self._size, self._size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temp_path = f"{cached}.{uuid.uuid4().hex}.tmp"
+        if image.save(temp_path, "JPG", THUMBNAIL_QUALITY):
+            try:
+                os.replace(temp_path, cached)
+            except OSError:
+                os.remove(temp_path)
+        return image
+
+
+class ThumbnailSignals(QObject):
+    ready = pyqtSignal(int, str, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, cache, generation, path, mtime_ns, file_size):
+        super().__init__()
+        self.signals = ThumbnailSignals()
+        self._cache = cache
+        self._generation = generation
+        self._path = path
+        self._mtime_ns = mtime_ns
+        self._file_size = file_size
+
+    def run(self):
+        try:
+            image = self._cache.load_or_create(self._path, self._mtime_ns, self._file_size)
+        except OSError:
+            image = QImage()
+        self.signals.ready.emit(self._generation, self._path, image)
+
+
+class GalleryModel(QAbstractListModel):
+    MAX_CACHED_PIXMAPS = 800
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries = []
+        self._rows = {}
+        self._pixmaps = OrderedDict()
+        self._pending = set()
+        self._failed = set()
+        self._generation = 0
+        self._request_seq = 0
+        self._cache = ThumbnailCache()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount() - 1))
+        self._placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self._placeholder.fill(QColor("#eef1f6"))
+
+    def set_entries(self, entries):
+        self.beginResetModel()
+        self._pool.clear()
+        self._generation += 1
+        self._pending.clear()
+        self._entries = list(entries)
+        self._rows = {entry[0]: row for row, entry in enumerate(self._entries)}
+        self.endResetModel()
+
+    def append_entries(self, entries):
+        entries = [entry for entry in entries if entry[0] not in self._rows]
+        if not entries:
+            return
+        first = len(self._entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        for row, entry in enumerate(entries, first):
+            self._entries.append(entry)
+            self._rows[entry[0]] = row
+        self.endInsertRows()
+
+    def entry(self, row):
+        if 0 <= row < len(self._entries):
+            return self._entries[row]
+        return None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path, name, mtime_ns, file_size = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            return name
+        if role == Qt.DecorationRole:
+            key = (path, mtime_ns, file_size)
+            pixmap = self._pixmaps.get(key)
+            if pixmap is not None:
+                self._pixmaps.move_to_end(key)
+                return pixmap
+            self._request_thumbnail(path, mtime_ns, file_size)
+            return self._placeholder
+        if role == Qt.ToolTipRole:
+            modified = datetime.fromtimestamp(mtime_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+            return f"{path}\n{file_size / 1024.0:.1f} KB · {modified}"
+        if role == Qt.UserRole:
+            return path
+        return None
+
+    def _request_thumbnail(self, path, mtime_ns, file_size):
+        key = (path, mtime_ns, file_size)
+        if key in self._pending or key in self._failed:
+            return
+        self._pending.add(key)
+        task = ThumbnailTask(self._cache, self._generation, path, mtime_ns, file_size)
+        task.signals.ready.connect(self._on_thumbnail_ready)
+        self._request_seq += 1
+        self._pool.start(task, self._request_seq)
+
+    def _on_thumbnail_ready(self, generation, path, image):
+        if generation != self._generation:
+            return
+        row = self._rows.get(path)
+        if row is None:
+            return
+        _, _, mtime_ns, file_size = self._entries[row]
+        key = (path, mtime_ns, file_size)
+        self._pending.discard(key)
+        if image.isNull():
+            self._failed.add(key)
+            return
+        self._pixmaps[key] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.MAX_CACHED_PIXMAPS:
+            self._pixmaps.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class GalleryPage(QWidget):
+    openImagesRequested = pyqtSignal(list)
+    openFolderRequested = pyqtSignal()
+
+    PERIODS = [
+        ("全部时间", None),
+        ("今天", 0),
+        ("最近 7 天", 7),
+        ("最近 30 天", 30),
+    ]
+    KINDS = [
+        ("全部类型", None),
+        ("原始截图", "capture"),
+        ("标注图", "annotated"),
+    ]
+
+    def __init__(self, save_dir, library=None):
+        super().__init__()
+        self._save_dir = save_dir or DEFAULT_SAVE_DIR
+        self._library = library
+        self._scanned_dir = None
+        self._search_filters = None
+        layout = QVBoxLayout()
+
+        header = QHBoxLayout()
+        title = QLabel("截图图库")
+        title.setStyleSheet("font-size: 22px; font-weight: 700;")
+        header.addWidget(title)
+        header.addStretch()
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.clicked.connect(self.refresh)
+        open_btn = QPushButton("在工作台打开")
+        open_btn.clicked.connect(self._open_selected)
+        folder_btn = QPushButton("打开保存目录")
+        folder_btn.clicked.connect(self.openFolderRequested.emit)
+        header.addWidget(refresh_btn)
+        header.addWidget(open_btn)
+        header.addWidget(folder_btn)
+        layout.addLayout(header)
+
+        self.path_label = QLabel()
+        self.path_label.setStyleSheet("color: #5f6b7c;")
+        layout.addWidget(self.path_label)
+
+        filter_row = QHBoxLayout()
+        self.screen_combo = QComboBox()
+        self.screen_combo.addItem("全部屏幕", None)
+        self.period_combo = QComboBox()
+        for text, days in self.PERIODS:
+            self.period_combo.addItem(text, days)
+        self.kind_combo = QComboBox()
+        for text, kind in self.KINDS:
+            self.kind_combo.addItem(text, kind)
+        self.min_size_spin = QDoubleSpinBox()
+        self.min_size_spin.setRange(0.0, 1024.0)
+        self.min_size_spin.setSingleStep(0.5)
+        self.min_size_spin.setSuffix(" MB")
+        self.min_size_spin.setSpecialValueText("不限大小")
+        search_btn = QPushButton("搜索")
+        search_btn.clicked.connect(self.search)
+        reset_btn = QPushButton("显示全部")
+        reset_btn.clicked.connect(self.refresh)
+        self.more_btn = QPushButton("加载更多")
+        self.more_btn.clicked.connect(self._search_more)
+        self.more_btn.hide()
+        filter_row.addWidget(self.screen_combo)
+        filter_row.addWidget(self.period_combo)
+        filter_row.addWidget(self.kind_combo)
+        filter_row.addWidget(QLabel("最小"))
+        filter_row.addWidget(self.min_size_spin)
+        filter_row.addWidget(search_btn)
+        filter_row.addWidget(reset_btn)
+        filter_row.addWidget(self.more_btn)
+        filter_row.addStretch()
+        layout.addLayout(filter_row)
+        for widget in (self.screen_combo, self.period_combo, self.kind_combo, self.min_size_spin, search_btn):
+            widget.setEnabled(library is not None)
+
+        self.model = GalleryModel(self)
+        self.view = QListView()
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.view.setGridSize(QSize(THUMBNAIL_SIZE + 24, THUMBNAIL_SIZE + 44))
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setMovement(QListView.Static)
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(256)
+        self.view.setWordWrap(True)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self._open_index)
+        layout.addWidget(self.view, 1)
+        self.setLayout(layout)
+        self._update_path_label(0)
+
+    def set_save_dir(self, save_dir):
+        self._save_dir = save_dir or DEFAULT_SAVE_DIR
+        if self.isVisible():
+            self.refresh()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._refresh_screen_names()
+        if self._scanned_dir != self._save_dir:
+            self.refresh()
+
+    def _refresh_screen_names(self):
+        if not self._library:
+            return
+        try:
+            names = self._library.screen_names()
+        except sqlite3.Error:
+            return
+        current = self.screen_combo.currentData()
+        self.screen_combo.blockSignals(True)
+        self.screen_combo.clear()
+        self.screen_combo.addItem("全部屏幕", None)
+        for name in names:
+            self.screen_combo.addItem(name, name)
+        index = self.screen_combo.findData(current)
+        self.screen_combo.setCurrentIndex(max(0, index))
+        self.screen_combo.blockSignals(False)
+
+    def search(self):
+        if not self._library:
+            return
+        since = None
+        days = self.period_combo.currentData()
+        if days is not None:
+            start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            since = start_of_day.timestamp() - days * 86400
+        min_size = int(self.min_size_spin.value() * 1024 * 1024) or None
+        self._search_filters = {
+            "screen_name": self.screen_combo.currentData(),
+            "since": since,
+            "min_size": min_size,
+            "kind": self.kind_combo.currentData(),
+        }
+        self.model.set_entries([])
+        self._search_more()
+
+    def _search_more(self):
+        if not self._library or self._search_filters is None:
+            return
+        page_size = CaptureLibrary.SEARCH_PAGE_SIZE
+        offset = self.model.rowCount()
+        started = time.perf_counter()
+        try:
+            rows = self._library.search(limit=page_size + 1, offset=offset, **self._search_filters)
+        except sqlite3.Error as exc:
+            QMessageBox.warning(self, "搜索失败", f"无法查询截图索引。\n\n系统信息: {exc}")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        has_more = len(rows) > page_size
+        entries = [
+            (row["path"], os.path.basename(row["path"]), row["mtime_ns"] or 0, row["file_size"] or 0)
+            for row in rows[:page_size]
+        ]
+        self.model.append_entries(entries)
+        count = self.model.rowCount()
+        self.more_btn.setVisible(has_more)
+        if has_more:
+            self.path_label.setText(
+                f"搜索结果已显示前 {count} 条，还有更多结果，点击“加载更多”继续 · 用时 {elapsed_ms:.1f} ms"
+            )
+        else:
+            self.path_label.setText(f"搜索结果 {count} 条 · 用时 {elapsed_ms:.1f} ms")
+
+    def refresh(self):
+        entries = []
+        try:
+            with os.scandir(self._save_dir) as iterator:
+                for entry in iterator:
+                    if not entry.name.lower().endswith(IMAGE_FILE_EXTENSIONS):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, entry.name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            entries = []
+        entries.sort(key=lambda item: item[2], reverse=True)
+        self._scanned_dir = self._save_dir
+        self._search_filters = None
+        self.more_btn.hide()
+        self.model.set_entries(entries)
+        self._update_path_label(len(entries))
+
+    def _update_path_label(self, count):
+        self.path_label.setText(f"{self._save_dir} · 共 {count} 张图片")
+
+    def _open_index(self, index):
+        path = index.data(Qt.UserRole)
+        if path:
+            self.openImagesRequested.emit([path])
+
+    def _open_selected(self):
+        paths = [index.data(Qt.UserRole) for index in self.view.selectionModel().selectedIndexes()]
+        paths = [path for path in paths if path]
+        if paths:
+            self.openImagesRequested.emit(paths)
+
+
+def _nearest_edge_lut(mask, radius, axis):
+    length = mask.shape[axis]
+    shape = [1, 1]
+    shape[axis] = length
+    positions = np.arange(length, dtype=np.int32).reshape(shape)
+    far = np.int32(length + radius + 1)
+    before = np.maximum.accumulate(np.where(mask, positions, -far), axis=axis)
+    after = np.flip(np.minimum.accumulate(np.flip(np.where(mask, positions, 2 * far), axis=axis), axis=axis), axis=axis)
+    take_before = positions - before <= after - positions
+    nearest = np.where(take_before, before, after)
+    distance = np.abs(nearest - positions)
+    return np.where(distance <= radius, nearest, -1).astype(np.int16)
+
+
+def _long_runs(mask, run, axis):
+    if run <= 1 or mask.shape[axis] < run:
+        return mask
+    counts = np.cumsum(mask, axis=axis, dtype=np.int32)
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (1, 0)
+    counts = np.pad(counts, pad)
+    length = mask.shape[axis]
+    full = np.take(counts, np.arange(run, length + 1), axis=axis) - np.take(counts, np.arange(0, length - run + 1), axis=axis)
+    full = (full == run).astype(np.int32)
+    cover = np.cumsum(full, axis=axis, dtype=np.int32)
+    cover = np.pad(cover, pad)
+    tail = [(0, 0), (0, 0)]
+    tail[axis] = (0, run - 1)
+    cover = np.pad(cover, tail, mode="edge")
+    starts = np.clip(np.arange(length) - run + 1, 0, None)
+    covered = np.take(cover, np.arange(length) + 1, axis=axis) - np.take(cover, starts, axis=axis)
+    return covered > 0
+
+
+def _gray_levels(pixels):
+    return (
+        ((pixels >> 16) & 0xFF).astype(np.int32) * 77
+        + ((pixels >> 8) & 0xFF).astype(np.int32) * 150
+        + (pixels & 0xFF).astype(np.int32) * 29
+    ) >> 8
+
+
+class EdgeSnapMap:
+    def __init__(self, origin, step, vertical, horizontal):
+        self.origin = QPoint(origin)
+        self.step = step
+        self.vertical = vertical
+        self.horizontal = horizontal
+
+    @classmethod
+    def build(cls, image, source_rect, radius):
+        image = image.convertToFormat(QImage.Format_RGB32)
+        ptr = image.constBits()
+        ptr.setsize(image.sizeInBytes())
+        pixels = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+        rect = source_rect.intersected(image.rect())
+        region = pixels[rect.top() : rect.bottom() + 1, rect.left() : rect.right() + 1]
+        step = EDGE_SNAP_SAMPLE_STEP
+        rows = _gray_levels(region[::step, :])
+        vertical = np.zeros(rows.shape, dtype=bool)
+        vertical[:, 1:] = np.abs(np.diff(rows, axis=1)) >= EDGE_SNAP_THRESHOLD
+        vertical = _long_runs(vertical, EDGE_SNAP_MIN_RUN, axis=0)
+        columns = _gray_levels(region[:, ::step])
+        horizontal = np.zeros(columns.shape, dtype=bool)
+        horizontal[1:, :] = np.abs(np.diff(columns, axis=0)) >= EDGE_SNAP_THRESHOLD
+        horizontal = _long_runs(horizontal, EDGE_SNAP_MIN_RUN, axis=1)
+        return cls(
+            rect.topLeft(),
+            step,
+            _nearest_edge_lut(vertical, radius, axis=1),
+            _nearest_edge_lut(horizontal, radius, axis=0),
+        )
+
+    def snap(self, point):
+        x = point.x() - self.origin.x()
+        y = point.y() - self.origin.y()
+        height, width = self.horizontal.shape[0], self.vertical.shape[1]
+        if not (0 <= x < width and 0 <= y < height):
+            return QPoint(point)
+        snapped_x = int(self.vertical[y // self.step, x])
+        snapped_y = int(self.horizontal[y, x // self.step])
+        return QPoint(
+            self.origin.x() + (snapped_x if snapped_x >= 0 else x),
+            self.origin.y() + (snapped_y if snapped_y >= 0 else y),
+        )
+
+
+class EdgeSnapSignals(QObject):
+    ready = pyqtSignal(object)
+
+
+class EdgeSnapTask(QRunnable):
+    def __init__(self, image, source_rect, radius):
+        super().__init__()
+        self.signals = EdgeSnapSignals()
+        self._image = image
+        self._source_rect = QRect(source_rect)
+        self._radius = radius
+
+    def run(self):
+        try:
+            edge_map = EdgeSnapMap.build(self._image, self._source_rect, self._radius)
+        except (MemoryError, ValueError):
+            return
+        finally:
+            self._image = None
+        self.signals.ready.emit(edge_map)
+
+
+def _capture_pixels(pixmap):
+    image = pixmap.toImage().convertToFormat(QImage.Format_RGB32)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+    return pixels[:, : image.width()] & np.uint32(0xFFFFFF)
+
+
+def _changed_pixel_mask(previous, current, tolerance):
+    height, width = current.shape
+    before = previous.view(np.uint8).reshape(height, width, 4)
+    after = current.view(np.uint8).reshape(height, width, 4)
+    delta = np.maximum(before, after)
+    delta -= np.minimum(before, after)
+    return (delta[..., 0] > tolerance) | (delta[..., 1] > tolerance) | (delta[..., 2] > tolerance)
+
+
+def _label_blocks(blocks):
+    height, width = blocks.shape
+    empty = blocks.size + 1
+    labels = np.where(blocks, np.arange(1, blocks.size + 1).reshape(blocks.shape), empty)
+    while True:
+        padded = np.pad(labels, 1, constant_values=empty)
+        smallest = labels.copy()
+        for dy in range(3):
+            for dx in range(3):
+                np.minimum(smallest, padded[dy : dy + height, dx : dx + width], out=smallest)
+        smallest[~blocks] = empty
+        inside = smallest != empty
+        smallest[inside] = smallest.ravel()[smallest[inside] - 1]
+        if np.array_equal(smallest, labels):
+            return np.where(blocks, labels, 0)
+        labels = smallest
+
+
+def diff_capture_regions(previous, current, block=REPEAT_DIFF_BLOCK, tolerance=REPEAT_DIFF_TOLERANCE):
+    if previous.shape != current.shape:
+        return None
+    mask = _changed_pixel_mask(previous, current, tolerance)
+    height, width = mask.shape
+    rows, cols = -(-height // block), -(-width // block)
+    padded = np.zeros((rows * block, cols * block), dtype=bool)
+    padded[:height, :width] = mask
+    blocks = padded.reshape(rows, block, cols, block).any(axis=(1, 3))
+    if not blocks.any():
+        return []
+    labels = _label_blocks(blocks)
+    block_rows, block_cols = np.nonzero(labels)
+    ids = labels[block_rows, block_cols]
+    order = np.argsort(ids, kind="stable")
+    ids, block_rows, block_cols = ids[order], block_rows[order], block_cols[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    tops = np.minimum.reduceat(block_rows, starts) * block
+    bottoms = (np.maximum.reduceat(block_rows, starts) + 1) * block
+    lefts = np.minimum.reduceat(block_cols, starts) * block
+    rights = (np.maximum.reduceat(block_cols, starts) + 1) * block
+    areas = np.add.reduceat(np.ones_like(ids), starts)
+    keep = np.argsort(-areas, kind="stable")[:REPEAT_DIFF_MAX_REGIONS]
+    regions = []
+    for index in sorted(keep, key=lambda i: (tops[i], lefts[i])):
+        part = mask[tops[index] : bottoms[index], lefts[index] : rights[index]]
+        changed_rows = np.flatnonzero(part.any(axis=1))
+        changed_cols = np.flatnonzero(part.any(axis=0))
+        top = int(tops[index] + changed_rows[0])
+        left = int(lefts[index] + changed_cols[0])
+        bottom = int(tops[index] + changed_rows[-1])
+        right = int(lefts[index] + changed_cols[-1])
+        pad = REPEAT_DIFF_PADDING
+        top_left = QPoint(max(0, left - pad), max(0, top - pad))
+        bottom_right = QPoint(min(width - 1, right + pad), min(height - 1, bottom + pad))
+        regions.append(QRect(top_left, bottom_right))
+    return regions
+
+
 class CaptureOverlay(QWidget):
     selectionMade = pyqtSignal(QPixmap, QRect, str)
     canceled = pyqtSignal()
 
-    def __init__(self, screenshot: QPixmap, origin: QPoint, screen):
+    def __init__(self, screenshot: QPixmap, origin: QPoint, screen, source_rect=None):
         super().__init__()
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint)
         self.setWindowState(Qt.WindowFullScreen)
         self.setCursor(Qt.CrossCursor)
         self.screenshot = screenshot
+        self._source_rect = QRect(source_rect) if source_rect is not None else QRect(QPoint(0, 0), screenshot.size())
         self._screen = screen
         geo = screen.geometry()
         self.setGeometry(geo)
@@ -2691,12 +7405,48 @@ class CaptureOverlay(QWidget):
         self._cursor_timer.timeout.connect(self._sync_cursor_position)
         self._cursor_timer.start()
         self._sync_cursor_position(force=True)
-        self._scale_x = self._compute_scale(self.screenshot.width(), self.width())
-        self._scale_y = self._compute_scale(self.screenshot.height(), self.height())
+        self._scale_x = self._compute_scale(self._source_rect.width(), self.width())
+        self._scale_y = self._compute_scale(self._source_rect.height(), self.height())
+        self._edge_map = None
+        self._start_edge_map()
+
+    def _start_edge_map(self):
+        if np is None or self.screenshot.isNull():
+            return
+        radius = max(1, int(round(EDGE_SNAP_RADIUS * max(self._scale_x, self._scale_y))))
+        task = EdgeSnapTask(self.screenshot.toImage(), self._source_rect, radius)
+        task.signals.ready.connect(self._on_edge_map_ready)
+        QThreadPool.globalInstance().start(task)
+
+    def _on_edge_map_ready(self, edge_map):
+        if not self.screenshot.isNull():
+            self._edge_map = edge_map
+
+    def snap_device_point(self, point):
+        if self._edge_map is None:
+            return QPoint(point)
+        return self._edge_map.snap(point)
+
+    def _snap_position(self, pos, modifiers):
+        if self._edge_map is None or modifiers & Qt.AltModifier:
+            return QPoint(pos)
+        device = QPoint(
+            self._source_rect.x() + int(round(pos.x() * self._scale_x)),
+            self._source_rect.y() + int(round(pos.y() * self._scale_y)),
+        )
+        snapped = self._edge_map.snap(device)
+        if snapped == device:
+            return QPoint(pos)
+        return QPoint(
+            int(round((snapped.x() - self._source_rect.x()) / self._scale_x)),
+            int(round((snapped.y() - self._source_rect.y()) / self._scale_y)),
+        )
 
     def paintEvent(self, event):
+        if self.screenshot.isNull():
+            return
         painter = QPainter(self)
-        painter.drawPixmap(self.rect(), self.screenshot)
+        painter.drawPixmap(self.rect(), self.screenshot, self._source_rect)
 
         overlay_color = QColor(0, 0, 0, 120)
         painter.fillRect(self.rect(), overlay_color)
@@ -2711,14 +7461,14 @@ class CaptureOverlay(QWidget):
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            self.origin = event.pos()
+            self.origin = self._snap_position(event.pos(), event.modifiers())
             self.selection = QRect(self.origin, self.origin)
             self.cursor_pos = event.pos()
             self.update()
 
     def mouseMoveEvent(self, event):
         if self.origin:
-            self.selection = QRect(self.origin, event.pos()).normalized()
+            self.selection = QRect(self.origin, self._snap_position(event.pos(), event.modifiers())).normalized()
             self.cursor_pos = event.pos()
             self.update()
         else:
@@ -2731,9 +7481,17 @@ class CaptureOverlay(QWidget):
             if rect.width() > 5 and rect.height() > 5:
                 device_rect = self._device_rect(rect)
                 cropped = self.screenshot.copy(device_rect)
+                _IMAGE_LEDGER.acquire("selection_crop", cropped.cacheKey(), cropped)
                 self.selectionMade.emit(cropped, rect, self._screen.name())
+            self.release_screenshot()
             self.close()
 
+    def release_screenshot(self):
+        self._cursor_timer.stop()
+        _IMAGE_LEDGER.release("screen_grab", self.screenshot.cacheKey())
+        self.screenshot = QPixmap()
+        self._edge_map = None
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
             self.canceled.emit()
@@ -2776,8 +7534,8 @@ class CaptureOverlay(QWidget):
     def _device_rect(self, logical_rect: QRect):
         if logical_rect is None:
             return QRect()
-        x = int(round(logical_rect.x() * self._scale_x))
-        y = int(round(logical_rect.y() * self._scale_y))
+        x = self._source_rect.x() + int(round(logical_rect.x() * self._scale_x))
+        y = self._source_rect.y() + int(round(logical_rect.y() * self._scale_y))
         w = max(1, int(round(logical_rect.width() * self._scale_x)))
         h = max(1, int(round(logical_rect.height() * self._scale_y)))
         rect = QRect(x, y, w, h)
@@ -2797,12 +7555,11 @@ class CaptureOverlay(QWidget):
     def _clamp_to_pixmap(self, rect: QRect):
         if self.screenshot.isNull():
             return QRect(rect)
-        max_w = self.screenshot.width()
-        max_h = self.screenshot.height()
-        x = max(0, min(rect.x(), max_w - 1))
-        y = max(0, min(rect.y(), max_h - 1))
-        w = max(1, min(rect.width(), max_w - x))
-        h = max(1, min(rect.height(), max_h - y))
+        bounds = self._source_rect
+        x = max(bounds.left(), min(rect.x(), bounds.right()))
+        y = max(bounds.top(), min(rect.y(), bounds.bottom()))
+        w = max(1, min(rect.width(), bounds.right() + 1 - x))
+        h = max(1, min(rect.height(), bounds.bottom() + 1 - y))
         return QRect(x, y, w, h)
 
     def _compute_scale(self, device, logical):
@@ -2811,6 +7568,675 @@ class CaptureOverlay(QWidget):
         return max(1e-6, device / float(logical))
 
 
+class VirtualDesktopGrab:
+    def __init__(self, screens, grab):
+        planned = []
+        bounds = QRect()
+        for screen in screens:
+            geometry = screen.geometry()
+            ratio = screen.devicePixelRatio()
+            size = QSize(int(round(geometry.width() * ratio)), int(round(geometry.height() * ratio)))
+            device_rect = QRect(geometry.topLeft(), size)
+            planned.append((screen, geometry, device_rect))
+            bounds = bounds.united(device_rect)
+        self.origin = bounds.topLeft()
+        self.screens = []
+        self.pixmap = QPixmap(bounds.size()) if not bounds.isEmpty() else QPixmap()
+        self.anchor = None
+        self.selection = None
+        self.views = []
+        if self.pixmap.isNull():
+            return
+        self.pixmap.fill(Qt.black)
+        painter = QPainter(self.pixmap)
+        for screen, geometry, device_rect in planned:
+            grabbed = grab(screen)
+            local_rect = QRect(device_rect.topLeft() - self.origin, grabbed.size()).intersected(self.pixmap.rect())
+            painter.drawPixmap(local_rect.topLeft(), grabbed)
+            self.screens.append((screen, QRect(geometry), local_rect))
+        painter.end()
+
+    @staticmethod
+    def grab_region(screens, native_rect):
+        image = QImage(native_rect.size(), QImage.Format_RGB32)
+        if image.isNull():
+            return image
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        for screen in screens:
+            geometry = screen.geometry()
+            ratio = screen.devicePixelRatio()
+            size = QSize(int(round(geometry.width() * ratio)), int(round(geometry.height() * ratio)))
+            piece = QRect(geometry.topLeft(), size).intersected(native_rect)
+            if piece.isEmpty():
+                continue
+            local = piece.translated(-geometry.topLeft())
+            grabbed = screen.grabWindow(
+                0,
+                int(local.x() / ratio),
+                int(local.y() / ratio),
+                int(math.ceil(local.width() / ratio)),
+                int(math.ceil(local.height() / ratio)),
+            )
+            grabbed.setDevicePixelRatio(1.0)
+            painter.drawPixmap(piece.translated(-native_rect.topLeft()), grabbed)
+        painter.end()
+        return image
+
+    def source_rect(self, screen):
+        for candidate, _, local_rect in self.screens:
+            if candidate is screen:
+                return QRect(local_rect)
+        return QRect()
+
+    def _entry_for(self, global_pos):
+        best = None
+        best_distance = None
+        for entry in self.screens:
+            geometry = entry[1]
+            if geometry.contains(global_pos):
+                return entry
+            dx = max(geometry.left() - global_pos.x(), 0, global_pos.x() - geometry.right())
+            dy = max(geometry.top() - global_pos.y(), 0, global_pos.y() - geometry.bottom())
+            distance = dx + dy
+            if best_distance is None or distance < best_distance:
+                best = entry
+                best_distance = distance
+        return best
+
+    def device_point(self, global_pos):
+        entry = self._entry_for(global_pos)
+        if entry is None:
+            return QPoint()
+        _, geometry, local_rect = entry
+        scale_x = local_rect.width() / float(max(1, geometry.width()))
+        scale_y = local_rect.height() / float(max(1, geometry.height()))
+        x = local_rect.x() + int(round((global_pos.x() - geometry.x()) * scale_x))
+        y = local_rect.y() + int(round((global_pos.y() - geometry.y()) * scale_y))
+        x = max(local_rect.left(), min(x, local_rect.right() + 1))
+        y = max(local_rect.top(), min(y, local_rect.bottom() + 1))
+        return QPoint(x, y)
+
+    def view_rect(self, screen, device_rect):
+        for candidate, geometry, local_rect in self.screens:
+            if candidate is not screen:
+                continue
+            scale_x = local_rect.width() / float(max(1, geometry.width()))
+            scale_y = local_rect.height() / float(max(1, geometry.height()))
+            x = int(round((device_rect.x() - local_rect.x()) / scale_x))
+            y = int(round((device_rect.y() - local_rect.y()) / scale_y))
+            w = int(round(device_rect.width() / scale_x))
+            h = int(round(device_rect.height() / scale_y))
+            return QRect(x, y, w, h)
+        return QRect()
+
+    def native_rect(self, device_rect):
+        return device_rect.translated(self.origin)
+
+    def device_rect(self, native_rect):
+        return QRect(native_rect).translated(-self.origin).intersected(self.pixmap.rect())
+
+    def snap(self, point, modifiers):
+        if modifiers & Qt.AltModifier:
+            return QPoint(point)
+        for view in self.views:
+            if view._source_rect.contains(point):
+                return view.snap_device_point(point)
+        return QPoint(point)
+
+    def begin_selection(self, point):
+        self.anchor = QPoint(point)
+        self.selection = QRect(point, point)
+        self._refresh_views()
+
+    def extend_selection(self, point):
+        if self.anchor is None:
+            return
+        self.selection = QRect(self.anchor, point).normalized().intersected(self.pixmap.rect())
+        self._refresh_views()
+
+    def end_selection(self):
+        rect = QRect(self.selection) if self.selection is not None else QRect()
+        self.anchor = None
+        return rect
+
+    def clear_selection(self):
+        self.anchor = None
+        self.selection = None
+        self._refresh_views()
+
+    def _refresh_views(self):
+        for view in self.views:
+            view.sync_selection()
+
+
+class VirtualDesktopOverlay(CaptureOverlay):
+    def __init__(self, desktop: VirtualDesktopGrab, screen):
+        super().__init__(desktop.pixmap, screen.geometry().topLeft(), screen, desktop.source_rect(screen))
+        self._desktop = desktop
+        desktop.views.append(self)
+
+    def sync_selection(self):
+        selection = self._desktop.selection
+        if selection is None or selection.isEmpty():
+            self.selection = None
+        else:
+            view_rect = self._desktop.view_rect(self._screen, selection)
+            self.selection = view_rect if view_rect.intersects(self.rect()) else None
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.cursor_pos = event.pos()
+            point = self._desktop.device_point(event.globalPos())
+            self._desktop.begin_selection(self._desktop.snap(point, event.modifiers()))
+
+    def mouseMoveEvent(self, event):
+        self.cursor_pos = event.pos() if self.rect().contains(event.pos()) else None
+        if self._desktop.anchor is not None:
+            point = self._desktop.device_point(event.globalPos())
+            self._desktop.extend_selection(self._desktop.snap(point, event.modifiers()))
+        else:
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() != Qt.LeftButton or self._desktop.anchor is None:
+            return
+        rect = self._desktop.end_selection()
+        if rect.width() <= 5 or rect.height() <= 5:
+            self._desktop.clear_selection()
+            return
+        cropped = self._desktop.pixmap.copy(rect)
+        _IMAGE_LEDGER.acquire("selection_crop", cropped.cacheKey(), cropped)
+        self.selectionMade.emit(cropped, self._desktop.native_rect(rect), VIRTUAL_DESKTOP_SCREEN_NAME)
+        self.release_screenshot()
+        self.close()
+
+    def release_screenshot(self):
+        super().release_screenshot()
+        if self in self._desktop.views:
+            self._desktop.views.remove(self)
+        if not self._desktop.views:
+            self._desktop.pixmap = QPixmap()
+
+
+class ScrollStitcher:
+    def __init__(self, max_height=SCROLL_CAPTURE_MAX_HEIGHT):
+        self.max_height = max_height
+        self.width = 0
+        self.height = 0
+        self.frames = 0
+        self.skipped = 0
+        self._strips = []
+        self._last = None
+        self._tail = 0
+        self._previous_hashes = None
+        self._weights = None
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    @staticmethod
+    def _frame_array(image):
+        image = image.convertToFormat(QImage.Format_RGB32)
+        ptr = image.constBits()
+        ptr.setsize(image.sizeInBytes())
+        rows = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+        return rows[:, : image.width()].copy()
+
+    def _row_hashes(self, frame):
+        width = frame.shape[1]
+        margin = min(SCROLL_CAPTURE_HASH_MARGIN, width // 4)
+        columns = frame[:, : width - margin]
+        if self._weights is None:
+            rng = np.random.default_rng(0x5C4011)
+            self._weights = rng.integers(1, 2 ** 63, size=columns.shape[1], dtype=np.uint64) | np.uint64(1)
+        return (columns.astype(np.uint64) * self._weights).sum(axis=1, dtype=np.uint64)
+
+    def add(self, image):
+        if self.height >= self.max_height:
+            return "full"
+        frame = self._frame_array(image)
+        hashes = self._row_hashes(frame)
+        if self._previous_hashes is None:
+            self.width = frame.shape[1]
+            self._last = frame
+            self._tail = 0
+            self._previous_hashes = hashes
+            self.frames = 1
+            self.height = len(frame)
+            return "appended"
+        if frame.shape[1] != self.width or len(hashes) != len(self._previous_hashes):
+            self.skipped += 1
+            return "lost"
+        static = hashes == self._previous_hashes
+        if static.all():
+            return "unchanged"
+        start = int(np.argmin(static))
+        stop = len(hashes) - int(np.argmin(static[::-1]))
+        shift = self._find_shift(self._previous_hashes[start:stop], hashes[start:stop])
+        if shift is None:
+            self.skipped += 1
+            return "lost"
+        if self.frames == 1:
+            self._append(self._last[:stop])
+            self._tail = stop
+        self._append(frame[max(start, self._tail - shift) : stop])
+        self._last = frame
+        self._tail = max(stop, self._tail - shift)
+        self._previous_hashes = hashes
+        self.frames += 1
+        self.height = self._emitted + len(frame) - stop
+        return "full" if self.height >= self.max_height else "appended"
+
+    def _find_shift(self, previous, current):
+        rows = len(current)
+        if rows <= SCROLL_CAPTURE_MIN_OVERLAP:
+            return None
+        cur_values, cur_index, cur_counts = np.unique(current, return_index=True, return_counts=True)
+        prev_values, prev_index, prev_counts = np.unique(previous, return_index=True, return_counts=True)
+        cur_values, cur_index = cur_values[cur_counts == 1], cur_index[cur_counts == 1]
+        prev_values, prev_index = prev_values[prev_counts == 1], prev_index[prev_counts == 1]
+        _, cur_pos, prev_pos = np.intersect1d(cur_values, prev_values, assume_unique=True, return_indices=True)
+        shifts = prev_index[prev_pos] - cur_index[cur_pos]
+        shifts = shifts[(shifts > 0) & (shifts <= rows - SCROLL_CAPTURE_MIN_OVERLAP)]
+        if not len(shifts):
+            return None
+        candidates, votes = np.unique(shifts, return_counts=True)
+        for shift in candidates[np.argsort(-votes, kind="stable")][:4]:
+            shift = int(shift)
+            overlap = rows - shift
+            if np.count_nonzero(previous[shift:] == current[:overlap]) >= overlap * SCROLL_CAPTURE_MATCH_RATIO:
+                return shift
+        return None
+
+    @property
+    def _emitted(self):
+        return sum(len(strip) for strip in self._strips)
+
+    def _append(self, rows):
+        room = self.max_height - self._emitted
+        if len(rows) > room:
+            rows = rows[:room]
+        if len(rows):
+            self._strips.append(rows.copy() if rows.base is not None else rows)
+
+    def memory_bytes(self):
+        total = sum(strip.nbytes for strip in self._strips)
+        if self._last is not None:
+            total += self._last.nbytes
+        return total
+
+    def take_image(self):
+        if self._last is not None:
+            self._append(self._last[self._tail :])
+            self._last = None
+        self.height = self._emitted
+        if not self._strips:
+            return QImage()
+        image = QImage(self.width, self.height, QImage.Format_RGB32)
+        ptr = image.bits()
+        ptr.setsize(image.sizeInBytes())
+        target = np.frombuffer(ptr, np.uint32).reshape(self.height, image.bytesPerLine() // 4)
+        row = 0
+        self._strips.reverse()
+        while self._strips:
+            strip = self._strips.pop()
+            target[row : row + len(strip), : self.width] = strip
+            row += len(strip)
+        self.height = 0
+        self._previous_hashes = None
+        return image
+
+
+class ScrollCaptureBar(QWidget):
+    finishRequested = pyqtSignal()
+    cancelRequested = pyqtSignal()
+    autoScrollToggled = pyqtSignal(bool)
+
+    def __init__(self, auto_available):
+        super().__init__()
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        self.setWindowIcon(get_app_icon())
+        layout = QHBoxLayout()
+        layout.setContentsMargins(10, 6, 10, 6)
+        self.status_label = QLabel("滚动页面以开始拼接…")
+        self.auto_checkbox = QCheckBox("自动滚动")
+        self.auto_checkbox.setEnabled(auto_available)
+        self.auto_checkbox.toggled.connect(self.autoScrollToggled.emit)
+        finish_btn = QPushButton("完成")
+        finish_btn.clicked.connect(self.finishRequested.emit)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(self.cancelRequested.emit)
+        layout.addWidget(self.status_label, 1)
+        layout.addWidget(self.auto_checkbox)
+        layout.addWidget(finish_btn)
+        layout.addWidget(cancel_btn)
+        self.setLayout(layout)
+        self.setAttribute(Qt.WA_StyledBackground, True)
+        self.setStyleSheet("ScrollCaptureBar { background: #ffffff; border: 1px solid #1e90ff; }")
+
+    def set_status(self, text):
+        self.status_label.setText(text)
+
+    def place_near(self, region):
+        _place_widget_near(self, region)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.cancelRequested.emit()
+            return
+        super().keyPressEvent(event)
+
+
+def _place_widget_near(widget, region):
+    widget.adjustSize()
+    screen = QGuiApplication.screenAt(region.center()) or QGuiApplication.primaryScreen()
+    bounds = screen.availableGeometry() if screen else QRect(region)
+    x = max(bounds.left(), min(region.left(), bounds.right() - widget.width()))
+    if region.bottom() + 8 + widget.height() <= bounds.bottom():
+        y = region.bottom() + 8
+    elif region.top() - 8 - widget.height() >= bounds.top():
+        y = region.top() - 8 - widget.height()
+    else:
+        y = bounds.top()
+    widget.move(x, y)
+
+
+def _send_scroll_wheel(steps):
+    user32 = getattr(getattr(ctypes, "windll", None), "user32", None)
+    if user32 is None:
+        return False
+    user32.mouse_event(MOUSEEVENTF_WHEEL, 0, 0, -WHEEL_DELTA * steps, 0)
+    return True
+
+
+class ScrollingCaptureSession(QObject):
+    finished = pyqtSignal(QImage)
+    canceled = pyqtSignal()
+
+    def __init__(self, grab, region, parent=None):
+        super().__init__(parent)
+        self._grab = grab
+        self._region = QRect(region)
+        self._stitcher = ScrollStitcher()
+        self._auto_scroll = False
+        self._done = False
+        self.bar = ScrollCaptureBar(getattr(ctypes, "windll", None) is not None)
+        self.bar.finishRequested.connect(self.finish)
+        self.bar.cancelRequested.connect(self.cancel)
+        self.bar.autoScrollToggled.connect(self._set_auto_scroll)
+        self._timer = QTimer(self)
+        self._timer.setInterval(SCROLL_CAPTURE_INTERVAL_MS)
+        self._timer.timeout.connect(self._tick)
+        _IMAGE_LEDGER.add_source("scroll_capture", self._stitcher.memory_bytes)
+
+    def start(self):
+        self.bar.place_near(self._region)
+        self.bar.show()
+        self._tick()
+        self._timer.start()
+
+    def _set_auto_scroll(self, enabled):
+        self._auto_scroll = bool(enabled)
+        if self._auto_scroll:
+            QCursor.setPos(self._region.center())
+
+    def _tick(self):
+        if self._done:
+            return
+        status = self._stitcher.add(self._grab())
+        height = self._stitcher.height
+        if status == "full":
+            self.bar.set_status(f"已达到最大高度 {height}px")
+            self.finish()
+            return
+        if status == "lost":
+            self.bar.set_status(f"{self._stitcher.frames} 帧 · {height}px · 滚动过快，请回滚一点")
+        else:
+            self.bar.set_status(f"{self._stitcher.frames} 帧 · {height}px")
+        if self._auto_scroll:
+            _send_scroll_wheel(SCROLL_CAPTURE_WHEEL_STEPS)
+
+    def finish(self):
+        if self._done:
+            return
+        self._stop()
+        self.finished.emit(self._stitcher.take_image())
+
+    def cancel(self):
+        if self._done:
+            return
+        self._stop()
+        self._stitcher = ScrollStitcher()
+        self.canceled.emit()
+
+    def _stop(self):
+        self._done = True
+        self._timer.stop()
+        self.bar.close()
+        self.bar.deleteLater()
+        _IMAGE_LEDGER.add_source("scroll_capture", lambda: 0)
+
+
+def _region_signature(image):
+    image = image.convertToFormat(QImage.Format_RGB32)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+    sample = pixels[:, : image.width()][::REGION_WATCH_STRIDE, ::REGION_WATCH_STRIDE] & np.uint32(0xFFFFFF)
+    height, width = sample.shape
+    weights = (
+        np.arange(height, dtype=np.uint64)[:, None] * np.uint64(0x9E3779B1)
+        + np.arange(width, dtype=np.uint64)[None, :] * np.uint64(0x85EBCA77)
+    ) | np.uint64(1)
+    weighted = sample.astype(np.uint64) * weights
+    rows = np.unique(np.linspace(0, height, REGION_WATCH_GRID, endpoint=False).astype(np.intp))
+    cols = np.unique(np.linspace(0, width, REGION_WATCH_GRID, endpoint=False).astype(np.intp))
+    return np.add.reduceat(np.add.reduceat(weighted, rows, axis=0), cols, axis=1)
+
+
+class RegionWatchBar(QWidget):
+    stopRequested = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        self.setWindowIcon(get_app_icon())
+        layout = QHBoxLayout()
+        layout.setContentsMargins(10, 6, 10, 6)
+        self.status_label = QLabel("正在监视选区…")
+        stop_btn = QPushButton("停止监视")
+        stop_btn.clicked.connect(self.stopRequested.emit)
+        layout.addWidget(self.status_label, 1)
+        layout.addWidget(stop_btn)
+        self.setLayout(layout)
+        self.setAttribute(Qt.WA_StyledBackground, True)
+        self.setStyleSheet("RegionWatchBar { background: #ffffff; border: 1px solid #e67e22; }")
+
+    def set_status(self, text):
+        self.status_label.setText(text)
+
+    def place_near(self, region):
+        _place_widget_near(self, region)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.stopRequested.emit()
+            return
+        super().keyPressEvent(event)
+
+
+class RegionWatcher(QObject):
+    changed = pyqtSignal(QImage, float)
+    stopped = pyqtSignal()
+
+    def __init__(self, grab, region, interval_ms=REGION_WATCH_INTERVAL_MS, threshold=REGION_WATCH_THRESHOLD, parent=None):
+        super().__init__(parent)
+        self._grab = grab
+        self._region = QRect(region)
+        self.screen_name = None
+        self.selection_rect = QRect(region)
+        self._threshold = max(0.0, float(threshold)) / 100.0
+        self._previous = None
+        self._started = None
+        self._cost = 0.0
+        self._active = False
+        self.samples = 0
+        self.captures = 0
+        self.last_change = 0.0
+        self.bar = RegionWatchBar()
+        self.bar.stopRequested.connect(self.stop)
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.CoarseTimer)
+        self._timer.setInterval(max(100, int(interval_ms)))
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._active = True
+        self._started = time.perf_counter()
+        self.bar.place_near(self._region)
+        self.bar.show()
+        self._tick()
+        self._timer.start()
+
+    def _tick(self):
+        if not self._active:
+            return
+        started = time.perf_counter()
+        image = self._grab()
+        if image.isNull():
+            return
+        signature = _region_signature(image)
+        previous, self._previous = self._previous, signature
+        change = 0.0
+        if previous is not None and previous.shape == signature.shape:
+            change = float(np.count_nonzero(signature != previous)) / signature.size
+        self.samples += 1
+        self._cost += time.perf_counter() - started
+        self.last_change = change
+        if change > 0 and change >= self._threshold:
+            self.captures += 1
+            self.changed.emit(image, change * 100.0)
+        image = None
+        self.bar.set_status(self.status_text())
+
+    def stats(self):
+        elapsed = max(1e-6, time.perf_counter() - (self._started or time.perf_counter()))
+        return {
+            "samples": self.samples,
+            "captures": self.captures,
+            "rate": self.samples / elapsed,
+            "average_cost_ms": 1000.0 * self._cost / max(1, self.samples),
+            "load": self._cost / elapsed,
+            "last_change": self.last_change * 100.0,
+        }
+
+    def status_text(self):
+        stats = self.stats()
+        return (
+            f"监视中 · {stats['rate']:.1f} 次/秒 · 每次 {stats['average_cost_ms']:.1f} ms"
+            f" · 占用 {stats['load'] * 100:.1f}% · 变化 {stats['last_change']:.1f}% · 已截 {stats['captures']} 张"
+        )
+
+    def stop(self):
+        if not self._active:
+            return
+        self._active = False
+        self._timer.stop()
+        self._previous = None
+        self.bar.close()
+        self.bar.deleteLater()
+        self.stopped.emit()
+
+
+def acquire_instance_lock(path=INSTANCE_LOCK_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock = QLockFile(path)
+    lock.setStaleLockTime(0)
+    if lock.tryLock(0):
+        return lock
+    return None
+
+
+def _instance_arguments(args):
+    forwarded = []
+    for arg in args:
+        if arg.lstrip("-").lower() in INSTANCE_COMMANDS or arg == "--minimized":
+            forwarded.append(arg)
+        elif os.path.exists(arg):
+            forwarded.append(os.path.abspath(arg))
+    return forwarded
+
+
+def forward_to_running_instance(args, timeout_ms=INSTANCE_CONNECT_TIMEOUT_MS, server_name=INSTANCE_SERVER_NAME):
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    socket = QLocalSocket()
+    while True:
+        socket.connectToServer(server_name)
+        if socket.waitForConnected(200):
+            break
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    payload = json.dumps({"args": _instance_arguments(args)}, ensure_ascii=False).encode("utf-8") + b"\n"
+    socket.write(payload)
+    socket.waitForBytesWritten(1000)
+    reply = b""
+    while b"\n" not in reply and socket.waitForReadyRead(max(1, int((deadline - time.monotonic()) * 1000))):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    return reply.startswith(b"ok")
+
+
+class InstanceServer(QObject):
+    messageReceived = pyqtSignal(list)
+
+    def __init__(self, server_name=INSTANCE_SERVER_NAME, parent=None):
+        super().__init__(parent)
+        self._server_name = server_name
+        self._server = QLocalServer(self)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._buffers = {}
+
+    def listen(self):
+        if self._server.listen(self._server_name):
+            return True
+        QLocalServer.removeServer(self._server_name)
+        return self._server.listen(self._server_name)
+
+    def close(self):
+        self._server.close()
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._buffers[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._on_disconnected(s))
+
+    def _on_ready_read(self, socket):
+        buffer = self._buffers.get(socket, b"") + bytes(socket.readAll())
+        if b"\n" not in buffer:
+            self._buffers[socket] = buffer
+            return
+        line = buffer.split(b"\n", 1)[0]
+        self._buffers[socket] = b""
+        try:
+            args = json.loads(line.decode("utf-8")).get("args", [])
+        except (UnicodeDecodeError, json.JSONDecodeError, AttributeError):
+            socket.write(b"error\n")
+            return
+        socket.write(b"ok\n")
+        socket.flush()
+        self.messageReceived.emit([str(arg) for arg in args])
+
+    def _on_disconnected(self, socket):
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
+
+
 class ScreenSnapApp(QMainWindow):
     def __init__(self, start_minimized=False):
         super().__init__()
@@ -2818,6 +8244,11 @@ class ScreenSnapApp(QMainWindow):
         self.setWindowIcon(get_app_icon())
         self._start_minimized = start_minimized
         self.config = load_config()
+        loaded_config = dict(self.config)
+        self.profiling_enabled = bool(self.config.get("profiling_enabled", False))
+        self.profiling_trace = bool(self.config.get("profiling_trace", False))
+        if self.profiling_enabled:
+            start_profiler(trace=self.profiling_trace)
         self._active_overlays = []
         self._last_capture_screen_name = None
         self.auto_save_enabled = bool(self.config.get("auto_save_enabled", False))
@@ -2825,6 +8256,18 @@ class ScreenSnapApp(QMainWindow):
         self._image_quality = int(self.config.get("image_quality", DEFAULT_IMAGE_QUALITY))
         self.workspace_zoom = float(self.config.get("workspace_zoom", 1.0))
         self.workspace_zoom = max(0.25, min(2.0, self.workspace_zoom))
+        self.memory_budget_mb = ImageMemoryManager.clamp_budget_mb(
+            self.config.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)
+        )
+        self.undo_limit = AnnotationHistory(self.config.get("undo_limit", AnnotationHistory.DEFAULT_LIMIT)).limit
+        self.restore_session_enabled = bool(self.config.get("restore_session_enabled", True))
+        self.capture_mode = self.config.get("capture_mode", DEFAULT_CAPTURE_MODE)
+        if self.capture_mode not in CAPTURE_MODES:
+            self.capture_mode = DEFAULT_CAPTURE_MODE
+        self.repeat_diff_enabled = bool(self.config.get("repeat_diff_enabled", False))
+        self.region_watch_interval_ms = int(self.config.get("region_watch_interval_ms", REGION_WATCH_INTERVAL_MS))
+        self.region_watch_threshold = float(self.config.get("region_watch_threshold", REGION_WATCH_THRESHOLD))
+        self.region_watch_open_tabs = bool(self.config.get("region_watch_open_tabs", False))
         self.close_behavior = self.config.get("close_behavior", "tray")
         if self.close_behavior not in ("tray", "exit"):
             self.close_behavior = "tray"
@@ -2833,31 +8276,93 @@ class ScreenSnapApp(QMainWindow):
             self.exit_unsaved_policy = "save_all"
         self.marker_style = self.config.get("marker_style", DEFAULT_MARKER_STYLE.copy())
         self.rectangle_style = self.config.get("rectangle_style", DEFAULT_RECT_STYLE.copy())
+        self.redact_style = self.config.get("redact_style", DEFAULT_REDACT_STYLE.copy())
         self.config.setdefault("marker_style", self.marker_style)
         self.config.setdefault("rectangle_style", self.rectangle_style)
+        self.config.setdefault("redact_style", self.redact_style)
         self.config.setdefault("image_quality", self._image_quality)
         self.config.setdefault("auto_save_enabled", self.auto_save_enabled)
         self.config.setdefault("auto_start_enabled", self.auto_start_enabled)
         self.config.setdefault("workspace_zoom", self.workspace_zoom)
+        self.config.setdefault("memory_budget_mb", self.memory_budget_mb)
+        self.config.setdefault("undo_limit", self.undo_limit)
+        self.config.setdefault("restore_session_enabled", self.restore_session_enabled)
+        self.config.setdefault("capture_mode", self.capture_mode)
+        self.config.setdefault("repeat_diff_enabled", self.repeat_diff_enabled)
+        self.config.setdefault("region_watch_interval_ms", self.region_watch_interval_ms)
+        self.config.setdefault("region_watch_threshold", self.region_watch_threshold)
+        self.config.setdefault("region_watch_open_tabs", self.region_watch_open_tabs)
+        self.config.setdefault("profiling_enabled", self.profiling_enabled)
+        self.config.setdefault("profiling_trace", self.profiling_trace)
         self.config.setdefault("close_behavior", self.close_behavior)
         self.config.setdefault("exit_unsaved_policy", self.exit_unsaved_policy)
-        save_config(self.config)
-
-        self.workspace_page = AnnotationWorkspacePage(
-            lambda: self._open_settings_dialog(),
-            self._open_images_dialog,
-            {"marker": self.marker_style, "rectangle": self.rectangle_style},
-            self._on_style_changed,
-            self._image_quality,
-            self.auto_save_enabled,
-            default_zoom=self.workspace_zoom,
-            zoom_changed_callback=self._on_workspace_zoom_changed,
-        )
+        if self.config != loaded_config:
+            save_config(self.config)
+        self._save_dir = self.config.get("save_dir", DEFAULT_SAVE_DIR)
+        self.capture_library = None
+        self._capture_library_opened = False
+        self._replay_write_journal()
+        self.session_journal = SessionJournal()
+        self._pending_session = None
+        self._session_loaded = False
         self._hotkey_manager = GlobalHotkeyManager(self)
         self._last_selection_rect = None
-        self._save_dir = self.config.get("save_dir", DEFAULT_SAVE_DIR)
+        self._repeat_reference = None
+        _IMAGE_LEDGER.add_source("repeat_reference", self._repeat_reference_bytes)
+        self._scroll_session = None
+        self._region_watcher = None
         self._force_exit_once = False
+        self._pages = {}
+        self._page_builders = {
+            "home": self._build_home_page,
+            "edit": self._build_workspace_page,
+            "gallery": self._build_gallery_page,
+            "about": self._build_about_page,
+        }
+        self._current_page = "home"
+        self.pages = None
+        self.resize(1100, 750)
+
+        self._register_all_hotkeys()
+        self.tray_icon = None
+        self._tray_message_shown = False
+        self._closing_via_tray_exit = False
+        self._setup_tray_icon()
+        QTimer.singleShot(AUTOSTART_SYNC_DELAY_MS, self._sync_autostart_entry)
+        if start_minimized:
+            QTimer.singleShot(0, self._minimize_to_tray)
+        else:
+            self._restore_pending_session()
+            self.show()
 
+    @property
+    def home_page(self):
+        return self._page("home")
+
+    @property
+    def workspace_page(self):
+        return self._page("edit")
+
+    @property
+    def gallery_page(self):
+        return self._page("gallery")
+
+    @property
+    def about_page(self):
+        return self._page("about")
+
+    def _page(self, key):
+        page = self._pages.get(key)
+        if page is None:
+            self._ensure_main_ui()
+            page = self._page_builders[key]()
+            self.pages.addWidget(page)
+            self._pages[key] = page
+        return page
+
+    def _ensure_main_ui(self):
+        if self.pages is not None:
+            return
         main_widget = QWidget()
         root_layout = QVBoxLayout(main_widget)
 
@@ -2870,9 +8375,10 @@ class ScreenSnapApp(QMainWindow):
         self.nav_color_map = {
             "home": "#FF8BA7",
             "edit": "#2ED3A3",
+            "gallery": "#FFB86B",
             "about": "#BD93FF",
         }
-        for text, key in [("首页", "home"), ("图片编辑", "edit"), ("关于", "about")]:
+        for text, key in [("首页", "home"), ("图片编辑", "edit"), ("图库", "gallery"), ("关于", "about")]:
             action = QAction(text, self)
             action.setCheckable(True)
             action.triggered.connect(lambda _, k=key: self._switch_page(k))
@@ -2891,47 +8397,95 @@ class ScreenSnapApp(QMainWindow):
         root_layout.addWidget(self.nav_toolbar)
 
         self.pages = QStackedWidget()
-        self.home_page = HomePage(self._save_dir)
-        self.pages.addWidget(self.home_page)
-        self.pages.addWidget(self.workspace_page)
-        self.about_page = AboutPage()
-        self.pages.addWidget(self.about_page)
-        self._pages = {"home": self.home_page, "edit": self.workspace_page, "about": self.about_page}
         root_layout.addWidget(self.pages, 1)
-
-        self.home_page.openFolderRequested.connect(self._open_save_folder)
-        self.home_page.captureRequested.connect(self.initiate_capture)
-        self.home_page.repeatRequested.connect(self._repeat_capture)
-        self.home_page.openImagesRequested.connect(self._open_images_dialog)
-        self.home_page.openSettingsRequested.connect(self._open_settings_dialog)
-        self.home_page.openWorkspaceRequested.connect(self._open_workspace)
-        self._current_page = "home"
+        self.setCentralWidget(main_widget)
         self._update_nav_state()
 
-        self.setCentralWidget(main_widget)
-        self.resize(1100, 750)
+    def _build_home_page(self):
+        page = HomePage(self._save_dir)
+        page.openFolderRequested.connect(self._open_save_folder)
+        page.openGalleryRequested.connect(self._open_gallery)
+        page.captureRequested.connect(self.initiate_capture)
+        page.repeatRequested.connect(self._repeat_capture)
+        page.scrollRequested.connect(self._start_scroll_capture)
+        page.watchRequested.connect(self._toggle_region_watch)
+        page.openImagesRequested.connect(self._open_images_dialog)
+        page.openSettingsRequested.connect(self._open_settings_dialog)
+        page.openWorkspaceRequested.connect(self._open_workspace)
+        page.set_repeat_enabled(self._last_selection_rect is not None)
+        page.set_hotkey_summary(self._hotkey_summary_text())
+        return page
+
+    def _build_workspace_page(self):
+        self._ensure_session_loaded()
+        return AnnotationWorkspacePage(
+            lambda: self._open_settings_dialog(),
+            self._open_images_dialog,
+            {"marker": self.marker_style, "rectangle": self.rectangle_style, "redact": self.redact_style},
+            self._on_style_changed,
+            self._image_quality,
+            self.auto_save_enabled,
+            default_zoom=self.workspace_zoom,
+            zoom_changed_callback=self._on_workspace_zoom_changed,
+            memory_budget_mb=self.memory_budget_mb,
+            saved_callback=self._on_capture_saved,
+            undo_limit=self.undo_limit,
+            session_journal=self.session_journal,
+        )
 
-        self.home_page.set_repeat_enabled(False)
-        self._register_all_hotkeys()
-        self._update_hotkey_summary()
-        self.tray_icon = None
-        self._tray_message_shown = False
-        self._closing_via_tray_exit = False
-        self._setup_tray_icon()
-        self._sync_autostart_entry()
-        if start_minimized:
-            QTimer.singleShot(0, self._minimize_to_tray)
-        else:
-            self.show()
+    def _build_gallery_page(self):
+        page = GalleryPage(self._save_dir, self._get_capture_library())
+        page.openFolderRequested.connect(self._open_save_folder)
+        page.openImagesRequested.connect(self._open_gallery_images)
+        return page
+
+    def _build_about_page(self):
+        return AboutPage()
+
+    def showEvent(self, event):
+        if self._current_page not in self._pages:
+            self._switch_page(self._current_page)
+        super().showEvent(event)
+
+    def _ensure_session_loaded(self):
+        if self._session_loaded:
+            return
+        self._session_loaded = True
+        self._pending_session = self._load_session()
+
+    def _load_session(self):
+        if not self.restore_session_enabled:
+            self.session_journal.reset()
+            return None
+        entries, current_id = self.session_journal.load()
+        self.session_journal.reset(keep_ids=[entry["tab"]["id"] for entry in entries])
+        if not entries:
+            return None
+        return entries, current_id
+
+    def _restore_pending_session(self):
+        if "edit" not in self._pages and not (self.restore_session_enabled and self.session_journal.has_entries()):
+            return
+        self._ensure_session_loaded()
+        pending = self._pending_session
+        self._pending_session = None
+        if not pending:
+            return
+        entries, current_id = pending
+        if self.workspace_page.restore_session(entries, current_id):
+            self._switch_page("edit")
 
     def _switch_page(self, key):
-        if key not in self._pages:
+        if key not in self._page_builders:
             return
-        self.pages.setCurrentWidget(self._pages[key])
+        page = self._page(key)
+        self.pages.setCurrentWidget(page)
         self._current_page = key
         self._update_nav_state()
 
     def _update_nav_state(self):
+        if self.pages is None:
+            return
         for key, action in self.nav_actions.items():
             action.blockSignals(True)
             action.setChecked(key == self._current_page)
@@ -2961,6 +8515,56 @@ class ScreenSnapApp(QMainWindow):
     def _open_workspace(self):
         self._switch_page("edit")
 
+    def _open_gallery(self):
+        self._switch_page("gallery")
+
+    def _get_capture_library(self):
+        if not self._capture_library_opened:
+            self._capture_library_opened = True
+            self.capture_library = self._open_capture_library()
+        return self.capture_library
+
+    def _open_capture_library(self):
+        try:
+            library = CaptureLibrary()
+        except (sqlite3.Error, OSError):
+            return None
+        QThreadPool.globalInstance().start(LibraryReconcileTask(library, [self._save_dir]))
+        return library
+
+    def _on_capture_saved(self, path, info):
+        library = self._get_capture_library()
+        if not library:
+            return
+        try:
+            library.record(
+                path,
+                kind=info.get("kind", "capture"),
+                screen_name=info.get("screen_name"),
+                selection_rect=info.get("selection_rect"),
+                annotation_count=info.get("annotation_count", 0),
+                source_path=info.get("source_path"),
+                data=info.get("data"),
+            )
+        except sqlite3.Error:
+            pass
+
+    def _replay_write_journal(self):
+        recovered = get_write_journal().replay()
+        library = self._get_capture_library() if recovered else None
+        if not library:
+            return
+        for path in recovered:
+            kind = "annotated" if "_annotated" in os.path.basename(path) else "capture"
+            try:
+                library.record(path, kind=kind)
+            except sqlite3.Error:
+                pass
+
+    def _open_gallery_images(self, paths):
+        self.workspace_page.open_image_files(paths)
+        self._focus_workspace()
+
     def _open_images_dialog(self):
         filters = "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif *.webp *.tif *.tiff);;所有文件 (*)"
         files, _ = QFileDialog.getOpenFileNames(self, "选择图片文件", self._save_dir, filters)
@@ -2971,6 +8575,9 @@ class ScreenSnapApp(QMainWindow):
 
     def _focus_workspace(self):
         self._switch_page("edit")
+        self._bring_to_front()
+
+    def _bring_to_front(self):
         if self.tray_icon and self.tray_icon.isVisible():
             self._restore_from_tray()
             return
@@ -2981,6 +8588,35 @@ class ScreenSnapApp(QMainWindow):
         self.raise_()
         self.activateWindow()
 
+    def handle_instance_message(self, args):
+        paths = []
+        action = None
+        only_minimized = bool(args)
+        for arg in args:
+            command = arg.lstrip("-").lower()
+            if command == "minimized":
+                continue
+            only_minimized = False
+            if command in INSTANCE_COMMANDS:
+                action = command
+            elif os.path.isfile(arg):
+                paths.append(arg)
+        if only_minimized:
+            return
+        if paths:
+            self.workspace_page.open_image_files(paths)
+            self._focus_workspace()
+        if action == "capture":
+            self._on_hotkey_trigger("capture")
+        elif action == "repeat":
+            self._on_hotkey_trigger("repeat_capture")
+        elif action == "scroll":
+            self._on_hotkey_trigger("scroll_capture")
+        elif action == "watch":
+            self._on_hotkey_trigger("region_watch")
+        elif not paths:
+            self._bring_to_front()
+
     def _trigger_exit_action(self):
         self._force_exit_once = True
         self.close()
@@ -3001,22 +8637,37 @@ class ScreenSnapApp(QMainWindow):
             self.show()
             return
         self._clear_overlays()
+        _IMAGE_LEDGER.begin_capture()
+        if self.capture_mode == "virtual_desktop" and len(screens) > 1:
+            self._create_virtual_desktop_overlays(screens)
+            return
         for screen in screens:
             self._create_overlay_for_screen(screen)
 
     def _on_capture_cancel(self):
         self._clear_overlays()
+        _IMAGE_LEDGER.end_capture()
         self.show()
 
     def _on_overlay_selection(self, pixmap: QPixmap, selection_rect: QRect, screen_name: str):
         self._clear_overlays()
         self._last_selection_rect = QRect(selection_rect)
         self._last_capture_screen_name = screen_name
-        self.workspace_page.add_capture(pixmap, self._save_dir, self.workspace_zoom)
-        self.home_page.set_repeat_enabled(True)
+        self._swap_repeat_reference(pixmap, screen_name, selection_rect)
+        self.workspace_page.add_capture(
+            pixmap,
+            self._save_dir,
+            self.workspace_zoom,
+            capture_info={"screen_name": screen_name, "selection_rect": QRect(selection_rect)},
+        )
+        _IMAGE_LEDGER.release("selection_crop", pixmap.cacheKey())
+        home_page = self._pages.get("home")
+        if home_page:
+            home_page.set_repeat_enabled(True)
         self._focus_workspace()
         self._resize_for_image(pixmap.size())
-        QApplication.clipboard().setPixmap(pixmap)
+        _set_clipboard_pixmap(pixmap)
+        _IMAGE_LEDGER.end_capture()
 
     def _hotkey_display_text(self, action_id):
         hotkey_info = self.config.get("hotkeys", {}).get(action_id, {})
@@ -3028,7 +8679,7 @@ class ScreenSnapApp(QMainWindow):
             return display
         return _format_display_shortcut(shortcut)
 
-    def _update_hotkey_summary(self):
+    def _hotkey_summary_text(self):
         hotkeys = self.config.get("hotkeys", {})
         summary_lines = []
         for action_id, action_name in HOTKEY_ACTIONS:
@@ -3039,9 +8690,12 @@ class ScreenSnapApp(QMainWindow):
             else:
                 display = "未设置"
             summary_lines.append(f"{action_name}: {display}")
-        summary_text = "\n".join(summary_lines) if summary_lines else "尚未配置快捷键。"
-        if hasattr(self, "home_page"):
-            self.home_page.set_hotkey_summary(summary_text)
+        return "\n".join(summary_lines) if summary_lines else "尚未配置快捷键。"
+
+    def _update_hotkey_summary(self):
+        home_page = self._pages.get("home")
+        if home_page:
+            home_page.set_hotkey_summary(self._hotkey_summary_text())
 
 
     def _on_workspace_zoom_changed(self, factor):
@@ -3067,8 +8721,14 @@ class ScreenSnapApp(QMainWindow):
             new_dir = general_settings.get("save_dir") or self._save_dir
             self._save_dir = new_dir
             self.config["save_dir"] = new_dir
+            gallery_page = self._pages.get("gallery")
+            if gallery_page:
+                gallery_page.set_save_dir(new_dir)
+            if self.capture_library:
+                QThreadPool.globalInstance().start(LibraryReconcileTask(self.capture_library, [new_dir]))
             self.config["auto_save_enabled"] = self.auto_save_enabled
             new_auto_start = bool(general_settings.get("auto_start_enabled", False))
+            auto_start_changed = new_auto_start != self.auto_start_enabled
             self.auto_start_enabled = new_auto_start
             self.config["auto_start_enabled"] = self.auto_start_enabled
             self.close_behavior = general_settings.get("close_behavior", self.close_behavior)
@@ -3079,13 +8739,56 @@ class ScreenSnapApp(QMainWindow):
                 self.exit_unsaved_policy = "save_all"
             self.config["close_behavior"] = self.close_behavior
             self.config["exit_unsaved_policy"] = self.exit_unsaved_policy
+            self.restore_session_enabled = bool(general_settings.get("restore_session_enabled", True))
+            self.config["restore_session_enabled"] = self.restore_session_enabled
+            self.capture_mode = general_settings.get("capture_mode", self.capture_mode)
+            if self.capture_mode not in CAPTURE_MODES:
+                self.capture_mode = DEFAULT_CAPTURE_MODE
+            self.config["capture_mode"] = self.capture_mode
+            self.repeat_diff_enabled = bool(general_settings.get("repeat_diff_enabled", False))
+            self.config["repeat_diff_enabled"] = self.repeat_diff_enabled
+            if not self.repeat_diff_enabled:
+                self._repeat_reference = None
+            self.region_watch_interval_ms = int(general_settings.get("region_watch_interval_ms", self.region_watch_interval_ms))
+            self.region_watch_threshold = float(general_settings.get("region_watch_threshold", self.region_watch_threshold))
+            self.region_watch_open_tabs = bool(general_settings.get("region_watch_open_tabs", False))
+            self.config["region_watch_interval_ms"] = self.region_watch_interval_ms
+            self.config["region_watch_threshold"] = self.region_watch_threshold
+            self.config["region_watch_open_tabs"] = self.region_watch_open_tabs
+            performance_settings = dialog.get_performance_settings()
+            self.memory_budget_mb = ImageMemoryManager.clamp_budget_mb(
+                performance_settings.get("memory_budget_mb", self.memory_budget_mb)
+            )
+            self.config["memory_budget_mb"] = self.memory_budget_mb
+            self.undo_limit = int(performance_settings.get("undo_limit", self.undo_limit))
+            self.config["undo_limit"] = self.undo_limit
+            previous_profiling = (self.profiling_enabled, self.profiling_trace)
+            self.profiling_enabled = bool(performance_settings.get("profiling_enabled", False))
+            self.profiling_trace = bool(performance_settings.get("profiling_trace", False))
+            self.config["profiling_enabled"] = self.profiling_enabled
+            self.config["profiling_trace"] = self.profiling_trace
             save_config(self.config)
-            self.workspace_page.set_image_quality(self._image_quality)
-            self.workspace_page.set_auto_save_enabled(self.auto_save_enabled)
-            self._sync_autostart_entry()
+            if (self.profiling_enabled, self.profiling_trace) != previous_profiling:
+                self._apply_profiling_settings()
+            workspace_page = self._pages.get("edit")
+            if workspace_page:
+                workspace_page.set_image_quality(self._image_quality)
+                workspace_page.set_auto_save_enabled(self.auto_save_enabled)
+                workspace_page.set_memory_budget_mb(self.memory_budget_mb)
+                workspace_page.set_undo_limit(self.undo_limit)
+            if auto_start_changed:
+                self._sync_autostart_entry()
             self._register_all_hotkeys()
             self._update_hotkey_summary()
 
+    def _apply_profiling_settings(self):
+        if self.profiling_enabled:
+            start_profiler(trace=self.profiling_trace)
+            return
+        report_path, _ = stop_profiler()
+        if report_path:
+            QMessageBox.information(self, "性能分析", f"性能分析已停止，报告已写入:\n{report_path}")
+
     def _on_style_changed(self, style_type, data):
         if style_type == "marker":
             self.marker_style.update(data)
@@ -3093,6 +8796,9 @@ class ScreenSnapApp(QMainWindow):
         elif style_type == "rectangle":
             self.rectangle_style.update(data)
             self.config["rectangle_style"] = self.rectangle_style
+        elif style_type == "redact":
+            self.redact_style.update(data)
+            self.config["redact_style"] = self.redact_style
         save_config(self.config)
 
     def _register_all_hotkeys(self):
@@ -3129,15 +8835,23 @@ class ScreenSnapApp(QMainWindow):
             self.initiate_capture()
         elif action_id == "repeat_capture":
             self._repeat_capture()
+        elif action_id == "scroll_capture":
+            self._start_scroll_capture()
+        elif action_id == "region_watch":
+            self._toggle_region_watch()
 
     def _on_hotkey_trigger(self, action_id):
+        if self._scroll_session is not None:
+            if action_id == "scroll_capture":
+                self._scroll_session.finish()
+            return
         if self._active_overlays:
             return
         QTimer.singleShot(0, lambda: self._trigger_hotkey_action(action_id))
 
     def nativeEvent(self, eventType, message):
         if eventType in ("windows_generic_MSG", "windows_dispatcher_MSG"):
-            msg = wintypes.MSG.from_address(message.__int__())
+            msg = _native_msg_type().from_address(message.__int__())
             if msg.message == WM_HOTKEY:
                 self._hotkey_manager.handle_message(msg.wParam)
                 return True, 0
@@ -3151,6 +8865,9 @@ class ScreenSnapApp(QMainWindow):
         QTimer.singleShot(200, self._do_repeat_capture)
 
     def _do_repeat_capture(self):
+        if self._last_capture_screen_name == VIRTUAL_DESKTOP_SCREEN_NAME:
+            self._do_repeat_virtual_capture()
+            return
         target_screen = self._screen_by_name(self._last_capture_screen_name) or self._screen_for_cursor()
         screen = target_screen or QGuiApplication.primaryScreen()
         if not screen:
@@ -3162,12 +8879,192 @@ class ScreenSnapApp(QMainWindow):
             QMessageBox.warning(self, "�ظ���ͼʧ��", "��¼������ߴ���Ч�������½�ͼ��")
             self.show()
             return
+        _IMAGE_LEDGER.begin_capture()
         screenshot = self._grab_screen_pixmap(screen)
+        _IMAGE_LEDGER.acquire("screen_grab", screenshot.cacheKey(), screenshot)
         cropped = self._copy_from_pixmap(screenshot, rect, screen)
-        self.workspace_page.add_capture(cropped, self._save_dir, self.workspace_zoom)
+        _IMAGE_LEDGER.acquire("selection_crop", cropped.cacheKey(), cropped)
+        _IMAGE_LEDGER.release("screen_grab", screenshot.cacheKey())
+        screenshot = None
+        self._finish_repeat_capture(cropped, screen.name(), rect)
+
+    def _do_repeat_virtual_capture(self):
+        _IMAGE_LEDGER.begin_capture()
+        desktop = VirtualDesktopGrab(QGuiApplication.screens(), self._grab_screen_pixmap)
+        rect = QRect(self._last_selection_rect)
+        device_rect = desktop.device_rect(rect)
+        if device_rect.width() < 5 or device_rect.height() < 5:
+            _IMAGE_LEDGER.end_capture()
+            QMessageBox.warning(self, "重复截图失败", "上次的选区已不在当前桌面范围内，请重新截图。")
+            self.show()
+            return
+        _IMAGE_LEDGER.acquire("screen_grab", desktop.pixmap.cacheKey(), desktop.pixmap)
+        cropped = desktop.pixmap.copy(device_rect)
+        _IMAGE_LEDGER.acquire("selection_crop", cropped.cacheKey(), cropped)
+        _IMAGE_LEDGER.release("screen_grab", desktop.pixmap.cacheKey())
+        desktop = None
+        self._finish_repeat_capture(cropped, VIRTUAL_DESKTOP_SCREEN_NAME, rect)
+
+    def _start_scroll_capture(self):
+        if self._scroll_session is not None:
+            return
+        if not ScrollStitcher.available():
+            QMessageBox.warning(self, "滚动截图", "滚动截图需要 numpy，请先执行 pip install numpy。")
+            return
+        if not self._last_selection_rect:
+            QMessageBox.information(self, "滚动截图", "请先进行一次区域截图，滚动截图会沿用上次的选区。")
+            return
+        self.hide()
+        QTimer.singleShot(200, self._begin_scroll_capture)
+
+    def _begin_scroll_capture(self):
+        grab, region = self._region_grab_source()
+        if grab is None:
+            QMessageBox.critical(self, "滚动截图", "找不到屏幕设备，无法截图。")
+            self.show()
+            return
+        session = ScrollingCaptureSession(grab, region, self)
+        session.finished.connect(self._on_scroll_capture_finished)
+        session.canceled.connect(self._on_scroll_capture_canceled)
+        self._scroll_session = session
+        session.start()
+
+    def _region_grab_source(self):
+        rect = QRect(self._last_selection_rect)
+        if self._last_capture_screen_name == VIRTUAL_DESKTOP_SCREEN_NAME:
+            def grab():
+                return VirtualDesktopGrab.grab_region(QGuiApplication.screens(), rect)
+
+            return grab, rect
+        screen = self._screen_by_name(self._last_capture_screen_name) or self._screen_for_cursor()
+        if screen is None:
+            return None, None
+
+        def grab():
+            return screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height()).toImage()
+
+        return grab, rect.translated(screen.geometry().topLeft())
+
+    def _end_scroll_session(self):
+        session = self._scroll_session
+        self._scroll_session = None
+        if session is not None:
+            session.deleteLater()
+
+    def _on_scroll_capture_finished(self, image):
+        self._end_scroll_session()
+        if image.isNull():
+            self.show()
+            return
+        pixmap = QPixmap.fromImage(image)
+        image = None
+        self.workspace_page.add_capture(
+            pixmap,
+            self._save_dir,
+            self.workspace_zoom,
+            capture_info={
+                "screen_name": self._last_capture_screen_name,
+                "selection_rect": QRect(self._last_selection_rect),
+            },
+        )
+        self._focus_workspace()
+        _set_clipboard_pixmap(pixmap)
+
+    def _on_scroll_capture_canceled(self):
+        self._end_scroll_session()
+        self.show()
+
+    def _toggle_region_watch(self):
+        if self._region_watcher is not None:
+            self._region_watcher.stop()
+            return
+        if np is None:
+            QMessageBox.warning(self, "区域监视", "区域监视需要 numpy，请先执行 pip install numpy。")
+            return
+        if not self._last_selection_rect:
+            QMessageBox.information(self, "区域监视", "请先进行一次区域截图，区域监视会沿用上次的选区。")
+            return
+        self.hide()
+        QTimer.singleShot(200, self._begin_region_watch)
+
+    def _begin_region_watch(self):
+        grab, region = self._region_grab_source()
+        if grab is None:
+            QMessageBox.critical(self, "区域监视", "找不到屏幕设备，无法截图。")
+            self.show()
+            return
+        watcher = RegionWatcher(grab, region, self.region_watch_interval_ms, self.region_watch_threshold, self)
+        watcher.screen_name = self._last_capture_screen_name
+        watcher.selection_rect = QRect(self._last_selection_rect)
+        watcher.changed.connect(self._on_region_watch_changed)
+        watcher.stopped.connect(self._on_region_watch_stopped)
+        self._region_watcher = watcher
+        watcher.start()
+
+    def _on_region_watch_changed(self, image, change):
+        watcher = self._region_watcher
+        if watcher is None:
+            return
+        pixmap = QPixmap.fromImage(image)
+        image = None
+        save_dir = self._save_dir or DEFAULT_SAVE_DIR
+        os.makedirs(save_dir, exist_ok=True)
+        path = _unique_capture_path(save_dir)
+        data = save_image_atomic(pixmap, path, "JPG", self._image_quality)
+        if data is None:
+            return
+        self._on_capture_saved(
+            path,
+            {
+                "kind": "capture",
+                "screen_name": watcher.screen_name,
+                "selection_rect": QRect(watcher.selection_rect),
+                "data": data,
+            },
+        )
+        if self.region_watch_open_tabs:
+            self.workspace_page.open_image_files([path])
+
+    def _on_region_watch_stopped(self):
+        watcher = self._region_watcher
+        self._region_watcher = None
+        if watcher is not None:
+            watcher.deleteLater()
+        self.show()
+
+    def _swap_repeat_reference(self, pixmap, screen_name, rect):
+        if not self.repeat_diff_enabled or np is None:
+            self._repeat_reference = None
+            return None
+        previous = self._repeat_reference
+        self._repeat_reference = (screen_name, QRect(rect), _capture_pixels(pixmap))
+        if previous is None or previous[0] != screen_name or previous[1] != rect:
+            return None
+        return previous[2]
+
+    def _repeat_reference_bytes(self):
+        reference = self._repeat_reference
+        return reference[2].nbytes if reference is not None else 0
+
+    def _finish_repeat_capture(self, cropped, screen_name, rect):
+        previous = self._swap_repeat_reference(cropped, screen_name, rect)
+        regions = None
+        if previous is not None:
+            regions = diff_capture_regions(previous, self._repeat_reference[2])
+            previous = None
+        tab = self.workspace_page.add_capture(
+            cropped,
+            self._save_dir,
+            self.workspace_zoom,
+            capture_info={"screen_name": screen_name, "selection_rect": QRect(rect)},
+        )
+        if regions is not None and tab is not None:
+            tab.mark_changed_regions(regions)
+        _IMAGE_LEDGER.release("selection_crop", cropped.cacheKey())
         self._focus_workspace()
         self._resize_for_image(cropped.size())
-        QApplication.clipboard().setPixmap(cropped)
+        _set_clipboard_pixmap(cropped)
+        _IMAGE_LEDGER.end_capture()
 
     def closeEvent(self, event):
         behavior = self.close_behavior
@@ -3193,14 +9090,16 @@ class ScreenSnapApp(QMainWindow):
         super().closeEvent(event)
 
     def _handle_unsaved_before_exit(self):
-        if not self.workspace_page.has_unsaved_tabs():
+        workspace_page = self._pages.get("edit")
+        if not workspace_page or not workspace_page.has_unsaved_tabs():
             return True
         policy = self.exit_unsaved_policy
         if policy == "save_all":
-            return self.workspace_page.save_all_dirty()
+            return workspace_page.save_all_dirty()
         if policy == "discard_all":
+            workspace_page.discard_unsaved_tabs()
             return True
-        return self.workspace_page.maybe_close_all()
+        return workspace_page.maybe_close_all()
 
     def _resize_for_image(self, image_size: QSize):
         return
@@ -3233,6 +9132,7 @@ class ScreenSnapApp(QMainWindow):
         self.hide()
 
     def _restore_from_tray(self):
+        self._restore_pending_session()
         if self.tray_icon:
             self.tray_icon.hide()
         self.show()
@@ -3251,25 +9151,47 @@ class ScreenSnapApp(QMainWindow):
 
     def _cleanup_before_exit(self):
         self._clear_overlays()
+        if self._scroll_session is not None:
+            self._scroll_session.canceled.disconnect(self._on_scroll_capture_canceled)
+            self._scroll_session.cancel()
+            self._end_scroll_session()
+        if self._region_watcher is not None:
+            self._region_watcher.stopped.disconnect(self._on_region_watch_stopped)
+            self._region_watcher.stop()
+            self._region_watcher = None
         self._teardown_hotkeys()
+        workspace_page = self._pages.get("edit")
+        if workspace_page:
+            workspace_page.checkpoint_session()
+        self.session_journal.wait(5000)
+        if self.capture_library:
+            QThreadPool.globalInstance().waitForDone(2000)
+            self.capture_library.close()
+            self.capture_library = None
         if self.tray_icon:
             self.tray_icon.hide()
         self.tray_icon = None
 
     def _sync_autostart_entry(self):
+        try:
+            import winreg
+        except ImportError:
+            return
         command = self._autostart_command()
         try:
             key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, RUN_REG_PATH, 0, winreg.KEY_ALL_ACCESS)
         except FileNotFoundError:
             key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, RUN_REG_PATH)
         try:
+            try:
+                current = winreg.QueryValueEx(key, RUN_REG_NAME)[0]
+            except FileNotFoundError:
+                current = None
             if self.auto_start_enabled:
-                winreg.SetValueEx(key, RUN_REG_NAME, 0, winreg.REG_SZ, command)
-            else:
-                try:
-                    winreg.DeleteValue(key, RUN_REG_NAME)
-                except FileNotFoundError:
-                    pass
+                if current != command:
+                    winreg.SetValueEx(key, RUN_REG_NAME, 0, winreg.REG_SZ, command)
+            elif current is not None:
+                winreg.DeleteValue(key, RUN_REG_NAME)
         except OSError as exc:
             QMessageBox.warning(self, "自动启动", f"无法更新系统启动项，请手动配置或以管理员身份运行。\n\n系统信息: {exc}")
         finally:
@@ -3286,6 +9208,16 @@ class ScreenSnapApp(QMainWindow):
     def _create_overlay_for_screen(self, screen):
         screenshot = self._grab_screen_pixmap(screen)
         overlay = CaptureOverlay(screenshot, screen.geometry().topLeft(), screen)
+        _IMAGE_LEDGER.acquire("screen_grab", screenshot.cacheKey(), screenshot)
+        self._show_overlay(overlay)
+
+    def _create_virtual_desktop_overlays(self, screens):
+        desktop = VirtualDesktopGrab(screens, self._grab_screen_pixmap)
+        _IMAGE_LEDGER.acquire("screen_grab", desktop.pixmap.cacheKey(), desktop.pixmap)
+        for screen in screens:
+            self._show_overlay(VirtualDesktopOverlay(desktop, screen))
+
+    def _show_overlay(self, overlay):
         overlay.selectionMade.connect(self._on_overlay_selection)
         overlay.canceled.connect(self._on_capture_cancel)
         overlay.show()
@@ -3299,6 +9231,7 @@ class ScreenSnapApp(QMainWindow):
                 overlay.canceled.disconnect(self._on_capture_cancel)
             except Exception:
                 pass
+            overlay.release_screenshot()
             overlay.close()
             overlay.deleteLater()
 
@@ -3363,22 +9296,47 @@ class ScreenSnapApp(QMainWindow):
 
 
 def main():
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] == "--recompress":
+        sys.exit(run_recompress_cli(sys.argv[2:]))
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     start_minimized = False
-    qt_args = []
-    for arg in sys.argv:
+    qt_args = sys.argv[:1]
+    launch_args = []
+    profile_args = []
+    for arg in sys.argv[1:]:
         if arg == "--minimized":
             start_minimized = True
+            launch_args.append(arg)
+        elif arg in ("--profile", "--profile-trace"):
+            profile_args.append(arg)
         else:
             qt_args.append(arg)
+            launch_args.append(arg)
+    instance_lock = acquire_instance_lock()
+    if instance_lock is None:
+        if forward_to_running_instance(launch_args):
+            sys.exit(0)
+        print("CTK Snapshot 已在运行，但无法与其通信。", file=sys.stderr)
+        sys.exit(1)
+    for arg in profile_args:
+        start_profiler(trace=arg == "--profile-trace")
     sys.argv = qt_args
     app = QApplication(qt_args)
     app.setWindowIcon(get_app_icon())
     window = ScreenSnapApp(start_minimized=start_minimized)
+    instance_server = InstanceServer(parent=window)
+    instance_server.messageReceived.connect(window.handle_instance_message)
+    instance_server.listen()
     if not start_minimized:
         window.show()
-    sys.exit(app.exec_())
+    commands = [arg for arg in launch_args if arg != "--minimized"]
+    if commands:
+        QTimer.singleShot(0, lambda: window.handle_instance_message(_instance_arguments(commands)))
+    exit_code = app.exec_()
+    stop_profiler()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":